@@ -0,0 +1,76 @@
+"""
+Benchmark: per-span cost of lex_spans vs the previous per-pass checks.
+
+Usage: python backend/benchmarks/bench_span_lexer.py [pdf ...]
+Defaults to the bundled study articles.
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from server import (  # noqa: E402
+    BAND_BODY,
+    BAND_PARA_NUMBER,
+    BAND_QUESTION,
+    LayoutProfile,
+    extract_span_table,
+    lex_spans,
+)
+
+DEFAULT_PDFS = [
+    BACKEND_DIR.parent / "Articulo_50_Humildad.pdf",
+    BACKEND_DIR.parent / "articulo_job.pdf",
+]
+REPEAT = 200
+
+
+def previous_checks(texts, bands):
+    """The span checks of the two passes before the lexer: regex in the first, upper() in the second"""
+    for text, band in zip(texts, bands):
+        if band == BAND_QUESTION:
+            num_match = re.match(r'^([\d,\s]+)\.\s*$', text)
+            if num_match:
+                [int(n.strip()) for n in num_match.group(1).split(',') if n.strip().isdigit()]
+            continue
+        if text == '˛':
+            continue
+        text_upper = text.upper()
+        if "QUÉ RESPONDERÍA" in text_upper or "QUE RESPONDERIA" in text_upper:
+            continue
+        if text_upper.startswith("CANCIÓN") or text_upper.startswith("CANCION"):
+            continue
+        band == BAND_PARA_NUMBER and text.isdigit()
+        band == BAND_BODY
+
+
+def consume_lexer(texts, bands):
+    for _ in lex_spans(texts, bands):
+        pass
+
+
+def time_best(func, repeat: int = REPEAT) -> float:
+    """Best wall time of func() in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(paths):
+    print(f"{'file':30} {'spans':>6} {'previous ns/span':>17} {'lexer ns/span':>14}")
+    for path in paths:
+        spans = extract_span_table(str(path))
+        bands = LayoutProfile.from_spans(spans).classify(spans)
+        previous = time_best(lambda: previous_checks(spans.text, bands)) / len(spans) * 1e9
+        lexer = time_best(lambda: consume_lexer(spans.text, bands)) / len(spans) * 1e9
+        print(f"{Path(path).name[:30]:30} {len(spans):6} {previous:17.0f} {lexer:14.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or DEFAULT_PDFS)
@@ -0,0 +1,201 @@
+"""
+Offline HTTP load test for the API.
+
+Usage:
+    python backend/benchmarks/load_test.py [--uploads 40] [--concurrency 8]
+        [--mongo auto|none|mongomock|mongodb://...] [--synthetic-pages 2,20]
+        [--workers N] [--warm] [--output results.json]
+    python backend/benchmarks/load_test.py --url http://127.0.0.1:8001
+
+By default the FastAPI app is driven in this process through httpx's ASGI
+transport, so no server, network or remote preview URL is needed. Mongo is the
+mongomock-motor stand-in when it is installed (pip install mongomock-motor),
+otherwise the app runs without a database as it does when Mongo is down. With
+--url the same workload is sent to a running server instead.
+
+Each of `concurrency` clients repeatedly uploads one of the bundled or synthetic
+PDFs to /api/analyze-pdf, then lists /api/analyses and calls /api/health, until
+`uploads` uploads are done. Every upload gets a unique trailing comment, so each
+one is parsed instead of served from the result cache, unless --warm is given.
+Throughput and p50/p95/p99 latency are reported per route.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.synthetic_pdf import build_study_article  # noqa: E402
+
+PDF_DIR = BACKEND_DIR.parent
+ARTICLE_PDFS = [
+    "Articulo_50_Humildad.pdf",
+    "Articulo_de_Estudio_49_Como_nos_ayuda_el_libro_de_Job_a_dar_buenos_consejos.pdf",
+    "articulo_job.pdf",
+]
+ROUTES = ("/api/analyze-pdf", "/api/analyses", "/api/health")
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def load_documents(synthetic_pages) -> list:
+    """(filename, bytes) of the bundled articles and the requested synthetic ones"""
+    documents = [(name, (PDF_DIR / name).read_bytes()) for name in ARTICLE_PDFS if (PDF_DIR / name).exists()]
+    for pages in synthetic_pages:
+        article = build_study_article(paragraphs=3 * pages, pages=pages)
+        documents.append((f"synthetic_{pages}p.pdf", article.pdf_bytes))
+    return documents
+
+
+async def run_workload(http: httpx.AsyncClient, documents: list, uploads: int, concurrency: int, warm: bool) -> dict:
+    latencies = {route: [] for route in ROUTES}
+    errors = {route: 0 for route in ROUTES}
+    next_upload = iter(range(uploads))
+
+    async def timed(route: str, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        latencies[route].append(time.perf_counter() - start)
+        if not ok:
+            errors[route] += 1
+
+    async def client_loop():
+        for number in next_upload:
+            filename, pdf_bytes = documents[number % len(documents)]
+            if not warm:
+                # Bytes after %%EOF are ignored by readers but change the content hash
+                pdf_bytes = pdf_bytes + f"\n% load-test upload {number}\n".encode()
+            await timed("/api/analyze-pdf", http.post(
+                "/api/analyze-pdf", files={"file": (filename, pdf_bytes, "application/pdf")}))
+            await timed("/api/analyses", http.get("/api/analyses"))
+            await timed("/api/health", http.get("/api/health"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    routes = {}
+    for route in ROUTES:
+        values = sorted(latencies[route])
+        routes[route] = {
+            "requests": len(values),
+            "errors": errors[route],
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000 if values else float("nan"),
+        }
+    return {"elapsed_seconds": elapsed, "routes": routes}
+
+
+async def connect_database(mongo: str):
+    """Database handle for the in-process app and a description of it"""
+    if mongo == "none":
+        return None, "none"
+    if mongo in ("auto", "mongomock"):
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            if mongo == "mongomock":
+                raise SystemExit("mongomock-motor is not installed: pip install mongomock-motor")
+            return None, "none (mongomock-motor not installed)"
+        return AsyncMongoMockClient()["load_test"], "mongomock-motor"
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(mongo, serverSelectionTimeoutMS=5000)
+    await client.admin.command("ping")
+    return client["load_test"], mongo
+
+
+async def run_in_process(args, documents: list) -> dict:
+    import server
+
+    server.ANALYSIS_WORKERS = args.workers
+    await server.start_analysis_pool()
+    database, description = await connect_database(args.mongo)
+    if database is not None:
+        await server.create_indexes(database)
+    server.db = database
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=300) as http:
+            results = await run_workload(http, documents, args.uploads, args.concurrency, args.warm)
+        # Pending write-behind batches are part of the load
+        await server.persistence_queue.stop()
+    finally:
+        server.db = None
+        server.stop_analysis_pool()
+    results["target"] = "in-process ASGI"
+    results["database"] = description
+    results["workers"] = args.workers
+    return results
+
+
+async def run_remote(args, documents: list) -> dict:
+    async with httpx.AsyncClient(base_url=args.url, timeout=300) as http:
+        results = await run_workload(http, documents, args.uploads, args.concurrency, args.warm)
+    results["target"] = args.url
+    return results
+
+
+def print_report(results: dict):
+    print(f"target: {results['target']}  database: {results.get('database', '-')}  "
+          f"elapsed: {results['elapsed_seconds']:.2f} s")
+    print(f"{'route':20} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in results["routes"].items():
+        print(f"{route:20} {stats['requests']:8} {stats['errors']:6} {stats['throughput_rps']:8.2f} "
+              f"{stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the API offline")
+    parser.add_argument("--uploads", type=int, default=40, help="total PDF uploads")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--mongo", default="auto",
+                        help="auto, none, mongomock or a mongodb:// URL (in-process mode only)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="analysis worker processes for the in-process app (0 = threads)")
+    parser.add_argument("--synthetic-pages", default="",
+                        help="comma-separated page counts of synthetic articles to add to the uploads")
+    parser.add_argument("--warm", action="store_true", help="upload identical bytes so results come from the cache")
+    parser.add_argument("--url", help="send the workload to a running server instead")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    synthetic_pages = [int(pages) for pages in args.synthetic_pages.split(",") if pages]
+    documents = load_documents(synthetic_pages)
+    if not documents:
+        raise SystemExit("No PDFs to upload")
+
+    runner = run_remote if args.url else run_in_process
+    results = asyncio.run(runner(args, documents))
+    results.update(uploads=args.uploads, concurrency=args.concurrency, warm=args.warm,
+                   documents=[name for name, _ in documents])
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
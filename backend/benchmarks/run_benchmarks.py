@@ -0,0 +1,209 @@
+"""
+Benchmark suite for the parser: isolated parser functions and full analyses.
+
+Usage:
+    python backend/benchmarks/run_benchmarks.py [--output results.json]
+    python backend/benchmarks/run_benchmarks.py --compare baseline.json [--threshold 0.10]
+    python backend/benchmarks/run_benchmarks.py --only count_words --only analyze
+    python backend/benchmarks/run_benchmarks.py --synthetic-pages 2,20,200 --only synthetic
+
+Inputs come from the PDFs bundled at the repository root, so runs on the same
+tree and machine are comparable. Each benchmark is timed in `repeat` runs of
+`number` calls (calibrated to take at least MIN_RUN_SECONDS per run); the best
+run is the statistic used for comparisons, as it is the least affected by other
+load on the machine. With --compare the exit status is 1 when any benchmark is
+slower than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.synthetic_pdf import build_study_article  # noqa: E402
+from server import (  # noqa: E402
+    PARSER_VERSION,
+    analyze_pdf_with_font_info_configurable,
+    build_analysis_result,
+    classify_parenthesis_content,
+    count_words,
+    detect_horizontal_line_separator,
+    extract_multiple_questions,
+    extract_text_from_pdf,
+    parse_pdf_source,
+    split_into_paragraphs,
+)
+
+PDF_DIR = BACKEND_DIR.parent
+ARTICLE_PDFS = [
+    "Articulo_50_Humildad.pdf",
+    "Articulo_de_Estudio_49_Como_nos_ayuda_el_libro_de_Job_a_dar_buenos_consejos.pdf",
+    "articulo_job.pdf",
+]
+REPEAT = 7
+MIN_RUN_SECONDS = 0.05
+DEFAULT_THRESHOLD = 0.10
+
+_PARENTHESIS_RE = re.compile(r'\(([^)]+)\)')
+
+
+class BenchmarkInputs:
+    """Inputs derived once from the bundled PDFs and shared by all benchmarks"""
+    def __init__(self, pdf_paths):
+        self.pdfs = {path.name: path.read_bytes() for path in pdf_paths}
+        self.texts = [extract_text_from_pdf(pdf_bytes) for pdf_bytes in self.pdfs.values()]
+        self.paragraphs = [p for text in self.texts for p in split_into_paragraphs(text)]
+        self.parentheses = [m.group(1) for text in self.texts for m in _PARENTHESIS_RE.finditer(text)]
+        self.question_lines = []
+        for pdf_bytes in self.pdfs.values():
+            result = analyze_pdf_with_font_info_configurable(pdf_bytes, "bench.pdf")
+            for paragraph in result.paragraphs:
+                self.question_lines.extend(q.text for q in paragraph.questions)
+            self.question_lines.extend(q.text for q in result.final_questions)
+
+
+def build_benchmarks(inputs: BenchmarkInputs, synthetic_pages=()) -> dict:
+    """name -> (callable, items processed per call)"""
+    benchmarks = {
+        "classify_parenthesis_content": (
+            lambda: [classify_parenthesis_content(c) for c in inputs.parentheses], len(inputs.parentheses)),
+        "extract_multiple_questions": (
+            lambda: [extract_multiple_questions(q) for q in inputs.question_lines], len(inputs.question_lines)),
+        "count_words": (
+            lambda: [count_words(p) for p in inputs.paragraphs], len(inputs.paragraphs)),
+        "split_into_paragraphs": (
+            lambda: [split_into_paragraphs(t) for t in inputs.texts], len(inputs.texts)),
+    }
+    for name, pdf_bytes in inputs.pdfs.items():
+        benchmarks[f"detect_horizontal_line_separator[{name}]"] = (
+            lambda pdf_bytes=pdf_bytes: detect_horizontal_line_separator(pdf_bytes), 1)
+    for name, pdf_bytes in inputs.pdfs.items():
+        benchmarks[f"analyze_pdf_with_font_info_configurable[{name}]"] = (
+            lambda pdf_bytes=pdf_bytes: analyze_pdf_with_font_info_configurable(pdf_bytes, name), 1)
+    for name, pdf_bytes in inputs.pdfs.items():
+        # Re-timing a stored parse with other settings: the per-request cost once parsed
+        parsed = parse_pdf_source(pdf_bytes)
+        benchmarks[f"build_analysis_result[{name}]"] = (
+            lambda parsed=parsed: build_analysis_result(parsed, name, 150, 40), len(parsed.paragraphs))
+    for pages in synthetic_pages:
+        # Three paragraphs per page, like the printed articles
+        article = build_study_article(paragraphs=3 * pages, pages=pages)
+        benchmarks[f"analyze_pdf_with_font_info_configurable[synthetic-{pages}p]"] = (
+            lambda pdf_bytes=article.pdf_bytes: analyze_pdf_with_font_info_configurable(pdf_bytes, "synthetic.pdf"),
+            article.paragraphs)
+    return benchmarks
+
+
+def calibrate(func) -> int:
+    """Smallest power-of-two call count whose run takes at least MIN_RUN_SECONDS"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= MIN_RUN_SECONDS:
+            return number
+        number *= 2
+
+
+def time_benchmark(func, items: int, repeat: int) -> dict:
+    number = calibrate(func)
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - start) / number)
+    best = min(runs)
+    return {
+        "best_seconds": best,
+        "median_seconds": statistics.median(runs),
+        "best_ns_per_item": best / items * 1e9 if items else None,
+        "items": items,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def run_suite(pdf_paths, only=None, repeat: int = REPEAT, synthetic_pages=()) -> dict:
+    benchmarks = build_benchmarks(BenchmarkInputs(pdf_paths), synthetic_pages)
+    results = {}
+    for name, (func, items) in benchmarks.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = time_benchmark(func, items, repeat)
+        print(f"{name[:70]:70} {results[name]['best_seconds'] * 1000:10.3f} ms", file=sys.stderr)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser_version": PARSER_VERSION,
+            "pdfs": [path.name for path in pdf_paths],
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Print a comparison table; return the names slower than baseline by more than threshold"""
+    regressions = []
+    print(f"{'benchmark':70} {'baseline ms':>12} {'current ms':>11} {'change':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name[:70]:70} {'-':>12} {result['best_seconds'] * 1000:11.3f}      new")
+            continue
+        change = result["best_seconds"] / base["best_seconds"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name[:70]:70} {base['best_seconds'] * 1000:12.3f} {result['best_seconds'] * 1000:11.3f} "
+              f"{change:+8.1%}{flag}")
+    if baseline["meta"].get("parser_version") != current["meta"]["parser_version"]:
+        print(f"note: parser version changed from {baseline['meta'].get('parser_version')} "
+              f"to {current['meta']['parser_version']}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time the parser functions and full PDF analyses")
+    parser.add_argument("--output", help="write results as JSON to this file (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a previous JSON result")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown flagged as a regression (default: 0.10)")
+    parser.add_argument("--only", action="append", help="run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per benchmark")
+    parser.add_argument("--synthetic-pages", default="",
+                        help="comma-separated page counts of synthetic articles to analyze, e.g. 2,20,200")
+    parser.add_argument("pdfs", nargs="*", help="PDFs to use instead of the bundled study articles")
+    args = parser.parse_args(argv)
+
+    pdf_paths = [Path(p) for p in args.pdfs] or [PDF_DIR / name for name in ARTICLE_PDFS]
+    synthetic_pages = [int(pages) for pages in args.synthetic_pages.split(",") if pages]
+    current = run_suite(pdf_paths, args.only, args.repeat, synthetic_pages)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(current, indent=2))
+    elif not args.compare:
+        print(json.dumps(current, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
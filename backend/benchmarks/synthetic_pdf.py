@@ -0,0 +1,354 @@
+"""
+Synthetic study articles laid out like the Watchtower PDFs, for scale and stress tests.
+
+Usage:
+    python backend/benchmarks/synthetic_pdf.py out.pdf [--paragraphs 18] [--pages 6]
+        [--drawings 0] [--single-column] [--seed 0]
+
+The generated PDFs use the real font bands (10.9 pt body, 9 pt questions, 6.8 pt
+bold paragraph numbers), put the questions of each column at its bottom with
+grouped numbers such as "6, 7.", add parenthesized image, scripture and note
+references, and end with a full-width separator followed by numbered review
+questions. The same arguments always give the same bytes.
+"""
+import argparse
+import functools
+import random
+import sys
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+PAGE_WIDTH = 504
+PAGE_HEIGHT = 648
+MARGIN_TOP = 52
+QUESTIONS_BOTTOM = 610
+SEPARATOR_Y = 440       # last page: body above, review questions below
+COLUMNS = {1: [(55, 452)], 2: [(55, 246), (260, 452)]}
+
+BODY_SIZE = 10.9
+QUESTION_SIZE = 9.0
+PARA_NUMBER_SIZE = 6.8
+HEADING_SIZE = 10.0
+BODY_LEADING = 13.2
+QUESTION_LEADING = 10.0
+
+SENTENCES = [
+    "Jehová nos invita a acercarnos a él y a contarle todo lo que sentimos",
+    "Así como un padre cariñoso escucha a sus hijos, nuestro Padre celestial escucha nuestras oraciones",
+    "La humildad nos ayuda a evitar defectos que alejan a los demás de nosotros",
+    "Los ancianos se esfuerzan por ser accesibles y por conocer bien a sus hermanos",
+    "Cuando cometemos errores, podemos estar seguros de que Jehová está dispuesto a perdonarnos",
+    "Jesús imitó a su Padre a la perfección y trató con bondad a las personas humildes",
+    "Si somos razonables, estaremos dispuestos a ceder cuando no se trate de un principio bíblico",
+    "La paciencia de Jehová le da a muchas personas la oportunidad de arrepentirse",
+    "Podemos honrar a los demás cuando los tratamos con respeto y los escuchamos con atención",
+    "Cada esfuerzo que hacemos por copiar sus cualidades nos hace más valiosos a sus ojos",
+]
+SCRIPTURES = ["Sal. 113:5-8", "Luc. 15:17-20", "Is. 57:15", "Mat. 17:24-27", "Col. 3:12-14", "Juan 14:9"]
+READ_SCRIPTURES = ["lea Salmo 62:8", "lea 2 Pedro 3:9", "lea Marcos 3:1-6", "lea Filipenses 2:3"]
+QUESTIONS = [
+    "¿Por qué es tan impresionante que Jehová sea humilde?",
+    "¿Qué nos enseña este ejemplo sobre nuestro Padre celestial?",
+    "¿Cómo demostró Jesús que era accesible?",
+    "¿Por qué nos ayuda la humildad a ser más pacientes?",
+    "¿Cómo podemos imitar a Jehová en nuestra congregación?",
+    "¿Qué aprendemos de la manera en que Jehová trató a sus siervos?",
+]
+QUESTION_REFERENCES = [
+    ("Vea también la imagen", "image"),
+    ("Lea Salmo 138:6", "scripture"),
+    ("Vea también la nota", "note"),
+]
+HEADINGS = ["JEHOVÁ ES ACCESIBLE", "JEHOVÁ ES RAZONABLE", "JEHOVÁ ES PACIENTE", "IMITEMOS SU EJEMPLO"]
+REVIEW_QUESTIONS = [
+    "¿Por qué es Jehová accesible?",
+    "¿Cómo podemos ser más razonables?",
+    "¿Qué nos enseña la paciencia de Jehová?",
+]
+
+
+class SyntheticArticle:
+    """A generated PDF and the totals the parser is expected to find in it"""
+    def __init__(self, pdf_bytes: bytes, pages: int, paragraphs: int, questions: int,
+                 review_questions: int, images: int, scriptures: int, notes: int):
+        self.pdf_bytes = pdf_bytes
+        self.pages = pages
+        self.paragraphs = paragraphs
+        self.questions = questions
+        self.review_questions = review_questions
+        self.images = images
+        self.scriptures = scriptures
+        self.notes = notes
+
+
+@functools.lru_cache(maxsize=None)
+def char_width(char: str, fontname: str) -> float:
+    return fitz.get_text_length(char, fontname=fontname, fontsize=1)
+
+
+def text_width(text: str, fontname: str, fontsize: float) -> float:
+    """Width of text in a base-14 font; summing cached glyph widths is exact as they have no kerning"""
+    return sum(char_width(char, fontname) for char in text) * fontsize
+
+
+def wrap_text(text: str, width: float, fontname: str, fontsize: float, first_indent: float = 0) -> list:
+    """Split text into lines that fit the width; the first line is shortened by first_indent"""
+    lines = []
+    current = ""
+    limit = width - first_indent
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and text_width(candidate, fontname, fontsize) > limit:
+            lines.append(current)
+            current = word
+            limit = width
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines
+
+
+def paragraph_text(rng: random.Random, lines: int, width: float, read_scripture: str = None) -> str:
+    """Body text of about the given number of lines, ending with a scripture citation"""
+    sentences = []
+    while True:
+        sentences.append(SENTENCES[rng.randrange(len(SENTENCES))])
+        if read_scripture and len(sentences) == 1:
+            sentences[0] += f" ({read_scripture})"
+        text = ". ".join(sentences) + f" ({SCRIPTURES[len(sentences) % len(SCRIPTURES)]})."
+        if text_width(text, "tiro", BODY_SIZE) >= lines * width * 0.8:
+            return text
+
+
+def plan_paragraphs(rng: random.Random, paragraphs: int, body_lines, width: float) -> list:
+    """Body text, question group and question of each paragraph; body_lines is a count or a (min, max) range"""
+    plan = []
+    number = 1
+    while number <= paragraphs:
+        # Every fifth paragraph after the first shares its question with the next one ("6, 7.")
+        group = [number, number + 1] if number % 5 == 1 and 1 < number < paragraphs else [number]
+        reference = QUESTION_REFERENCES[number % 4] if number % 4 < len(QUESTION_REFERENCES) else None
+        question = QUESTIONS[rng.randrange(len(QUESTIONS))]
+        if reference:
+            question = f"{question} ({reference[0]})."
+        for index, para_num in enumerate(group):
+            lines = body_lines if isinstance(body_lines, int) else rng.randint(*body_lines)
+            read_scripture = READ_SCRIPTURES[rng.randrange(len(READ_SCRIPTURES))] if para_num % 3 == 0 else None
+            last_of_group = index == len(group) - 1
+            plan.append({
+                "number": para_num,
+                "text": paragraph_text(rng, lines, width, read_scripture),
+                "group": group,
+                # The question is printed once, after the last paragraph of its group
+                "question": question if last_of_group else None,
+                "reference": reference[1] if reference and last_of_group else None,
+                "read_scripture": read_scripture is not None,
+                "heading": HEADINGS[(para_num // 4) % len(HEADINGS)] if para_num % 4 == 2 else None,
+            })
+        number += len(group)
+    return plan
+
+
+def add_drawings(page: fitz.Page, rng: random.Random, count: int):
+    """Short decorative vector paths, none of which qualifies as a separator"""
+    if count <= 0:
+        return
+    shape = page.new_shape()
+    for _ in range(count):
+        x = rng.uniform(20, PAGE_WIDTH - 60)
+        y = rng.uniform(20, PAGE_HEIGHT - 20)
+        if rng.random() < 0.5:
+            shape.draw_line((x, y), (x + rng.uniform(5, 40), y + rng.uniform(-10, 10)))
+        else:
+            shape.draw_rect(fitz.Rect(x, y, x + rng.uniform(2, 30), y + rng.uniform(2, 30)))
+        shape.finish(color=(0.4, 0.5, 0.5), width=0.3)
+    shape.commit()
+
+
+class ArticleWriter:
+    """
+    Flows paragraphs through the columns of consecutive pages. The questions of
+    the paragraphs ending in a column are written at the bottom of that column
+    once it is full, like in the printed magazine. Text goes through one Shape
+    per page, as inserting lines one by one on the page rewrites its contents.
+    """
+    def __init__(self, doc: fitz.Document, columns: list, last_page: int):
+        self.doc = doc
+        self.columns = columns
+        self.last_page = last_page
+        self.shape = None
+        self.page_num = -1
+        self.column = len(columns) - 1
+        self.y = MARGIN_TOP
+        self.questions = []  # (label, lines) of the current column
+        self.next_column()
+    
+    @property
+    def bottom(self) -> float:
+        return SEPARATOR_Y - 12 if self.page_num >= self.last_page else QUESTIONS_BOTTOM
+    
+    @property
+    def x0(self) -> float:
+        return self.columns[self.column][0]
+    
+    @property
+    def width(self) -> float:
+        x0, x1 = self.columns[self.column]
+        return x1 - x0
+    
+    def questions_height(self, questions: list) -> float:
+        return sum(len(lines) * QUESTION_LEADING + 3 for _, lines in questions) + (8 if questions else 0)
+    
+    def next_column(self):
+        self.flush_questions()
+        self.column += 1
+        if self.column == len(self.columns):
+            self.column = 0
+            self.page_num += 1
+            if self.shape is not None:
+                self.shape.commit()
+            page = self.doc[self.page_num] if self.page_num < len(self.doc) else self.doc.new_page(
+                width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            self.shape = page.new_shape()
+            self.last_page = max(self.last_page, self.page_num)
+        self.y = MARGIN_TOP
+    
+    def flush_questions(self):
+        if not self.questions:
+            return
+        y = self.bottom - self.questions_height(self.questions) + 8
+        self.shape.draw_line((self.x0, y - 6), (self.x0 + 62, y - 6))
+        self.shape.finish(width=0.3)
+        for label, lines in self.questions:
+            indent = text_width(label, "hebo", QUESTION_SIZE)
+            self.shape.insert_text((self.x0, y + QUESTION_SIZE), label, fontname="hebo", fontsize=QUESTION_SIZE)
+            for index, line in enumerate(lines):
+                x = self.x0 + indent + 2 if index == 0 else self.x0
+                self.shape.insert_text((x, y + QUESTION_SIZE), line, fontname="helv", fontsize=QUESTION_SIZE)
+                y += QUESTION_LEADING
+            y += 3
+        self.questions = []
+    
+    def fits(self, height: float, questions: list) -> bool:
+        return self.y + height + self.questions_height(questions) <= self.bottom
+    
+    def write_paragraph(self, paragraph: dict):
+        question = []
+        if paragraph["question"]:
+            label = ", ".join(str(n) for n in paragraph["group"]) + "."
+            indent = text_width(label, "hebo", QUESTION_SIZE) + 2
+            question = [(label, wrap_text(paragraph["question"], self.width, "helv", QUESTION_SIZE, indent))]
+        
+        if paragraph["heading"]:
+            if not self.fits(2 * BODY_LEADING + 8, self.questions):
+                self.next_column()
+            self.shape.insert_text((self.x0 + 40, self.y + 4 + HEADING_SIZE), paragraph["heading"],
+                                  fontname="hebo", fontsize=HEADING_SIZE)
+            self.y += BODY_LEADING + 8
+        
+        indent = 0
+        label = str(paragraph["number"])
+        if paragraph["number"] > 1:
+            indent = 7 + text_width(label, "tibo", PARA_NUMBER_SIZE)
+        lines = wrap_text(paragraph["text"], self.width, "tiro", BODY_SIZE, indent)
+        for index, line in enumerate(lines):
+            is_last = index == len(lines) - 1
+            if not self.fits(BODY_LEADING, self.questions + (question if is_last else [])):
+                self.next_column()
+            x = self.x0
+            if index == 0 and indent:
+                self.shape.insert_text((x + 7, self.y + BODY_SIZE), label, fontname="tibo", fontsize=PARA_NUMBER_SIZE)
+                x += indent
+            self.shape.insert_text((x, self.y + BODY_SIZE), line, fontname="tiro", fontsize=BODY_SIZE)
+            self.y += BODY_LEADING
+        self.questions.extend(question)
+    
+    def finish(self) -> int:
+        """Close the last column, add any missing pages and write the review section; returns the page count"""
+        self.flush_questions()
+        self.shape.commit()
+        while len(self.doc) <= self.last_page:
+            self.doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        write_review_section(self.doc[self.last_page])
+        return len(self.doc)
+
+
+def write_review_section(page: fitz.Page):
+    page.draw_line((30, SEPARATOR_Y), (475, SEPARATOR_Y), color=(0.38, 0.47, 0.54), width=0.6)
+    y = SEPARATOR_Y + 20
+    page.insert_text((31, y), "¿QUÉ HEMOS APRENDIDO EN ESTE ARTÍCULO?", fontname="hebo", fontsize=HEADING_SIZE)
+    for number, question in enumerate(REVIEW_QUESTIONS, 1):
+        y += 24
+        page.insert_text((31, y), f"{number}. {question}", fontname="helv", fontsize=HEADING_SIZE)
+    page.insert_text((400, 605), "CANCIÓN 159", fontname="hebo", fontsize=HEADING_SIZE)
+
+
+def build_study_article(paragraphs: int = 18, pages: int = None, drawings_per_page: int = 0,
+                        two_columns: bool = True, seed: int = 0) -> SyntheticArticle:
+    """
+    Generate a study article with the given number of paragraphs.
+    With `pages`, paragraph length is chosen so the text fills about that many
+    pages (paragraphs are never shorter than two lines, so a very small page
+    count can be exceeded); otherwise paragraphs have 4 to 9 lines. The last
+    page also holds the separator and the review questions.
+    """
+    rng = random.Random(seed)
+    columns = COLUMNS[2 if two_columns else 1]
+    width = columns[0][1] - columns[0][0]
+    
+    if pages is None:
+        body_lines = (4, 9)
+        last_page = 0
+    else:
+        # Column space left for each paragraph once its question (about 30 pt) is placed
+        space = (pages * len(columns) * (QUESTIONS_BOTTOM - MARGIN_TOP)
+                 - len(columns) * (QUESTIONS_BOTTOM - SEPARATOR_Y + 12)) * 0.95
+        body_lines = max(2, min(40, int((space / paragraphs - 30) / BODY_LEADING)))
+        last_page = pages - 1
+    plan = plan_paragraphs(rng, paragraphs, body_lines, width)
+    
+    doc = fitz.open()
+    writer = ArticleWriter(doc, columns, last_page)
+    doc[0].insert_text((28, 41), "ARTÍCULO DE ESTUDIO 50", fontname="hebo", fontsize=12)
+    for paragraph in plan:
+        writer.write_paragraph(paragraph)
+    page_count = writer.finish()
+    for page in doc:
+        add_drawings(page, rng, drawings_per_page)
+    
+    pdf_bytes = doc.tobytes(garbage=1, deflate=True, no_new_id=True)
+    doc.close()
+    
+    return SyntheticArticle(
+        pdf_bytes=pdf_bytes,
+        pages=page_count,
+        paragraphs=len(plan),
+        questions=sum(1 for p in plan if p["question"]),
+        review_questions=len(REVIEW_QUESTIONS),
+        images=sum(1 for p in plan if p["reference"] == "image"),
+        scriptures=sum(1 for p in plan if p["reference"] == "scripture") + sum(1 for p in plan if p["read_scripture"]),
+        notes=sum(1 for p in plan if p["reference"] == "note"),
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write a synthetic study-article PDF")
+    parser.add_argument("output", help="PDF file to write")
+    parser.add_argument("--paragraphs", type=int, default=18)
+    parser.add_argument("--pages", type=int, default=None)
+    parser.add_argument("--drawings", type=int, default=0, help="decorative vector paths per page")
+    parser.add_argument("--single-column", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    article = build_study_article(args.paragraphs, args.pages, args.drawings, not args.single_column, args.seed)
+    Path(args.output).write_bytes(article.pdf_bytes)
+    print(f"{args.output}: {article.pages} pages, {article.paragraphs} paragraphs, "
+          f"{article.questions} questions, {len(article.pdf_bytes)} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
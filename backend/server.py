@@ -1,17 +1,43 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
+from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Request, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
-from contextlib import asynccontextmanager
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
 import os
+import asyncio
+import multiprocessing
 import logging
 import re
+import time
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
+from pydantic_core import to_json
+from typing import AsyncIterator, Iterator, List, Optional, Union, get_args, get_origin
 import uuid
+import hashlib
+import base64
+import tempfile
+import threading
+import zipfile
+import zlib
+import gzip
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
 import fitz  # PyMuPDF
+import numpy as np
+
+try:
+    import brotli  # Optional: responses fall back to gzip without it
+except ImportError:
+    brotli = None
 
 # Configure logging early
 logging.basicConfig(
@@ -31,6 +57,165 @@ db_name = os.environ.get('DB_NAME', 'pdf_timer_db')
 client: AsyncIOMotorClient = None
 db = None
 
+# Worker processes for CPU-bound PDF parsing (0 = run in a thread of this process)
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', str(os.cpu_count() or 1)))
+# Recycle each worker after this many PDFs to cap MuPDF memory growth
+ANALYSIS_MAX_TASKS_PER_CHILD = int(os.environ.get('ANALYSIS_MAX_TASKS_PER_CHILD', '50'))
+analysis_pool: ProcessPoolExecutor = None
+# Paragraphs streamed out of the worker processes while they parse: (stream token, paragraph)
+# pairs on one queue shared by every worker, forwarded by a thread of this process
+worker_paragraphs = None
+_worker_paragraphs_reader: threading.Thread = None
+# Set in each worker process by _init_analysis_worker
+_worker_paragraph_queue = None
+# Stream token -> (event loop, asyncio.Queue) of the streaming responses waiting for paragraphs
+paragraph_streams = {}
+
+
+def _init_analysis_worker(paragraph_queue):
+    global _worker_paragraph_queue
+    _worker_paragraph_queue = paragraph_queue
+
+
+def _warm_analysis_worker() -> int:
+    """No-op task that makes a worker import this module (and MuPDF) before the first upload"""
+    return os.getpid()
+
+
+def _analysis_mp_context():
+    # What ProcessPoolExecutor picks itself: recycled workers need spawn. The shared
+    # paragraph queue has to come from the same context as the workers
+    return multiprocessing.get_context("spawn" if ANALYSIS_MAX_TASKS_PER_CHILD else None)
+
+
+def _new_analysis_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=ANALYSIS_WORKERS,
+        mp_context=_analysis_mp_context(),
+        initializer=_init_analysis_worker,
+        initargs=(worker_paragraphs,),
+        max_tasks_per_child=ANALYSIS_MAX_TASKS_PER_CHILD or None
+    )
+
+
+def _forward_worker_paragraphs(source):
+    """Reader thread: hand each paragraph a worker streamed to the response waiting for it"""
+    while True:
+        item = source.get()
+        if item is None:
+            return
+        deliver_paragraph(*item)
+
+
+async def start_analysis_pool():
+    """Create the analysis process pool and wait until every worker is up"""
+    global analysis_pool, worker_paragraphs, _worker_paragraphs_reader
+    if ANALYSIS_WORKERS <= 0:
+        logger.info("Analysis worker pool disabled, parsing PDFs in threads")
+        return
+    
+    worker_paragraphs = _analysis_mp_context().SimpleQueue()
+    _worker_paragraphs_reader = threading.Thread(
+        target=_forward_worker_paragraphs, args=(worker_paragraphs,), name="worker-paragraphs", daemon=True
+    )
+    _worker_paragraphs_reader.start()
+    analysis_pool = _new_analysis_pool()
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.gather(*(
+            loop.run_in_executor(analysis_pool, _warm_analysis_worker)
+            for _ in range(ANALYSIS_WORKERS)
+        ))
+        logger.info(f"Analysis worker pool started with {ANALYSIS_WORKERS} processes")
+    except Exception as e:
+        logger.warning(f"Analysis worker pool failed to start: {e}. Parsing PDFs in threads.")
+        analysis_pool.shutdown(wait=False, cancel_futures=True)
+        analysis_pool = None
+
+
+def stop_analysis_pool():
+    global analysis_pool, worker_paragraphs, _worker_paragraphs_reader
+    if analysis_pool is not None:
+        analysis_pool.shutdown(wait=True, cancel_futures=True)
+        analysis_pool = None
+        logger.info("Analysis worker pool stopped")
+    if _worker_paragraphs_reader is not None:
+        worker_paragraphs.put(None)
+        _worker_paragraphs_reader.join()
+        _worker_paragraphs_reader = None
+        worker_paragraphs = None
+
+
+async def run_analysis_task(func, *args):
+    """
+    Run a CPU-bound analysis function off the event loop.
+    Uses the worker pool when it is running, otherwise the default thread pool.
+    A pool broken by a crashed worker is replaced so later uploads still work.
+    """
+    global analysis_pool
+    loop = asyncio.get_running_loop()
+    pool = analysis_pool
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        if pool is not None and pool is analysis_pool:
+            logger.warning("Analysis worker pool broken, restarting it")
+            pool.shutdown(wait=False, cancel_futures=True)
+            analysis_pool = _new_analysis_pool()
+        raise
+
+
+def deliver_paragraph(token: str, paragraph):
+    """Queue a streamed paragraph for its response; thread-safe, late arrivals are dropped"""
+    stream = paragraph_streams.get(token)
+    if stream is not None:
+        loop, paragraphs = stream
+        loop.call_soon_threadsafe(paragraphs.put_nowait, paragraph)
+
+
+def stream_paragraph_sink(token: str):
+    """Where a parse running in this process (worker or thread) sends the paragraphs of stream `token`"""
+    if _worker_paragraph_queue is not None:
+        return lambda paragraph: _worker_paragraph_queue.put((token, paragraph))
+    return lambda paragraph: deliver_paragraph(token, paragraph)
+
+
+async def create_indexes(database):
+    """Create the indexes the API queries rely on"""
+    # History pages are read newest first with (timestamp, id) as the cursor
+    await database.pdf_analyses.create_index([("timestamp", -1), ("id", -1)])
+    # Sparse: analyses stored before deduplication have no key
+    await database.pdf_analyses.create_index("analysis_key", unique=True, sparse=True)
+    await database.parsed_documents.create_index(
+        [("content_hash", 1), ("parser_version", 1)], unique=True
+    )
+    await database.status_checks.create_index([("timestamp", -1)])
+    # Last: duplicate ids stored before ids were unique make this one fail
+    await database.pdf_analyses.create_index("id", unique=True)
+
+
+async def migrate_timestamps(database) -> int:
+    """
+    Convert analyses stored with ISO string timestamps to BSON dates; returns how many were converted.
+    Strings that don't parse are logged and left as they are.
+    """
+    legacy = await database.pdf_analyses.find(
+        {"timestamp": {"$type": "string"}},
+        {"_id": 1, "timestamp": 1}
+    ).to_list(None)
+    updates = []
+    for doc in legacy:
+        try:
+            timestamp = datetime.fromisoformat(doc["timestamp"])
+        except ValueError:
+            logger.warning(f"Skipping analysis {doc['_id']} with unparsable timestamp {doc['timestamp']!r}")
+            continue
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"timestamp": timestamp}}))
+    if not updates:
+        return 0
+    await database.pdf_analyses.bulk_write(updates, ordered=False)
+    return len(updates)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -38,30 +223,44 @@ async def lifespan(app: FastAPI):
     global client, db
     
     # Startup
+    await start_analysis_pool()
+    
     try:
         logger.info("Connecting to MongoDB...")
         client = AsyncIOMotorClient(
             mongo_url,
             serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=5000
+            connectTimeoutMS=5000,
+            tz_aware=True
         )
         # Test connection
         await client.admin.command('ping')
         db = client[db_name]
-        
-        # Create indexes
-        await db.pdf_analyses.create_index([("timestamp", -1)])
-        await db.status_checks.create_index([("timestamp", -1)])
-        logger.info("Database indexes created successfully")
         logger.info("MongoDB connection established successfully")
     except Exception as e:
         logger.warning(f"MongoDB connection failed: {e}. App will run without database.")
         # Create a None db so the app can still serve static endpoints
         db = None
     
+    # Index and migration failures (e.g. duplicate ids stored earlier) keep the working connection
+    if db is not None:
+        try:
+            await create_indexes(db)
+            logger.info("Database indexes created successfully")
+        except Exception as e:
+            logger.warning(f"Creating database indexes failed: {e}")
+        try:
+            migrated = await migrate_timestamps(db)
+            if migrated:
+                logger.info(f"Converted {migrated} analysis timestamps to dates")
+        except Exception as e:
+            logger.warning(f"Converting analysis timestamps failed: {e}")
+    
     yield
     
     # Shutdown
+    await persistence_queue.stop()
+    stop_analysis_pool()
     if client:
         client.close()
         logger.info("MongoDB connection closed")
@@ -76,6 +275,48 @@ api_router = APIRouter(prefix="/api")
 # Constants
 WORDS_PER_MINUTE = 180
 QUESTION_ANSWER_TIME = 35  # seconds
+EXTRA_CONTENT_TIME = 40  # seconds added per image, scripture or note in a paragraph
+FIXED_TOTAL_TIME = 3600  # Study duration is always 60 minutes
+# Bump whenever the parser output changes so cached analyses are not reused
+PARSER_VERSION = "2"
+# Watchtower study layout: body 11 pt, questions 9 pt, paragraph numbers 6.8 pt.
+# Bands are derived per document from the body size; these ratios bound the search
+QUESTION_SIZE_RATIO = (0.7, 0.9)
+PARA_NUMBER_SIZE_RATIO = (0.45, 0.75)
+
+# Analysis result cache: in-memory LRU limit and optional on-disk tier
+ANALYSIS_CACHE_MAX_BYTES = int(os.environ.get('ANALYSIS_CACHE_MAX_MB', '64')) * 1024 * 1024
+ANALYSIS_CACHE_DIR = os.environ.get('ANALYSIS_CACHE_DIR', '')
+# Uploads are streamed to disk in chunks; larger files are rejected before parsing
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '50')) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_TMP_DIR = os.environ.get('UPLOAD_TMP_DIR') or None
+# Long PDFs get their spans extracted page-parallel across the worker pool
+PARALLEL_EXTRACTION_MIN_PAGES = int(os.environ.get('PARALLEL_EXTRACTION_MIN_PAGES', '24'))
+# Separator detection gives up on a page after this many path items (vector-heavy illustrations)
+SEPARATOR_MAX_PATH_ITEMS = int(os.environ.get('SEPARATOR_MAX_PATH_ITEMS', '2000'))
+# Batch analysis: maximum PDFs per request (files plus ZIP members) and ZIP size
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', '100'))
+MAX_BATCH_ZIP_BYTES = int(os.environ.get('MAX_BATCH_ZIP_MB', '500')) * 1024 * 1024
+# Whole request body limit for /api/analyze-batch, checked before the form is parsed
+MAX_BATCH_REQUEST_BYTES = int(os.environ.get('MAX_BATCH_REQUEST_MB', '500')) * 1024 * 1024
+# Settings-independent parse results kept in memory for /analyses/{id}/retime
+PARSED_STORE_MAX_ENTRIES = int(os.environ.get('PARSED_STORE_MAX_ENTRIES', '256'))
+# Recently produced or fetched full results kept in memory for GET /api/analyses/{id}
+RECENT_ANALYSES_MAX_BYTES = int(os.environ.get('RECENT_ANALYSES_MAX_MB', '16')) * 1024 * 1024
+# Write-behind persistence: batch size, flush timer, queue bound and circuit breaker
+PERSIST_BATCH_SIZE = int(os.environ.get('PERSIST_BATCH_SIZE', '50'))
+PERSIST_FLUSH_INTERVAL_MS = int(os.environ.get('PERSIST_FLUSH_INTERVAL_MS', '200'))
+PERSIST_QUEUE_MAX = int(os.environ.get('PERSIST_QUEUE_MAX', '10000'))
+PERSIST_BREAKER_FAILURES = int(os.environ.get('PERSIST_BREAKER_FAILURES', '3'))
+PERSIST_BREAKER_COOLDOWN_SECONDS = float(os.environ.get('PERSIST_BREAKER_COOLDOWN_SECONDS', '30'))
+# Stored analyses: ids derived from content hash and settings, parsed text zlib-compressed once per hash
+ANALYSIS_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "pdf-reading-timer/analyses")
+PARSED_COMPRESSION_LEVEL = int(os.environ.get('PARSED_COMPRESSION_LEVEL', '6'))
+# JSON responses at least this large are compressed when the client accepts br or gzip
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '6'))
+RESPONSE_BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', '5'))
 
 # Define Models
 class QuestionInfo(BaseModel):
@@ -117,6 +358,79 @@ class PDFAnalysisResult(BaseModel):
     total_scriptures: int = 0  # Questions with scripture references
     total_notes: int = 0  # Questions with note references
 
+# Parser output. Plain slotted dataclasses: the pipeline creates hundreds of
+# them per document without Pydantic validation, and they pickle cheaply back
+# from the worker processes. The API models above are validated once, from
+# plain data, when the result stages assemble the response.
+@dataclass(slots=True)
+class ParsedQuestion:
+    """A question as found by the parser; becomes a QuestionInfo in the response"""
+    text: str
+    answer_time: int = QUESTION_ANSWER_TIME
+    is_final_question: bool = False
+    parenthesis_content: str = ""
+    content_type: str = ""
+
+@dataclass(slots=True)
+class ParsedParagraph:
+    """Paragraph data that does not depend on reading speed or answer time"""
+    number: int
+    text: str
+    word_count: int
+    questions: List[ParsedQuestion] = field(default_factory=list)
+    timed_questions: int = 0  # Leading entries of questions that take answer time
+    grouped_with: List[int] = field(default_factory=list)
+    has_image: bool = False
+    has_scripture: bool = False
+    has_note: bool = False
+
+@dataclass(slots=True)
+class ParsedDocument:
+    """Settings-independent parser output; build_analysis_result turns it into a PDFAnalysisResult"""
+    paragraphs: List[ParsedParagraph]
+    parser_version: str = PARSER_VERSION
+    parser_mode: str = "font"  # "font" or "text" (fallback)
+    final_questions: List[ParsedQuestion] = field(default_factory=list)
+    final_questions_title: str = ""
+    total_paragraph_questions: int = 0
+    total_images: int = 0
+    total_scriptures: int = 0
+    total_notes: int = 0
+
+# JSON and dict (de)serialization of parsed documents for storage
+parsed_document_adapter = TypeAdapter(ParsedDocument)
+
+class BatchItemResult(BaseModel):
+    filename: str
+    result: Optional[PDFAnalysisResult] = None
+    error: str = ""  # Error message when this file could not be analyzed
+
+class BatchAnalysisResult(BaseModel):
+    total_files: int
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+class AnalysisSummary(BaseModel):
+    """History entry: totals of a stored analysis without paragraphs or questions"""
+    id: str
+    filename: str
+    timestamp: datetime
+    total_words: int
+    total_paragraphs: int
+    total_questions: int
+    total_reading_time_seconds: float
+    total_question_time_seconds: float
+    total_time_seconds: float = 3600
+    final_questions_start_time: float = 0
+    total_paragraph_questions: int = 0
+    total_review_questions: int = 0
+    total_images: int = 0
+    total_scriptures: int = 0
+    total_notes: int = 0
+    wpm: Optional[int] = None
+    answer_time_seconds: Optional[int] = None
+
 class StatusCheck(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -137,34 +451,309 @@ class TextLine:
         return f"TextLine({self.font_size:.1f}: {self.text[:50]}...)"
 
 
-def extract_text_with_sizes(pdf_bytes: bytes) -> List[TextLine]:
-    """Extract text from PDF with font size information using PyMuPDF.
-    Returns individual spans to preserve font size information."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    lines = []
+# Text extraction flags: the 'dict' layout without image blocks, whose bytes are never used
+TEXT_EXTRACTION_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+class SpanTable:
+    """
+    Columnar store of the non-empty text spans of a document, in reading order.
     
-    for page in doc:
-        blocks = page.get_text('dict')['blocks']
-        for block in blocks:
-            if 'lines' in block:
-                for line in block['lines']:
-                    for span in line['spans']:
-                        text = span['text'].strip()
-                        size = span['size']
-                        if text:
-                            lines.append(TextLine(text, round(size, 1)))
+    Text is kept in one list; font size, flags, page number and bbox live in
+    typed array columns, so a span costs a few machine words instead of an
+    object with a __dict__. Iterating the table yields (text, font_size) pairs.
+    """
+    __slots__ = ('text', 'size', 'flags', 'page', 'x0', 'y0', 'x1', 'y1')
+    
+    def __init__(self):
+        self.text = []
+        self.size = array('d')  # rounded to 0.1 pt
+        self.flags = array('i')
+        self.page = array('i')
+        self.x0 = array('f')
+        self.y0 = array('f')
+        self.x1 = array('f')
+        self.y1 = array('f')
+    
+    def __len__(self):
+        return len(self.text)
+    
+    def __iter__(self):
+        return zip(self.text, self.size)
+    
+    def append_page(self, page_num: int, page_dict: dict):
+        """Append the non-empty spans of a page's text dict"""
+        text, size, flags, page = self.text, self.size, self.flags, self.page
+        x0, y0, x1, y1 = self.x0, self.y0, self.x1, self.y1
+        for block in page_dict['blocks']:
+            for line in block.get('lines', ()):
+                for span in line['spans']:
+                    span_text = span['text'].strip()
+                    if span_text:
+                        text.append(span_text)
+                        size.append(round(span['size'], 1))
+                        flags.append(span['flags'])
+                        page.append(page_num)
+                        bbox = span['bbox']
+                        x0.append(bbox[0])
+                        y0.append(bbox[1])
+                        x1.append(bbox[2])
+                        y1.append(bbox[3])
+    
+    def extend(self, other: "SpanTable"):
+        """Append all spans of other (e.g. the next page-range shard)"""
+        for column in self.__slots__:
+            getattr(self, column).extend(getattr(other, column))
+    
+    def sizes(self) -> np.ndarray:
+        """Font size column as a NumPy array (zero-copy view)"""
+        return np.frombuffer(self.size, dtype=np.float64)
+
+
+# Font band labels assigned to spans by LayoutProfile.classify
+BAND_OTHER = 0
+BAND_BODY = 1
+BAND_QUESTION = 2
+BAND_PARA_NUMBER = 3
+
+
+def _size_clusters(sizes: np.ndarray, weights: np.ndarray) -> List[tuple]:
+    """
+    Group a weighted size histogram into clusters of sizes at most 0.3 pt apart.
+    Returns (center, weight) per cluster, center being its heaviest size.
+    """
+    if sizes.size == 0:
+        return []
+    values, inverse = np.unique(sizes, return_inverse=True)
+    counts = np.bincount(inverse, weights=weights)
+    breaks = np.flatnonzero(np.diff(values) > 0.3) + 1
+    clusters = []
+    for cluster_values, cluster_counts in zip(np.split(values, breaks), np.split(counts, breaks)):
+        clusters.append((float(cluster_values[cluster_counts.argmax()]), float(cluster_counts.sum())))
+    return clusters
+
+
+def _heaviest_cluster(clusters: List[tuple], low: float, high: float) -> Optional[float]:
+    """Center of the heaviest cluster with its center in [low, high], if any"""
+    candidates = [(weight, center) for center, weight in clusters if low <= center <= high]
+    return max(candidates)[1] if candidates else None
+
+
+class LayoutProfile:
+    """
+    Font size bands of one document: body text, questions and paragraph numbers.
+    
+    The body size is the heaviest cluster of the size histogram weighted by
+    characters. The question size is the heaviest cluster between
+    QUESTION_SIZE_RATIO times the body size, the paragraph-number size the
+    heaviest cluster of digit-only spans between PARA_NUMBER_SIZE_RATIO times
+    it. A missing cluster falls back to the Watchtower proportions.
+    """
+    __slots__ = ('body_size', 'question_size', 'para_number_size', 'bands')
+    
+    def __init__(self, body_size: float, question_size: float, para_number_size: float):
+        self.body_size = body_size
+        self.question_size = question_size
+        self.para_number_size = para_number_size
+        # Same widths as the original fixed windows (10.5-11.5, 8.5-9.5, 6.0-7.5)
+        self.bands = {
+            BAND_BODY: (round(body_size - 0.5, 2), round(body_size + 0.5, 2)),
+            BAND_PARA_NUMBER: (round(para_number_size - 0.8, 2), round(para_number_size + 0.7, 2)),
+            BAND_QUESTION: (round(question_size - 0.5, 2), round(question_size + 0.5, 2)),
+        }
+    
+    @classmethod
+    def from_spans(cls, spans: SpanTable) -> "LayoutProfile":
+        sizes = spans.sizes()
+        weights = np.fromiter(map(len, spans.text), dtype=np.float64, count=len(spans))
+        clusters = _size_clusters(sizes, weights)
+        body_size = max(clusters, key=lambda c: (c[1], c[0]))[0]
+        
+        question_size = _heaviest_cluster(
+            clusters, body_size * QUESTION_SIZE_RATIO[0], body_size * QUESTION_SIZE_RATIO[1])
+        if question_size is None:
+            question_size = round(body_size * 9.0 / 11.0, 1)
+        
+        digits = np.fromiter(map(str.isdigit, spans.text), dtype=bool, count=len(spans))
+        para_number_size = _heaviest_cluster(
+            _size_clusters(sizes[digits], weights[digits]),
+            body_size * PARA_NUMBER_SIZE_RATIO[0], body_size * PARA_NUMBER_SIZE_RATIO[1])
+        if para_number_size is None:
+            para_number_size = round(body_size * 6.8 / 11.0, 1)
+        
+        return cls(body_size, question_size, para_number_size)
+    
+    def classify(self, spans: SpanTable) -> List[int]:
+        """Band label of every span; the question band wins where bands overlap"""
+        sizes = spans.sizes()
+        labels = np.full(len(sizes), BAND_OTHER, dtype=np.uint8)
+        for band, (low, high) in self.bands.items():
+            labels[(sizes >= low) & (sizes <= high)] = band
+        return labels.tolist()
+
+
+class AnalyzedDocument:
+    """
+    A PDF opened once for the whole analysis of one upload.
+    
+    Every stage (span extraction, separator detection, review questions and the
+    text-only fallback) reads pages through this object, so MuPDF parses the
+    document a single time. Each page's TextPage, text dict, plain text and
+    drawings are extracted lazily and at most once.
+    
+    The source is either the PDF bytes or the path of a file on disk; a path
+    lets MuPDF read the file directly without a bytes copy in Python.
+    """
+    def __init__(self, source: Union[bytes, str, Path]):
+        if isinstance(source, (bytes, bytearray)):
+            self.doc = fitz.open(stream=source, filetype="pdf")
+        else:
+            self.doc = fitz.open(str(source), filetype="pdf")
+        self._pages = {}
+        self._textpages = {}
+        self._page_dicts = {}
+        self._page_texts = {}
+        self._page_drawings = {}
+    
+    def __len__(self):
+        return len(self.doc)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def page(self, page_num: int):
+        """Loaded page object; kept alive because its TextPage references it"""
+        if page_num not in self._pages:
+            self._pages[page_num] = self.doc[page_num]
+        return self._pages[page_num]
+    
+    def textpage(self, page_num: int):
+        """TextPage of a page, created with the 'dict' flags (minus images) so it serves both dict and plain text"""
+        if page_num not in self._textpages:
+            self._textpages[page_num] = self.page(page_num).get_textpage(flags=TEXT_EXTRACTION_FLAGS)
+        return self._textpages[page_num]
+    
+    def page_dict(self, page_num: int) -> dict:
+        """Equivalent of page.get_text('dict')"""
+        if page_num not in self._page_dicts:
+            self._page_dicts[page_num] = self.page(page_num).get_text('dict', textpage=self.textpage(page_num))
+        return self._page_dicts[page_num]
+    
+    def append_spans(self, page_num: int, spans: SpanTable):
+        """
+        Append a page's spans to a SpanTable. The page dict is dropped right
+        away unless it was already cached, so only one is alive at a time.
+        """
+        if page_num in self._page_dicts:
+            spans.append_page(page_num, self._page_dicts[page_num])
+        else:
+            spans.append_page(page_num, self.page(page_num).get_text('dict', textpage=self.textpage(page_num)))
+    
+    def region_dict(self, page_num: int, clip) -> dict:
+        """
+        Text dict of the part of a page inside clip; may include spans outside it.
+        Reuses the full-page dict or TextPage when they were already extracted;
+        otherwise MuPDF only decodes the clipped area. Nothing is cached.
+        Only standalone review-question extraction gets here: the analysis
+        pipeline reads those spans from its SpanTable.
+        """
+        if page_num in self._page_dicts:
+            return self._page_dicts[page_num]
+        if page_num in self._textpages:
+            return self.page(page_num).get_text('dict', textpage=self._textpages[page_num])
+        return self.page(page_num).get_text('dict', clip=clip, flags=TEXT_EXTRACTION_FLAGS)
+    
+    def page_text(self, page_num: int) -> str:
+        """Equivalent of page.get_text()"""
+        if page_num not in self._page_texts:
+            self._page_texts[page_num] = self.page(page_num).get_text(textpage=self.textpage(page_num))
+        return self._page_texts[page_num]
+    
+    def page_drawings(self, page_num: int) -> list:
+        """Equivalent of page.get_cdrawings(): rects and points are plain tuples"""
+        if page_num not in self._page_drawings:
+            self._page_drawings[page_num] = self.page(page_num).get_cdrawings()
+        return self._page_drawings[page_num]
+    
+    def close(self):
+        self._textpages.clear()
+        self._pages.clear()
+        self.doc.close()
+
+
+@contextmanager
+def open_analyzed_document(source: Union[bytes, str, Path, AnalyzedDocument]):
+    """
+    Yield an AnalyzedDocument for raw PDF bytes, a file path or an already open document.
+    Documents opened here are closed on exit; documents passed in are left open
+    for the caller that owns them.
+    """
+    if isinstance(source, AnalyzedDocument):
+        yield source
+        return
     
-    doc.close()
-    return lines
+    document = AnalyzedDocument(source)
+    try:
+        yield document
+    finally:
+        document.close()
+
+
+def extract_span_table(pdf_source: Union[bytes, AnalyzedDocument]) -> SpanTable:
+    """Extract the text spans of a PDF with their font size, flags, page and bbox"""
+    spans = SpanTable()
+    with open_analyzed_document(pdf_source) as document:
+        for page_num in range(len(document)):
+            document.append_spans(page_num, spans)
+    return spans
+
+
+def extract_text_with_sizes(pdf_source: Union[bytes, AnalyzedDocument]) -> List[TextLine]:
+    """Extract text from PDF with font size information using PyMuPDF.
+    Returns individual spans to preserve font size information."""
+    return [TextLine(text, font_size) for text, font_size in extract_span_table(pdf_source)]
+
+
+def extract_page_range_spans(pdf_source: Union[bytes, str, Path], start: int, stop: int) -> SpanTable:
+    """
+    Extract spans of pages [start, stop) with their own fitz document.
+    One shard of the page-parallel extraction; top-level so it can run in a worker process.
+    """
+    spans = SpanTable()
+    with AnalyzedDocument(pdf_source) as document:
+        for page_num in range(start, min(stop, len(document))):
+            document.append_spans(page_num, spans)
+    return spans
+
+
+async def extract_span_table_parallel(pdf_path: str, page_count: int, shards: int) -> SpanTable:
+    """
+    Page-parallel variant of extract_span_table for long documents.
+    Pages are split into contiguous ranges, each range is extracted in the
+    analysis worker pool and the tables are concatenated in page order,
+    so the output is identical to the sequential extraction.
+    """
+    shards = max(1, min(shards, page_count))
+    bounds = [page_count * i // shards for i in range(shards + 1)]
+    parts = await asyncio.gather(*(
+        run_analysis_task(extract_page_range_spans, pdf_path, bounds[i], bounds[i + 1])
+        for i in range(shards)
+    ))
+    spans = SpanTable()
+    for part in parts:
+        spans.extend(part)
+    return spans
 
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+def extract_text_from_pdf(pdf_source: Union[bytes, AnalyzedDocument]) -> str:
     """Extract text from PDF bytes using PyMuPDF"""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     text = ""
-    for page in doc:
-        text += page.get_text()
-    doc.close()
+    with open_analyzed_document(pdf_source) as document:
+        for page_num in range(len(document)):
+            text += document.page_text(page_num)
     return text
 
 
@@ -390,13 +979,13 @@ def extract_lea_scriptures_from_text(text: str) -> List[dict]:
     return scriptures
 
 
-def create_question_info(question_text: str, answer_time: int, is_final_question: bool = False) -> QuestionInfo:
+def create_question_info(question_text: str, answer_time: int, is_final_question: bool = False) -> ParsedQuestion:
     """
-    Helper function to create QuestionInfo with parenthesis extraction.
+    Helper function to create a ParsedQuestion with parenthesis extraction.
     Uses extract_question_with_parenthesis to extract and classify content in parentheses.
     """
     extracted = extract_question_with_parenthesis(question_text)
-    return QuestionInfo(
+    return ParsedQuestion(
         text=extracted["text"],
         answer_time=answer_time,
         is_final_question=is_final_question,
@@ -527,64 +1116,148 @@ def process_pdf_with_font_sizes(pdf_bytes: bytes) -> dict:
     }
 
 
-def detect_horizontal_line_separator(pdf_bytes: bytes) -> dict:
+def detect_horizontal_line_separator(pdf_source: Union[bytes, AnalyzedDocument]) -> dict:
     """
     Detect horizontal line separator in PDF that marks the start of final questions section.
     Returns information about the line position.
     """
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        
-        last_line_page = -1
-        last_line_y = -1
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            page_height = page.rect.height
-            drawings = page.get_drawings()
-            
-            for drawing in drawings:
-                rect = drawing.get('rect')
-                if rect:
-                    width = rect.width
-                    height = rect.height
-                    # Horizontal line: wide (>200) and short (<5)
-                    if width > 200 and height < 5:
-                        # Check if it's in the lower portion of the page
-                        if rect.y0 > page_height * 0.3:
-                            last_line_page = page_num
-                            last_line_y = rect.y0
-                
-                # Also check line paths
-                items = drawing.get('items', [])
-                for item in items:
-                    if item[0] == 'l':  # Line
-                        start = item[1]
-                        end = item[2]
-                        if abs(start.y - end.y) < 2:  # Horizontal
-                            line_width = abs(end.x - start.x)
-                            if line_width > 200 and start.y > page_height * 0.3:
-                                last_line_page = page_num
-                                last_line_y = start.y
-        
-        doc.close()
-        
-        return {
-            "found": last_line_page >= 0,
-            "page": last_line_page,
-            "y_position": last_line_y
-        }
+        with open_analyzed_document(pdf_source) as document:
+            return _detect_horizontal_line_separator(document)
     except Exception as e:
         logging.warning(f"Error detecting horizontal line: {e}")
-        return {"found": False, "page": -1, "y_position": -1}
+        return {"found": False, "page": -1, "y_position": -1, "pages_inspected": 0, "paths_inspected": 0}
+
+
+def _detect_horizontal_line_separator(document: AnalyzedDocument) -> dict:
+    """
+    Find the last horizontal line in the lower 70% of a page.
+    Pages are scanned from the last one backwards, and within a page in reverse
+    drawing order, so the first qualifying line found is the last one of the
+    document. A page with more than SEPARATOR_MAX_PATH_ITEMS path items is
+    abandoned at the cap.
+    """
+    pages_inspected = 0
+    paths_inspected = 0
+    
+    for page_num in range(len(document) - 1, -1, -1):
+        pages_inspected += 1
+        min_y = document.page(page_num).rect.height * 0.3
+        budget = SEPARATOR_MAX_PATH_ITEMS
+        
+        for drawing in reversed(document.page_drawings(page_num)):
+            # Line paths come after the drawing rect in forward order, so check them first
+            for item in reversed(drawing.get('items', ())):
+                paths_inspected += 1
+                budget -= 1
+                if item[0] == 'l':  # Line
+                    (x0, y0), (x1, y1) = item[1], item[2]
+                    # Horizontal, wide (>200) and in the lower portion of the page
+                    if abs(y0 - y1) < 2 and abs(x1 - x0) > 200 and y0 > min_y:
+                        return _separator_info(page_num, y0, pages_inspected, paths_inspected)
+                if budget <= 0:
+                    break
+            if budget <= 0:
+                break
+            
+            rect = drawing.get('rect')
+            if rect:
+                x0, y0, x1, y1 = rect
+                # Horizontal line: wide (>200) and short (<5)
+                if x1 - x0 > 200 and y1 - y0 < 5 and y0 > min_y:
+                    return _separator_info(page_num, y0, pages_inspected, paths_inspected)
+    
+    return _separator_info(-1, -1, pages_inspected, paths_inspected)
+
+
+def _separator_info(page_num: int, y_position: float, pages_inspected: int, paths_inspected: int) -> dict:
+    return {
+        "found": page_num >= 0,
+        "page": page_num,
+        "y_position": y_position,
+        "pages_inspected": pages_inspected,
+        "paths_inspected": paths_inspected
+    }
+
+
+def _collect_text_items_after_line(document: AnalyzedDocument, line_info: dict) -> list:
+    """
+    Collect (page, y_pos, font_size, text, is_bold) spans below the separator and on later pages,
+    for documents without a SpanTable. Only the region below the line is decoded on the
+    separator page unless that page was already extracted.
+    """
+    line_page = line_info["page"]
+    line_y = line_info["y_position"]
+    
+    text_items = []  # List of (page, y_pos, font_size, text, is_bold)
+    
+    # Get text from the page with the line, below the line
+    if line_page >= 0 and line_page < len(document):
+        page_rect = document.page(line_page).rect
+        below_line = fitz.Rect(page_rect.x0, line_y, page_rect.x1, page_rect.y1)
+        blocks = document.region_dict(line_page, below_line)['blocks']
+        
+        for block in blocks:
+            if 'lines' in block:
+                for line in block['lines']:
+                    for span in line['spans']:
+                        text = span['text'].strip()
+                        font_size = span['size']
+                        y_pos = span['bbox'][1]
+                        flags = span.get('flags', 0)
+                        is_bold = bool(flags & 16)  # Bold flag
+                        # Only include text that starts below the line
+                        if y_pos > line_y + 5 and text:
+                            text_items.append((line_page, y_pos, font_size, text, is_bold))
+    
+    # Also get text from pages after the line page
+    for page_num in range(line_page + 1, len(document)):
+        blocks = document.page_dict(page_num)['blocks']
+        for block in blocks:
+            if 'lines' in block:
+                for line in block['lines']:
+                    for span in line['spans']:
+                        text = span['text'].strip()
+                        font_size = span['size']
+                        y_pos = span['bbox'][1]
+                        flags = span.get('flags', 0)
+                        is_bold = bool(flags & 16)
+                        if text:
+                            text_items.append((page_num, y_pos, font_size, text, is_bold))
+    
+    return text_items
 
 
-def extract_questions_after_horizontal_line(pdf_bytes: bytes, line_info: dict) -> tuple:
+def _span_items_after_line(spans: SpanTable, line_info: dict) -> list:
+    """
+    Same (page, y_pos, font_size, text, is_bold) items as _collect_text_items_after_line,
+    read from an already extracted SpanTable so no page is decoded again.
+    """
+    line_page = line_info["page"]
+    min_y = line_info["y_position"] + 5
+    text, size, flags, page, y0 = spans.text, spans.size, spans.flags, spans.page, spans.y0
+    
+    # Pages are stored in ascending order: start at the separator page
+    text_items = []
+    for i in range(bisect_left(page, line_page), len(spans)):
+        # On the separator page, only text that starts below the line
+        if page[i] > line_page or y0[i] > min_y:
+            text_items.append((page[i], y0[i], size[i], text[i], bool(flags[i] & 16)))
+    return text_items
+
+
+def extract_questions_after_horizontal_line(
+    pdf_source: Union[bytes, AnalyzedDocument],
+    line_info: dict,
+    spans: Optional[SpanTable] = None
+) -> tuple:
     """
     Extract questions that appear after the horizontal line separator.
     These are the final discussion questions (Preguntas de Repaso).
+    When the document's SpanTable is given, the spans are taken from it
+    instead of decoding the pages again.
     
-    Returns a tuple: (list of QuestionInfo, bold title string)
+    Returns a tuple: (list of ParsedQuestion, bold title string)
     
     The format can be:
     1. Traditional: "1. ¿Pregunta?" numbered questions
@@ -597,56 +1270,20 @@ def extract_questions_after_horizontal_line(pdf_bytes: bytes, line_info: dict) -
         return final_questions, bold_title
     
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        line_page = line_info["page"]
-        line_y = line_info["y_position"]
-        
-        text_items = []  # List of (y_pos, font_size, text, is_bold)
+        if spans is not None:
+            text_items = _span_items_after_line(spans, line_info)
+        else:
+            with open_analyzed_document(pdf_source) as document:
+                text_items = _collect_text_items_after_line(document, line_info)
         
-        # Get text from the page with the line, below the line
-        if line_page >= 0 and line_page < len(doc):
-            page = doc[line_page]
-            blocks = page.get_text('dict')['blocks']
-            
-            for block in blocks:
-                if 'lines' in block:
-                    for line in block['lines']:
-                        for span in line['spans']:
-                            text = span['text'].strip()
-                            font_size = span['size']
-                            y_pos = span['bbox'][1]
-                            flags = span.get('flags', 0)
-                            is_bold = bool(flags & 16)  # Bold flag
-                            # Only include text that starts below the line
-                            if y_pos > line_y + 5 and text:
-                                text_items.append((y_pos, font_size, text, is_bold))
-        
-        # Also get text from pages after the line page
-        for page_num in range(line_page + 1, len(doc)):
-            page = doc[page_num]
-            blocks = page.get_text('dict')['blocks']
-            for block in blocks:
-                if 'lines' in block:
-                    for line in block['lines']:
-                        for span in line['spans']:
-                            text = span['text'].strip()
-                            font_size = span['size']
-                            y_pos = span['bbox'][1]
-                            flags = span.get('flags', 0)
-                            is_bold = bool(flags & 16)
-                            if text:
-                                text_items.append((y_pos + (page_num - line_page) * 1000, font_size, text, is_bold))
-        
-        doc.close()
-        
-        # Sort by position
-        text_items.sort(key=lambda x: x[0])
+        # Sort by position: page first, then vertical position within the page
+        text_items.sort(key=lambda x: (x[0], x[1]))
         
         # Parse the questions
         bullet_points = []
         numbered_questions = []
         
-        for y_pos, font_size, text, is_bold in text_items:
+        for page_num, y_pos, font_size, text, is_bold in text_items:
             # Skip song references at the end - "CANCIÓN" followed by space and number
             text_upper = text.upper()
             if re.match(r'^CANCI[OÓ]N\s+\d+', text_upper):
@@ -704,7 +1341,7 @@ def calculate_reading_time(word_count: int, wpm: int = WORDS_PER_MINUTE) -> floa
     return (word_count / wpm) * 60
 
 
-def detect_questions(text: str, paragraph_number: int, is_final_question: bool = False) -> List[QuestionInfo]:
+def detect_questions(text: str, paragraph_number: int, is_final_question: bool = False) -> List[ParsedQuestion]:
     """
     Detect questions in paragraph that start with the paragraph number.
     Formats supported (in order of priority):
@@ -770,13 +1407,14 @@ def detect_questions(text: str, paragraph_number: int, is_final_question: bool =
     return questions
 
 
-def extract_final_questions(text: str, pdf_bytes: bytes = None) -> List[QuestionInfo]:
+def extract_final_questions(text: str, pdf_bytes: Union[bytes, AnalyzedDocument] = None) -> List[ParsedQuestion]:
     """
     Extract questions that appear AFTER the horizontal line separator at the bottom.
     These are the final discussion questions (Preguntas de Repaso).
     
     The function first tries to detect a horizontal line in the PDF graphics.
-    If pdf_bytes is provided, it uses the line position to find questions after it.
+    If pdf_bytes (raw bytes or an open AnalyzedDocument) is provided, it uses the
+    line position to find questions after it.
     Otherwise, falls back to text-based detection.
     """
     final_questions = []
@@ -784,84 +1422,48 @@ def extract_final_questions(text: str, pdf_bytes: bytes = None) -> List[Question
     # Try to find horizontal line separator using PDF graphics
     if pdf_bytes:
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            
-            # Find the last significant horizontal line in the document
-            last_line_page = -1
-            last_line_y = -1
-            
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                page_height = page.rect.height
-                drawings = page.get_drawings()
+            with open_analyzed_document(pdf_bytes) as document:
+                # Find the last significant horizontal line in the document
+                line_info = _detect_horizontal_line_separator(document)
+                last_line_page = line_info["page"]
+                last_line_y = line_info["y_position"]
                 
-                for drawing in drawings:
-                    rect = drawing.get('rect')
-                    if rect:
-                        width = rect.width
-                        height = rect.height
-                        # Horizontal line: wide (>200) and short (<5)
-                        if width > 200 and height < 5:
-                            # Check if it's in the lower half of the page (likely separator)
-                            if rect.y0 > page_height * 0.3:
-                                last_line_page = page_num
-                                last_line_y = rect.y0
+                # If we found a horizontal line, extract text after it
+                text_after_line = []
+                if last_line_page >= 0 and last_line_y > 0:
+                    # Get text blocks with position info from the page with the line
+                    blocks = document.page_dict(last_line_page)['blocks']
+                    
+                    for block in blocks:
+                        if 'lines' in block:
+                            block_top = block.get('bbox', [0, 0, 0, 0])[1]
+                            # Only include text that starts below the line
+                            if block_top > last_line_y + 5:
+                                for line in block['lines']:
+                                    line_text = ''
+                                    for span in line['spans']:
+                                        line_text += span['text']
+                                    if line_text.strip():
+                                        text_after_line.append(line_text.strip())
                     
-                    # Also check line paths
-                    items = drawing.get('items', [])
-                    for item in items:
-                        if item[0] == 'l':  # Line
-                            start = item[1]
-                            end = item[2]
-                            if abs(start.y - end.y) < 2:  # Horizontal
-                                line_width = abs(end.x - start.x)
-                                if line_width > 200 and start.y > page_height * 0.3:
-                                    last_line_page = page_num
-                                    last_line_y = start.y
+                    # Also get text from pages after the line page
+                    for page_num in range(last_line_page + 1, len(document)):
+                        page_text = document.page_text(page_num)
+                        for line in page_text.split('\n'):
+                            if line.strip():
+                                text_after_line.append(line.strip())
             
-            # If we found a horizontal line, extract text after it
-            if last_line_page >= 0 and last_line_y > 0:
-                # Get all text from the page with the line, below the line
-                page = doc[last_line_page]
-                
-                # Get text blocks with position info
-                blocks = page.get_text('dict')['blocks']
-                text_after_line = []
-                
-                for block in blocks:
-                    if 'lines' in block:
-                        block_top = block.get('bbox', [0, 0, 0, 0])[1]
-                        # Only include text that starts below the line
-                        if block_top > last_line_y + 5:
-                            for line in block['lines']:
-                                line_text = ''
-                                for span in line['spans']:
-                                    line_text += span['text']
-                                if line_text.strip():
-                                    text_after_line.append(line_text.strip())
-                
-                # Also get text from pages after the line page
-                for page_num in range(last_line_page + 1, len(doc)):
-                    page_text = doc[page_num].get_text()
-                    for line in page_text.split('\n'):
-                        if line.strip():
-                            text_after_line.append(line.strip())
-                
-                doc.close()
-                
-                # Parse questions from text after the line
-                for line in text_after_line:
-                    # Pattern: "número. pregunta?" - one or two digits, period, then question
-                    match = re.match(r'^(\d{1,2})\.\s*(.+\?)$', line, re.IGNORECASE)
-                    if match:
-                        question_text = match.group(2).strip()
-                        if len(question_text) > 5:
-                            final_questions.append(create_question_info(question_text, QUESTION_ANSWER_TIME, True))
-                
-                if final_questions:
-                    return final_questions
-            else:
-                doc.close()
+            # Parse questions from text after the line
+            for line in text_after_line:
+                # Pattern: "número. pregunta?" - one or two digits, period, then question
+                match = re.match(r'^(\d{1,2})\.\s*(.+\?)$', line, re.IGNORECASE)
+                if match:
+                    question_text = match.group(2).strip()
+                    if len(question_text) > 5:
+                        final_questions.append(create_question_info(question_text, QUESTION_ANSWER_TIME, True))
+            
+            if final_questions:
+                return final_questions
         except Exception as e:
             logging.warning(f"Error detecting horizontal line: {e}")
     
@@ -914,9 +1516,171 @@ def extract_final_questions(text: str, pdf_bytes: bytes = None) -> List[Question
     return final_questions
 
 
-def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisResult:
+# Stages of the analysis pipeline, in order. The parse stages do not depend on
+# the timing settings; the result stages apply them to a ParsedDocument.
+PARSE_STAGES = ("open", "extract", "classify", "group", "assign", "enrich")
+RESULT_STAGES = ("time", "assemble")
+
+# Callables hook(stage, wall_seconds, cpu_seconds, items), notified by StageTrace.emit
+stage_hooks = []
+
+
+class StageTrace:
+    """
+    Wall time, CPU time and item count of each pipeline stage of one analysis.
+    Records are plain (stage, wall_seconds, cpu_seconds, items) tuples, so a trace
+    filled in a worker process can be sent back and emitted in the server process.
+    """
+    def __init__(self, records: Optional[list] = None):
+        self.records = records if records is not None else []
+    
+    def record(self, stage: str, wall_seconds: float, cpu_seconds: float, items: int):
+        self.records.append((stage, wall_seconds, cpu_seconds, items))
+    
+    @contextmanager
+    def measure(self, stage: str):
+        """Time the enclosed block; set .items on the yielded object to record a count"""
+        measurement = _StageMeasurement()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        yield measurement
+        self.record(stage, time.perf_counter() - wall_start, time.thread_time() - cpu_start, measurement.items)
+    
+    def emit(self):
+        """Pass every record to the registered stage hooks"""
+        for hook in stage_hooks:
+            for record in self.records:
+                try:
+                    hook(*record)
+                except Exception as e:
+                    logger.warning(f"Stage hook failed: {e}")
+
+
+class _StageMeasurement:
+    __slots__ = ('items',)
+    
+    def __init__(self):
+        self.items = 0
+
+
+class AnalysisContext:
+    """State handed from stage to stage; each stage reads what the earlier ones left"""
+    def __init__(self, source=None, spans: Optional[SpanTable] = None, text: Optional[str] = None):
+        self.source = source
+        self.trace = None
+        self.document = None
+        self.owns_document = False
+        # "font" until the extract stage finds no spans, or from the start for plain text
+        self.parser_mode = "font" if text is None else "text"
+        self.spans = spans
+        self.text = text
+        self.separator_questions = None
+        self.bands = None
+        self.grouped_lines = None
+        self.paragraph_texts = None
+        self.paragraphs_data = None
+        self.parsed_paragraphs = None
+        self.final_questions = None
+        self.final_questions_title = ""
+        self.parsed = None
+        # Called with each ParsedParagraph as soon as a parse stage has built it (streaming)
+        self.paragraph_sink = None
+        self.paragraphs_emitted = 0
+        self.newly_parsed = None
+        # Result stages
+        self.filename = ""
+        self.wpm = WORDS_PER_MINUTE
+        self.answer_time = QUESTION_ANSWER_TIME
+        self.timed_paragraphs = None
+        self.timed_final_questions = None
+        self.totals = None
+        self.result = None
+
+
+def run_stages(ctx: AnalysisContext, stage_names: tuple, trace: Optional[StageTrace] = None):
+    """
+    Run the named stages in order, each with the variant for the current parser
+    mode, recording wall time, thread CPU time and the item count it returns.
+    Stages can record finer steps as "<stage>.<step>" through ctx.trace.
+    """
+    ctx.trace = trace if trace is not None else StageTrace()
+    for name in stage_names:
+        font_stage, text_stage = PIPELINE_STAGES[name]
+        stage = text_stage if ctx.parser_mode == "text" else font_stage
+        with ctx.trace.measure(name) as measurement:
+            measurement.items = stage(ctx)
+
+
+def _emit_paragraph(ctx: AnalysisContext, paragraph: ParsedParagraph):
+    """Hand a finished paragraph to the context's sink, if it has one"""
+    if ctx.paragraph_sink is not None:
+        ctx.paragraph_sink(paragraph)
+        ctx.paragraphs_emitted += 1
+
+
+def analyze_pdf_with_font_info(pdf_source: Union[bytes, AnalyzedDocument], filename: str) -> PDFAnalysisResult:
+    """Analyze PDF using font size information with the default settings"""
+    return analyze_pdf_with_font_info_configurable(pdf_source, filename)
+
+
+# Tokens emitted by lex_spans
+TOKEN_PARA_NUMBER = "paragraph_number"
+TOKEN_QUESTION_START = "question_start"
+TOKEN_QUESTION_CONTINUATION = "question_continuation"
+TOKEN_BODY = "body"
+TOKEN_REVIEW_MARKER = "review_marker"
+TOKEN_SONG_MARKER = "song_marker"
+TOKEN_OTHER = "other"
+
+_QUESTION_NUMBERS_RE = re.compile(r'^([\d,\s]+)\.\s*$')
+_REVIEW_MARKER_RE = re.compile(r'QUÉ RESPONDERÍA|QUE RESPONDERIA', re.IGNORECASE)
+_SONG_MARKER_RE = re.compile(r'CANCI[ÓO]N', re.IGNORECASE)
+
+
+def lex_spans(texts: List[str], bands: List[int], detect_review_section: bool = True):
+    """
+    Scan labeled spans once and yield (token, text, question_numbers) tuples.
+    
+    Question-band spans become TOKEN_QUESTION_START (e.g. "1, 2." with its
+    paragraph numbers) or TOKEN_QUESTION_CONTINUATION. Other spans become
+    TOKEN_REVIEW_MARKER ("¿Qué respondería?"), TOKEN_SONG_MARKER (a "Canción"
+    title after the review marker), TOKEN_PARA_NUMBER, TOKEN_BODY or TOKEN_OTHER.
+    With detect_review_section=False no review or song markers are emitted.
+    """
+    in_review_section = False
+    for text, band in zip(texts, bands):
+        if band == BAND_QUESTION:
+            num_match = _QUESTION_NUMBERS_RE.match(text)
+            if num_match:
+                numbers = [int(n.strip()) for n in num_match.group(1).split(',') if n.strip().isdigit()]
+                yield TOKEN_QUESTION_START, text, numbers
+            else:
+                yield TOKEN_QUESTION_CONTINUATION, text, None
+        elif text == '˛':
+            yield TOKEN_OTHER, text, None
+        elif detect_review_section and _REVIEW_MARKER_RE.search(text):
+            in_review_section = True
+            yield TOKEN_REVIEW_MARKER, text, None
+        elif in_review_section and _SONG_MARKER_RE.match(text):
+            yield TOKEN_SONG_MARKER, text, None
+        elif band == BAND_PARA_NUMBER and text.isdigit():
+            yield TOKEN_PARA_NUMBER, text, None
+        elif band == BAND_BODY:
+            yield TOKEN_BODY, text, None
+        else:
+            yield TOKEN_OTHER, text, None
+
+
+def parse_pdf_with_font_info(
+    pdf_source: Union[bytes, AnalyzedDocument], 
+    spans: Optional[SpanTable] = None,
+    trace: Optional[StageTrace] = None
+) -> ParsedDocument:
     """
-    Analyze PDF using font size information to detect questions.
+    Parse PDF structure using font size information, independent of timing settings.
+    Runs the parse stages of the pipeline; falls back to the text-only stages
+    when the PDF has no text spans.
+    spans can be passed in when they were already extracted (e.g. page-parallel).
     
     Format detected from Watchtower Study articles:
     - Paragraphs: Start with number in bold (size ~6.8), text in size ~11.0
@@ -925,93 +1689,116 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
     - Questions may span multiple lines at size 9.0
     - Final questions: After horizontal line separator at the bottom
     """
-    lines = extract_text_with_sizes(pdf_bytes)
+    ctx = AnalysisContext(source=pdf_source, spans=spans)
+    try:
+        run_stages(ctx, PARSE_STAGES, trace)
+    finally:
+        if ctx.owns_document:
+            ctx.document.close()
+    return ctx.parsed
+
+
+def _open_stage(ctx: AnalysisContext) -> int:
+    """Open the PDF once; every later stage reads from this document"""
+    if isinstance(ctx.source, AnalyzedDocument):
+        ctx.document = ctx.source
+    else:
+        ctx.document = AnalyzedDocument(ctx.source)
+        ctx.owns_document = True
+    return len(ctx.document)
+
+
+def _extract_stage(ctx: AnalysisContext) -> int:
+    """Text spans, plus the review questions below the separator line when there is one"""
+    document = ctx.document
+    if ctx.spans is None:
+        with ctx.trace.measure("extract.spans") as measurement:
+            ctx.spans = extract_span_table(document)
+            measurement.items = len(ctx.spans)
     
-    if not lines:
-        text = extract_text_from_pdf(pdf_bytes)
-        return analyze_pdf_content(text, filename)
+    if not ctx.spans:
+        # No text spans: continue on the text-only stages
+        ctx.parser_mode = "text"
+        ctx.text = extract_text_from_pdf(document)
+        return 0
     
     # Detect horizontal line position for final questions section
-    horizontal_line_info = detect_horizontal_line_separator(pdf_bytes)
+    with ctx.trace.measure("extract.separator") as measurement:
+        horizontal_line_info = detect_horizontal_line_separator(document)
+        measurement.items = horizontal_line_info.get("paths_inspected", 0)
     
-    # Identify font sizes used in document
-    size_counts = {}
-    for line in lines:
-        size_key = round(line.font_size, 1)
-        size_counts[size_key] = size_counts.get(size_key, 0) + 1
+    # Extract final questions after the separator using PDF position data
+    if horizontal_line_info and horizontal_line_info.get("found"):
+        with ctx.trace.measure("extract.review_questions") as measurement:
+            ctx.separator_questions = extract_questions_after_horizontal_line(
+                document, horizontal_line_info, ctx.spans
+            )
+            measurement.items = len(ctx.separator_questions[0])
+    return len(ctx.spans)
+
+
+def _classify_stage(ctx: AnalysisContext) -> int:
+    """Label every span with its font band (body, question, paragraph number)"""
+    ctx.bands = LayoutProfile.from_spans(ctx.spans).classify(ctx.spans)
+    return len(ctx.bands)
+
+
+def _group_stage(ctx: AnalysisContext) -> int:
+    spans, bands, separator_questions = ctx.spans, ctx.bands, ctx.separator_questions
     
-    if not size_counts:
-        text = extract_text_from_pdf(pdf_bytes)
-        return analyze_pdf_content(text, filename)
+    # Review questions found after the separator make the "¿Qué respondería?" marker irrelevant
+    detect_review_section = not (separator_questions and separator_questions[0])
     
-    # First pass: Group consecutive question lines (size ~9.0)
-    # This handles questions that span multiple lines
+    # First pass: Group consecutive question lines; each span is lexed exactly once
     grouped_lines = []
     current_question_parts = []
     current_question_nums = None
     
-    for line in lines:
-        text = line.text.strip()
-        font_size = round(line.font_size, 1)
-        
-        if not text:
-            continue
+    for kind, text, question_nums in lex_spans(spans.text, bands, detect_review_section):
+        if kind is TOKEN_QUESTION_START:
+            if current_question_parts and current_question_nums:
+                full_question = join_hyphenated_lines(current_question_parts)
+                grouped_lines.append(('question', current_question_nums, full_question))
             
-        is_question_size = 8.5 <= font_size <= 9.5
-        
-        if is_question_size:
-            # Check if this line starts with paragraph numbers (e.g., "4." or "1, 2.")
-            num_match = re.match(r'^([\d,\s]+)\.\s*$', text)
-            if num_match:
-                # Save previous question if exists
-                if current_question_parts and current_question_nums:
-                    full_question = join_hyphenated_lines(current_question_parts)
-                    grouped_lines.append(('question', current_question_nums, full_question))
-                
-                # Start new question
-                numbers_str = num_match.group(1)
-                current_question_nums = [int(n.strip()) for n in numbers_str.split(',') if n.strip().isdigit()]
-                current_question_parts = []
-            elif current_question_nums is not None:
-                # Continue current question
+            current_question_nums = question_nums
+            current_question_parts = []
+        elif kind is TOKEN_QUESTION_CONTINUATION:
+            if current_question_nums is not None:
                 current_question_parts.append(text)
-            else:
-                # Question line without number prefix - could be continuation or standalone
-                # Check if it's a question (contains ?)
-                if '?' in text:
-                    grouped_lines.append(('question_text', None, text))
-                else:
-                    grouped_lines.append(('other', font_size, text))
+            elif '?' in text:
+                grouped_lines.append(('question_text', None, text))
         else:
-            # Not a question line - save any pending question
             if current_question_parts and current_question_nums:
                 full_question = ' '.join(current_question_parts)
                 grouped_lines.append(('question', current_question_nums, full_question))
                 current_question_parts = []
                 current_question_nums = None
             
-            grouped_lines.append(('text', font_size, text))
+            grouped_lines.append((kind, None, text))
     
-    # Save last question if exists
     if current_question_parts and current_question_nums:
         full_question = ' '.join(current_question_parts)
         grouped_lines.append(('question', current_question_nums, full_question))
     
+    ctx.grouped_lines = grouped_lines
+    return len(grouped_lines)
+
+
+def _assign_stage(ctx: AnalysisContext) -> int:
+    grouped_lines, separator_questions = ctx.grouped_lines, ctx.separator_questions
+    
     # Second pass: Build paragraphs and assign questions
-    paragraphs_data = {}  # Dict: paragraph_number -> {text_lines, questions}
+    paragraphs_data = {}
     current_para_num = None
     current_para_lines = []
-    initial_para_lines = []  # Text before first numbered paragraph (paragraph 1)
+    initial_para_lines = []
     found_first_para_number = False
     final_questions = []
     final_questions_title = ""
-    found_final_section = False  # True when we're after the horizontal line
+    found_final_section = False
     
-    # Use horizontal line detection if available
-    if horizontal_line_info and horizontal_line_info.get("found"):
-        # We'll extract final questions separately using PDF position data
-        final_questions, final_questions_title = extract_questions_after_horizontal_line(pdf_bytes, horizontal_line_info)
-        # Mark that we should not collect more final questions during parsing
+    if separator_questions is not None:
+        final_questions, final_questions_title = separator_questions
         skip_final_detection = len(final_questions) > 0
     else:
         skip_final_detection = False
@@ -1023,7 +1810,6 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
             para_nums, question_text = item[1], item[2]
             
             if found_final_section and not skip_final_detection:
-                # Final questions (fallback if horizontal line detection didn't work)
                 questions = extract_multiple_questions(question_text)
                 for q in questions:
                     final_questions.append(create_question_info(q, QUESTION_ANSWER_TIME, True))
@@ -1031,14 +1817,11 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
                 # Regular question - check if it spans multiple paragraphs
                 if len(para_nums) > 1:
                     # Question spans multiple paragraphs (e.g., "1, 2.")
-                    # Mark all these paragraphs as grouped together
                     for pn in para_nums:
                         if pn not in paragraphs_data:
                             paragraphs_data[pn] = {"text_lines": [], "questions": [], "grouped_with": para_nums.copy()}
                         else:
                             paragraphs_data[pn]["grouped_with"] = para_nums.copy()
-                    
-                    # Assign question to the last paragraph in the group
                     target_para = para_nums[-1]
                 else:
                     target_para = para_nums[0]
@@ -1051,59 +1834,41 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
                     paragraphs_data[target_para]["questions"].append(create_question_info(q, QUESTION_ANSWER_TIME, False))
                     
         elif item_type == 'question_text':
-            # Question text without number (possibly final questions)
             question_text = item[2]
             if found_final_section and not skip_final_detection and '?' in question_text:
                 questions = extract_multiple_questions(question_text)
                 for q in questions:
                     final_questions.append(create_question_info(q, QUESTION_ANSWER_TIME, True))
                     
-        elif item_type == 'text':
-            font_size, text = item[1], item[2]
-            
-            # Skip ornament symbols
-            if text == '˛':
-                continue
-            
-            # Check for "¿QUÉ RESPONDERÍA?" marker (fallback if horizontal line not found)
-            text_upper = text.upper()
-            if not skip_final_detection and ("QUÉ RESPONDERÍA" in text_upper or "QUE RESPONDERIA" in text_upper):
-                found_final_section = True
-                # Save current paragraph
-                if current_para_num and current_para_lines:
-                    if current_para_num not in paragraphs_data:
-                        paragraphs_data[current_para_num] = {"text_lines": [], "questions": []}
-                    paragraphs_data[current_para_num]["text_lines"].extend(current_para_lines)
-                    current_para_lines = []
-                continue
-            
-            # If we're after the final questions marker (fallback), collect final questions
-            if found_final_section and not skip_final_detection:
-                # Skip song references
-                if text_upper.startswith("CANCIÓN") or text_upper.startswith("CANCION"):
-                    continue
-                # Questions contain "?" 
-                if '?' in text:
-                    questions = extract_multiple_questions(text)
-                    for q in questions:
-                        final_questions.append(create_question_info(q, QUESTION_ANSWER_TIME, True))
-                continue
-            
-            # Check if this is a paragraph number (size ~6.8, just a number)
-            is_para_number = 6.0 <= font_size <= 7.5 and text.isdigit()
-            is_paragraph_size = 10.5 <= font_size <= 11.5
+        elif item_type is TOKEN_REVIEW_MARKER:
+            found_final_section = True
+            if current_para_num and current_para_lines:
+                if current_para_num not in paragraphs_data:
+                    paragraphs_data[current_para_num] = {"text_lines": [], "questions": []}
+                paragraphs_data[current_para_num]["text_lines"].extend(current_para_lines)
+                current_para_lines = []
+        
+        elif found_final_section and not skip_final_detection:
+            # Everything after the marker except song titles is a review question
+            if item_type is not TOKEN_SONG_MARKER and '?' in item[2]:
+                questions = extract_multiple_questions(item[2])
+                for q in questions:
+                    final_questions.append(create_question_info(q, QUESTION_ANSWER_TIME, True))
+        
+        else:
+            text = item[2]
+            is_para_number = item_type is TOKEN_PARA_NUMBER
+            is_paragraph_size = item_type is TOKEN_BODY
             
             if is_para_number:
-                # First numbered paragraph found - save initial text as paragraph 1
                 if not found_first_para_number:
                     found_first_para_number = True
                     if initial_para_lines:
-                        paragraphs_data[1] = {"text_lines": initial_para_lines.copy(), "questions": []}
+                        paragraphs_data[1] = {"text_lines": initial_para_lines.copy(), "questions": [], "grouped_with": []}
                 
-                # Save previous paragraph
                 if current_para_num and current_para_lines:
                     if current_para_num not in paragraphs_data:
-                        paragraphs_data[current_para_num] = {"text_lines": [], "questions": []}
+                        paragraphs_data[current_para_num] = {"text_lines": [], "questions": [], "grouped_with": []}
                     paragraphs_data[current_para_num]["text_lines"].extend(current_para_lines)
                 
                 current_para_num = int(text)
@@ -1111,37 +1876,34 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
                 
             elif is_paragraph_size:
                 if current_para_num:
-                    # Regular paragraph text
                     current_para_lines.append(text)
                 elif not found_first_para_number:
-                    # Text before first paragraph number - this is paragraph 1
                     initial_para_lines.append(text)
     
-    # Save last paragraph
     if current_para_num and current_para_lines:
         if current_para_num not in paragraphs_data:
             paragraphs_data[current_para_num] = {"text_lines": [], "questions": [], "grouped_with": []}
         paragraphs_data[current_para_num]["text_lines"].extend(current_para_lines)
     
-    # If no numbered paragraphs were found but we have initial text, create paragraph 1
     if not found_first_para_number and initial_para_lines:
         paragraphs_data[1] = {"text_lines": initial_para_lines, "questions": [], "grouped_with": []}
     
-    # Build the analysis result
-    analyzed_paragraphs = []
-    total_words = 0
+    ctx.paragraphs_data = paragraphs_data
+    ctx.final_questions = final_questions
+    ctx.final_questions_title = final_questions_title
+    return len(paragraphs_data)
+
+
+def _enrich_stage(ctx: AnalysisContext) -> int:
+    paragraphs_data, final_questions = ctx.paragraphs_data, ctx.final_questions
+    
+    # Collect settings-independent paragraph data; timing is applied in the time stage
+    parsed_paragraphs = []
     total_questions = 0
-    total_reading_time = 0.0
-    total_question_time = 0.0
-    cumulative_time = 0.0
     total_images = 0
     total_scriptures = 0
     total_notes = 0
     
-    # Extra time for paragraphs with image, scripture or note references (40 seconds)
-    EXTRA_CONTENT_TIME = 40
-    
-    # Sort paragraphs by number
     for para_num in sorted(paragraphs_data.keys()):
         para_data = paragraphs_data[para_num]
         para_text = ' '.join(para_data["text_lines"])
@@ -1149,10 +1911,10 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
         grouped_with = para_data.get("grouped_with", [])
         
         word_count = count_words(para_text)
-        reading_time = calculate_reading_time(word_count)
-        question_time = len(questions) * QUESTION_ANSWER_TIME
+        # Only real questions take answer time; "lea" scripture entries appended below do not
+        timed_questions = len(questions)
         
-        # Count extra content and add time
+        # Count extra content
         para_has_image = False
         para_has_scripture = False
         para_has_note = False
@@ -1205,7 +1967,7 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
                 total_scriptures += 1
                 para_has_scripture = True
                 # Add as a virtual question to show in UI
-                questions.append(QuestionInfo(
+                questions.append(ParsedQuestion(
                     text="",  # No question text, just scripture reference
                     answer_time=0,
                     is_final_question=False,
@@ -1213,39 +1975,21 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
                     content_type="scripture"
                 ))
         
-        # Add 40 seconds for each type of extra content
-        extra_time = 0
-        if para_has_image:
-            extra_time += EXTRA_CONTENT_TIME
-        if para_has_scripture:
-            extra_time += EXTRA_CONTENT_TIME
-        if para_has_note:
-            extra_time += EXTRA_CONTENT_TIME
-        
-        reading_time += extra_time
-        
-        total_words += word_count
         total_questions += len(questions)
-        total_reading_time += reading_time
-        total_question_time += question_time
-        cumulative_time += reading_time + question_time
         
-        analyzed_paragraphs.append(ParagraphAnalysis(
+        paragraph = ParsedParagraph(
             number=para_num,
             text=para_text,
             word_count=word_count,
-            reading_time_seconds=round(reading_time, 2),
             questions=questions,
-            total_time_seconds=round(reading_time + question_time, 2),
-            cumulative_time_seconds=round(cumulative_time, 2),
-            grouped_with=grouped_with
-        ))
-    
-    # Add final questions
-    final_questions_start_time = cumulative_time
-    final_questions_time = len(final_questions) * QUESTION_ANSWER_TIME
-    total_questions += len(final_questions)
-    total_question_time += final_questions_time
+            timed_questions=timed_questions,
+            grouped_with=grouped_with,
+            has_image=para_has_image,
+            has_scripture=para_has_scripture,
+            has_note=para_has_note
+        )
+        parsed_paragraphs.append(paragraph)
+        _emit_paragraph(ctx, paragraph)
     
     # Count extra content in final questions
     for q in final_questions:
@@ -1256,35 +2000,25 @@ def analyze_pdf_with_font_info(pdf_bytes: bytes, filename: str) -> PDFAnalysisRe
             total_images += 1
         elif q.content_type == 'scripture':
             total_scriptures += 1
+        elif q.content_type == 'note':
+            total_notes += 1
     
-    # Calculate paragraph questions (total - final)
-    total_paragraph_questions = total_questions - len(final_questions)
-    
-    FIXED_TOTAL_TIME = 3600  # 60 minutes
-    
-    return PDFAnalysisResult(
-        filename=filename,
-        total_words=total_words,
-        total_paragraphs=len(analyzed_paragraphs),
-        total_questions=total_questions,
-        total_reading_time_seconds=round(total_reading_time, 2),
-        total_question_time_seconds=round(total_question_time, 2),
-        total_time_seconds=FIXED_TOTAL_TIME,
-        fixed_duration=True,
-        final_questions_start_time=round(final_questions_start_time, 2),
+    ctx.parsed = ParsedDocument(
+        parser_mode="font",
+        paragraphs=parsed_paragraphs,
         final_questions=final_questions,
-        final_questions_title=final_questions_title,
-        paragraphs=analyzed_paragraphs,
-        total_paragraph_questions=total_paragraph_questions,
-        total_review_questions=len(final_questions),
+        final_questions_title=ctx.final_questions_title,
+        # Calculate paragraph questions (total - final)
+        total_paragraph_questions=total_questions - len(final_questions),
         total_images=total_images,
         total_scriptures=total_scriptures,
         total_notes=total_notes
     )
+    return len(parsed_paragraphs)
 
 
 def analyze_pdf_with_font_info_configurable(
-    pdf_bytes: bytes, 
+    pdf_source: Union[bytes, AnalyzedDocument], 
     filename: str, 
     wpm: int = WORDS_PER_MINUTE, 
     answer_time: int = QUESTION_ANSWER_TIME
@@ -1292,343 +2026,7 @@ def analyze_pdf_with_font_info_configurable(
     """
     Analyze PDF using font size information with configurable reading speed and answer time.
     """
-    lines = extract_text_with_sizes(pdf_bytes)
-    
-    if not lines:
-        text = extract_text_from_pdf(pdf_bytes)
-        return analyze_pdf_content_configurable(text, filename, wpm, answer_time)
-    
-    # Detect horizontal line position for final questions section
-    horizontal_line_info = detect_horizontal_line_separator(pdf_bytes)
-    
-    # Identify font sizes used in document
-    size_counts = {}
-    for line in lines:
-        size_key = round(line.font_size, 1)
-        size_counts[size_key] = size_counts.get(size_key, 0) + 1
-    
-    if not size_counts:
-        text = extract_text_from_pdf(pdf_bytes)
-        return analyze_pdf_content_configurable(text, filename, wpm, answer_time)
-    
-    # First pass: Group consecutive question lines (size ~9.0)
-    grouped_lines = []
-    current_question_parts = []
-    current_question_nums = None
-    
-    for line in lines:
-        text = line.text.strip()
-        font_size = round(line.font_size, 1)
-        
-        if not text:
-            continue
-            
-        is_question_size = 8.5 <= font_size <= 9.5
-        
-        if is_question_size:
-            num_match = re.match(r'^([\d,\s]+)\.\s*$', text)
-            if num_match:
-                if current_question_parts and current_question_nums:
-                    full_question = join_hyphenated_lines(current_question_parts)
-                    grouped_lines.append(('question', current_question_nums, full_question))
-                
-                numbers_str = num_match.group(1)
-                current_question_nums = [int(n.strip()) for n in numbers_str.split(',') if n.strip().isdigit()]
-                current_question_parts = []
-            elif current_question_nums is not None:
-                current_question_parts.append(text)
-            else:
-                if '?' in text:
-                    grouped_lines.append(('question_text', None, text))
-                else:
-                    grouped_lines.append(('other', font_size, text))
-        else:
-            if current_question_parts and current_question_nums:
-                full_question = ' '.join(current_question_parts)
-                grouped_lines.append(('question', current_question_nums, full_question))
-                current_question_parts = []
-                current_question_nums = None
-            
-            grouped_lines.append(('text', font_size, text))
-    
-    if current_question_parts and current_question_nums:
-        full_question = ' '.join(current_question_parts)
-        grouped_lines.append(('question', current_question_nums, full_question))
-    
-    # Second pass: Build paragraphs and assign questions
-    paragraphs_data = {}
-    current_para_num = None
-    current_para_lines = []
-    initial_para_lines = []
-    found_first_para_number = False
-    final_questions = []
-    final_questions_title = ""
-    found_final_section = False
-    
-    if horizontal_line_info and horizontal_line_info.get("found"):
-        final_questions_raw, final_questions_title = extract_questions_after_horizontal_line(pdf_bytes, horizontal_line_info)
-        # Update answer_time for final questions with configurable value - preserve parenthesis info
-        final_questions = [
-            QuestionInfo(
-                text=q.text, 
-                answer_time=answer_time, 
-                is_final_question=True,
-                parenthesis_content=q.parenthesis_content,
-                content_type=q.content_type
-            )
-            for q in final_questions_raw
-        ]
-        skip_final_detection = len(final_questions) > 0
-    else:
-        skip_final_detection = False
-    
-    for item in grouped_lines:
-        item_type = item[0]
-        
-        if item_type == 'question':
-            para_nums, question_text = item[1], item[2]
-            
-            if found_final_section and not skip_final_detection:
-                questions = extract_multiple_questions(question_text)
-                for q in questions:
-                    final_questions.append(create_question_info(q, answer_time, True))
-            elif para_nums:
-                # Regular question - check if it spans multiple paragraphs
-                if len(para_nums) > 1:
-                    # Question spans multiple paragraphs (e.g., "1, 2.")
-                    for pn in para_nums:
-                        if pn not in paragraphs_data:
-                            paragraphs_data[pn] = {"text_lines": [], "questions": [], "grouped_with": para_nums.copy()}
-                        else:
-                            paragraphs_data[pn]["grouped_with"] = para_nums.copy()
-                    target_para = para_nums[-1]
-                else:
-                    target_para = para_nums[0]
-                
-                questions = extract_multiple_questions(question_text)
-                
-                for q in questions:
-                    if target_para not in paragraphs_data:
-                        paragraphs_data[target_para] = {"text_lines": [], "questions": [], "grouped_with": []}
-                    paragraphs_data[target_para]["questions"].append(create_question_info(q, answer_time, False))
-                    
-        elif item_type == 'question_text':
-            question_text = item[2]
-            if found_final_section and not skip_final_detection and '?' in question_text:
-                questions = extract_multiple_questions(question_text)
-                for q in questions:
-                    final_questions.append(create_question_info(q, answer_time, True))
-                    
-        elif item_type == 'text':
-            font_size, text = item[1], item[2]
-            
-            if text == '˛':
-                continue
-            
-            text_upper = text.upper()
-            if not skip_final_detection and ("QUÉ RESPONDERÍA" in text_upper or "QUE RESPONDERIA" in text_upper):
-                found_final_section = True
-                if current_para_num and current_para_lines:
-                    if current_para_num not in paragraphs_data:
-                        paragraphs_data[current_para_num] = {"text_lines": [], "questions": []}
-                    paragraphs_data[current_para_num]["text_lines"].extend(current_para_lines)
-                    current_para_lines = []
-                continue
-            
-            if found_final_section and not skip_final_detection:
-                if text_upper.startswith("CANCIÓN") or text_upper.startswith("CANCION"):
-                    continue
-                if '?' in text:
-                    questions = extract_multiple_questions(text)
-                    for q in questions:
-                        final_questions.append(create_question_info(q, answer_time, True))
-                continue
-            
-            is_para_number = 6.0 <= font_size <= 7.5 and text.isdigit()
-            is_paragraph_size = 10.5 <= font_size <= 11.5
-            
-            if is_para_number:
-                if not found_first_para_number:
-                    found_first_para_number = True
-                    if initial_para_lines:
-                        paragraphs_data[1] = {"text_lines": initial_para_lines.copy(), "questions": [], "grouped_with": []}
-                
-                if current_para_num and current_para_lines:
-                    if current_para_num not in paragraphs_data:
-                        paragraphs_data[current_para_num] = {"text_lines": [], "questions": [], "grouped_with": []}
-                    paragraphs_data[current_para_num]["text_lines"].extend(current_para_lines)
-                
-                current_para_num = int(text)
-                current_para_lines = []
-                
-            elif is_paragraph_size:
-                if current_para_num:
-                    current_para_lines.append(text)
-                elif not found_first_para_number:
-                    initial_para_lines.append(text)
-    
-    if current_para_num and current_para_lines:
-        if current_para_num not in paragraphs_data:
-            paragraphs_data[current_para_num] = {"text_lines": [], "questions": [], "grouped_with": []}
-        paragraphs_data[current_para_num]["text_lines"].extend(current_para_lines)
-    
-    if not found_first_para_number and initial_para_lines:
-        paragraphs_data[1] = {"text_lines": initial_para_lines, "questions": [], "grouped_with": []}
-    
-    # Build the analysis result with configurable times
-    analyzed_paragraphs = []
-    total_words = 0
-    total_questions = 0
-    total_reading_time = 0.0
-    total_question_time = 0.0
-    cumulative_time = 0.0
-    total_images = 0
-    total_scriptures = 0
-    total_notes = 0
-    
-    # Extra time for paragraphs with image or scripture references (40 seconds)
-    EXTRA_CONTENT_TIME = 40
-    
-    for para_num in sorted(paragraphs_data.keys()):
-        para_data = paragraphs_data[para_num]
-        para_text = ' '.join(para_data["text_lines"])
-        questions = para_data["questions"]
-        grouped_with = para_data.get("grouped_with", [])
-        
-        word_count = count_words(para_text)
-        reading_time = calculate_reading_time(word_count, wpm)
-        question_time = len(questions) * answer_time
-        
-        # Count extra content and add time
-        para_has_image = False
-        para_has_scripture = False
-        para_has_note = False
-        
-        # First, check questions for extra content
-        for q in questions:
-            if q.content_type == 'both':
-                # Both image and scripture in the same parenthesis
-                total_images += 1
-                total_scriptures += 1
-                para_has_image = True
-                para_has_scripture = True
-            elif q.content_type == 'image':
-                total_images += 1
-                para_has_image = True
-            elif q.content_type == 'scripture':
-                total_scriptures += 1
-                para_has_scripture = True
-            elif q.content_type == 'note':
-                total_notes += 1
-                para_has_note = True
-        
-        # Second, check for "lea" scripture references in the paragraph text itself
-        lea_scriptures = extract_lea_scriptures_from_text(para_text)
-        for lea_scripture in lea_scriptures:
-            # Only count if not already counted from a question
-            # Check if this scripture reference is already in one of the questions
-            already_counted = False
-            lea_content = lea_scripture["parenthesis_content"].lower()
-            
-            # Extract just the book and chapter:verse from the lea reference
-            # e.g., "lea Marcos 3:1-6" -> "marcos 3:1-6"
-            lea_scripture_ref = re.sub(r'^[Ll][EeÉé][Aa](?:lo|LO)?\s+', '', lea_content).strip()
-            
-            for q in questions:
-                if q.parenthesis_content:
-                    q_content = q.parenthesis_content.lower()
-                    # Check if the scripture reference (without "lea") matches
-                    if lea_scripture_ref in q_content or q_content in lea_scripture_ref:
-                        already_counted = True
-                        break
-                    # Also check if it's the same reference with different format
-                    # e.g., "Marcos 3:1-6" vs "lea Marcos 3:1-6"
-                    q_scripture_ref = re.sub(r'^[Ll][EeÉé][Aa](?:lo|LO)?\s+', '', q_content).strip()
-                    if lea_scripture_ref == q_scripture_ref:
-                        already_counted = True
-                        break
-            
-            if not already_counted:
-                total_scriptures += 1
-                para_has_scripture = True
-                # Add as a virtual question to show in UI
-                questions.append(QuestionInfo(
-                    text="",  # No question text, just scripture reference
-                    answer_time=0,
-                    is_final_question=False,
-                    parenthesis_content=lea_scripture["parenthesis_content"],
-                    content_type="scripture"
-                ))
-        
-        # Add 40 seconds for each type of extra content
-        extra_time = 0
-        if para_has_image:
-            extra_time += EXTRA_CONTENT_TIME
-        if para_has_scripture:
-            extra_time += EXTRA_CONTENT_TIME
-        if para_has_note:
-            extra_time += EXTRA_CONTENT_TIME
-        
-        reading_time += extra_time
-        
-        total_words += word_count
-        total_questions += len(questions)
-        total_reading_time += reading_time
-        total_question_time += question_time
-        cumulative_time += reading_time + question_time
-        
-        analyzed_paragraphs.append(ParagraphAnalysis(
-            number=para_num,
-            text=para_text,
-            word_count=word_count,
-            reading_time_seconds=round(reading_time, 2),
-            questions=questions,
-            total_time_seconds=round(reading_time + question_time, 2),
-            cumulative_time_seconds=round(cumulative_time, 2),
-            grouped_with=grouped_with
-        ))
-    
-    # Count extra content in final questions
-    for q in final_questions:
-        if q.content_type == 'both':
-            total_images += 1
-            total_scriptures += 1
-        elif q.content_type == 'image':
-            total_images += 1
-        elif q.content_type == 'scripture':
-            total_scriptures += 1
-        elif q.content_type == 'note':
-            total_notes += 1
-    
-    # Calculate paragraph questions (total - final)
-    total_paragraph_questions = total_questions - len(final_questions)
-    
-    final_questions_start_time = cumulative_time
-    final_questions_time = len(final_questions) * answer_time
-    total_questions += len(final_questions)
-    total_question_time += final_questions_time
-    
-    FIXED_TOTAL_TIME = 3600
-    
-    return PDFAnalysisResult(
-        filename=filename,
-        total_words=total_words,
-        total_paragraphs=len(analyzed_paragraphs),
-        total_questions=total_questions,
-        total_reading_time_seconds=round(total_reading_time, 2),
-        total_question_time_seconds=round(total_question_time, 2),
-        total_time_seconds=FIXED_TOTAL_TIME,
-        fixed_duration=True,
-        final_questions_start_time=round(final_questions_start_time, 2),
-        final_questions=final_questions,
-        final_questions_title=final_questions_title,
-        paragraphs=analyzed_paragraphs,
-        total_paragraph_questions=total_paragraph_questions,
-        total_review_questions=len(final_questions),
-        total_images=total_images,
-        total_scriptures=total_scriptures,
-        total_notes=total_notes
-    )
+    return build_analysis_result(parse_pdf_with_font_info(pdf_source), filename, wpm, answer_time)
 
 
 def parse_question_line_watchtower(text: str) -> tuple:
@@ -1703,18 +2101,26 @@ def extract_multiple_questions(text: str) -> list:
 
 
 def analyze_pdf_content(text: str, filename: str) -> PDFAnalysisResult:
-    """Analyze PDF content and return structured analysis"""
+    """Analyze PDF content and return structured analysis with the default settings"""
+    return analyze_pdf_content_configurable(text, filename)
+
+
+def parse_pdf_content(text: str, trace: Optional[StageTrace] = None, paragraph_sink=None) -> ParsedDocument:
+    """Parse plain PDF text into settings-independent paragraphs and questions"""
+    ctx = AnalysisContext(text=text)
+    ctx.paragraph_sink = paragraph_sink
+    run_stages(ctx, ("group", "assign", "enrich"), trace)
+    return ctx.parsed
+
+
+def _group_text_stage(ctx: AnalysisContext) -> int:
+    """Split the text into paragraphs, dropping those after "¿QUÉ RESPONDERÍAS?" """
+    text = ctx.text
     paragraphs = split_into_paragraphs(text)
     
-    # Extract final questions (those after "¿QUÉ RESPONDERÍAS?")
-    final_questions = extract_final_questions(text)
-    final_questions_title = ""  # Default empty title for text-only analysis
-    
-    # Check if text contains "¿QUÉ RESPONDERÍAS?" 
     text_lower = text.lower()
     has_que_responderias = "qué responderías" in text_lower or "que responderias" in text_lower
     
-    # Find the paragraph that contains "¿QUÉ RESPONDERÍAS?"
     que_responderias_paragraph = -1
     if has_que_responderias:
         for idx, para in enumerate(paragraphs):
@@ -1723,74 +2129,49 @@ def analyze_pdf_content(text: str, filename: str) -> PDFAnalysisResult:
                 que_responderias_paragraph = idx
                 break
     
-    analyzed_paragraphs = []
-    total_words = 0
-    total_questions = 0
-    total_reading_time = 0.0
-    total_question_time = 0.0
-    cumulative_time = 0.0
-    final_questions_start_time = 0.0
-    
-    for i, para_text in enumerate(paragraphs, 1):
-        # Skip paragraphs that are after "¿QUÉ RESPONDERÍAS?" (final questions section)
-        if que_responderias_paragraph >= 0 and (i - 1) > que_responderias_paragraph:
-            continue
-            
-        word_count = count_words(para_text)
-        reading_time = calculate_reading_time(word_count)
-        
-        # Detect questions for this paragraph
+    ctx.paragraph_texts = [
+        (i, para_text) for i, para_text in enumerate(paragraphs, 1)
+        if not (que_responderias_paragraph >= 0 and (i - 1) > que_responderias_paragraph)
+    ]
+    return len(ctx.paragraph_texts)
+
+
+def _assign_text_stage(ctx: AnalysisContext) -> int:
+    """Detect the questions of each paragraph and the final questions"""
+    # Extract final questions (those after "¿QUÉ RESPONDERÍAS?")
+    ctx.final_questions = extract_final_questions(ctx.text)
+    
+    parsed_paragraphs = []
+    for i, para_text in ctx.paragraph_texts:
         questions = detect_questions(para_text, i, False)
-        question_time = len(questions) * QUESTION_ANSWER_TIME
-        
-        total_words += word_count
-        total_questions += len(questions)
-        total_reading_time += reading_time
-        total_question_time += question_time
-        
-        # Calculate cumulative time
-        cumulative_time += reading_time + question_time
-        
-        analyzed_paragraphs.append(ParagraphAnalysis(
+        paragraph = ParsedParagraph(
             number=i,
             text=para_text,
-            word_count=word_count,
-            reading_time_seconds=round(reading_time, 2),
+            word_count=count_words(para_text),
             questions=questions,
-            total_time_seconds=round(reading_time + question_time, 2),
-            cumulative_time_seconds=round(cumulative_time, 2)
-        ))
+            timed_questions=len(questions)
+        )
+        parsed_paragraphs.append(paragraph)
+        _emit_paragraph(ctx, paragraph)
     
-    # Calculate when final questions start (after all paragraphs)
-    final_questions_start_time = cumulative_time
-    
-    # Add final questions time to totals
-    final_questions_time = len(final_questions) * QUESTION_ANSWER_TIME
-    total_questions += len(final_questions)
-    total_question_time += final_questions_time
-    
-    # Total time is ALWAYS 60 minutes (3600 seconds)
-    FIXED_TOTAL_TIME = 3600  # 60 minutes in seconds
-    
-    return PDFAnalysisResult(
-        filename=filename,
-        total_words=total_words,
-        total_paragraphs=len(analyzed_paragraphs),
-        total_questions=total_questions,
-        total_reading_time_seconds=round(total_reading_time, 2),
-        total_question_time_seconds=round(total_question_time, 2),
-        total_time_seconds=FIXED_TOTAL_TIME,
-        fixed_duration=True,
-        final_questions_start_time=round(final_questions_start_time, 2),
-        final_questions=final_questions,
-        final_questions_title=final_questions_title,
-        paragraphs=analyzed_paragraphs,
-        total_paragraph_questions=total_questions - len(final_questions),
-        total_review_questions=len(final_questions),
-        total_images=0,
-        total_scriptures=0,
-        total_notes=0
+    ctx.parsed_paragraphs = parsed_paragraphs
+    return len(parsed_paragraphs)
+
+
+def _enrich_text_stage(ctx: AnalysisContext) -> int:
+    """The text-only path does not classify extra content"""
+    ctx.parsed = ParsedDocument(
+        parser_mode="text",
+        paragraphs=ctx.parsed_paragraphs,
+        final_questions=ctx.final_questions,
+        final_questions_title="",
+        total_paragraph_questions=sum(len(p.questions) for p in ctx.parsed_paragraphs)
     )
+    return len(ctx.parsed_paragraphs)
+
+
+def _skip_stage(ctx: AnalysisContext) -> int:
+    return 0
 
 
 def analyze_pdf_content_configurable(
@@ -1800,105 +2181,1314 @@ def analyze_pdf_content_configurable(
     answer_time: int = QUESTION_ANSWER_TIME
 ) -> PDFAnalysisResult:
     """Analyze PDF content with configurable reading speed and answer time"""
-    paragraphs = split_into_paragraphs(text)
-    
-    # Extract final questions (those after "¿QUÉ RESPONDERÍAS?")
-    final_questions_raw = extract_final_questions(text)
-    # Update answer_time for final questions - preserve parenthesis info
-    final_questions = [
-        QuestionInfo(
-            text=q.text, 
-            answer_time=answer_time, 
-            is_final_question=True,
-            parenthesis_content=q.parenthesis_content,
-            content_type=q.content_type
-        )
-        for q in final_questions_raw
-    ]
-    final_questions_title = ""
-    
-    text_lower = text.lower()
-    has_que_responderias = "qué responderías" in text_lower or "que responderias" in text_lower
+    return build_analysis_result(parse_pdf_content(text), filename, wpm, answer_time)
+
+
+def parse_pdf_source(
+    pdf_source: Union[bytes, str, Path], 
+    spans: Optional[SpanTable] = None,
+    trace: Optional[StageTrace] = None,
+    parallel_min_pages: Optional[int] = None,
+    paragraph_sink=None
+) -> Optional[ParsedDocument]:
+    """
+    Parse an uploaded PDF (bytes or file path), trying the font size analysis first
+    and falling back to text-only. Top-level so it can run in the analysis worker processes.
+    With parallel_min_pages, a document of at least that many pages whose spans were
+    not given is only opened and None is returned, so the caller can extract the
+    spans page-parallel and parse again with them.
+    paragraph_sink, if given, is called with each ParsedParagraph as soon as it is built.
+    """
+    # Open the PDF once and share it between the font analysis and the text fallback
+    ctx = AnalysisContext(source=pdf_source, spans=spans)
+    ctx.paragraph_sink = paragraph_sink
+    try:
+        run_stages(ctx, PARSE_STAGES[:1], trace)
+        if spans is None and parallel_min_pages is not None and len(ctx.document) >= parallel_min_pages:
+            return None
+        run_stages(ctx, PARSE_STAGES[1:], ctx.trace)
+        return ctx.parsed
+    except Exception as font_error:
+        # Paragraphs already handed out cannot be taken back by the fallback
+        if ctx.document is None or ctx.paragraphs_emitted:
+            raise
+        logging.warning(f"Font analysis failed, falling back to text-only: {font_error}")
+        text = extract_text_from_pdf(ctx.document)
+        if not text.strip():
+            raise ValueError("No se pudo extraer texto del PDF")
+        return parse_pdf_content(text, trace, paragraph_sink)
+    finally:
+        if ctx.owns_document:
+            ctx.document.close()
+
+
+def trace_parse_pdf_source(
+    pdf_source: Union[bytes, str, Path],
+    spans: Optional[SpanTable] = None,
+    parallel_min_pages: Optional[int] = None,
+    stream_token: Optional[str] = None
+) -> tuple:
+    """
+    parse_pdf_source returning (parsed, stage records) so worker timings reach the server process.
+    When the document is long enough for page-parallel extraction it returns (None, page count)
+    instead, having only opened the PDF. With a stream token each paragraph is sent to
+    that streaming response as soon as it is built, while the parse is still running.
+    """
+    trace = StageTrace()
+    sink = stream_paragraph_sink(stream_token) if stream_token is not None else None
+    parsed = parse_pdf_source(pdf_source, spans, trace, parallel_min_pages, sink)
+    if parsed is None:
+        # The open stage records the page count as its item count
+        return None, trace.records[0][3]
+    return parsed, trace.records
+
+
+def build_analysis_result(
+    parsed: ParsedDocument, 
+    filename: str, 
+    wpm: int = WORDS_PER_MINUTE, 
+    answer_time: int = QUESTION_ANSWER_TIME,
+    trace: Optional[StageTrace] = None
+) -> PDFAnalysisResult:
+    """
+    Apply reading speed and answer time to a parsed document (the result stages).
+    Pure arithmetic over the paragraphs - the PDF is not touched, so this is
+    cheap enough to re-run every time the settings change.
+    """
+    ctx = AnalysisContext()
+    ctx.parsed = parsed
+    ctx.filename = filename
+    ctx.wpm = wpm
+    ctx.answer_time = answer_time
+    run_stages(ctx, RESULT_STAGES, trace)
+    return ctx.result
+
+
+def question_fields(question: ParsedQuestion, answer_time: int) -> dict:
+    """QuestionInfo fields of a parsed question with the given answer time"""
+    return {
+        "text": question.text,
+        "answer_time": answer_time,
+        "is_final_question": question.is_final_question,
+        "parenthesis_content": question.parenthesis_content,
+        "content_type": question.content_type,
+    }
+
+
+def _time_stage(ctx: AnalysisContext) -> int:
+    """Reading, answer and extra-content time of every paragraph, plus the running totals"""
+    timer = ParagraphTimer(ctx.wpm, ctx.answer_time)
+    for para in ctx.parsed.paragraphs:
+        timer.add(para)
+    timer.finish(ctx)
+    return len(ctx.timed_paragraphs) + len(ctx.timed_final_questions)
+
+
+class ParagraphTimer:
+    """
+    Times paragraphs one at a time, in document order, keeping the running totals.
+    The time stage feeds it the parsed paragraphs; the streaming endpoint feeds it
+    each paragraph as the parse produces it.
+    """
+    def __init__(self, wpm: int, answer_time: int):
+        self.wpm = wpm
+        self.answer_time = answer_time
+        self.paragraphs = []
+        self.total_words = 0
+        self.total_questions = 0
+        self.total_reading_time = 0.0
+        self.total_question_time = 0.0
+        self.cumulative_time = 0.0
+    
+    def add(self, para: ParsedParagraph) -> dict:
+        """Time one paragraph; returns it as the plain dict the result is validated from"""
+        answer_time = self.answer_time
+        reading_time = calculate_reading_time(para.word_count, self.wpm)
+        question_time = para.timed_questions * answer_time
+        
+        # Add 40 seconds for each type of extra content
+        extra_time = 0
+        if para.has_image:
+            extra_time += EXTRA_CONTENT_TIME
+        if para.has_scripture:
+            extra_time += EXTRA_CONTENT_TIME
+        if para.has_note:
+            extra_time += EXTRA_CONTENT_TIME
+        
+        reading_time += extra_time
+        
+        # Real questions get the configured answer time, "lea" scripture entries keep theirs
+        questions = [
+            question_fields(q, answer_time if index < para.timed_questions else q.answer_time)
+            for index, q in enumerate(para.questions)
+        ]
+        
+        self.total_words += para.word_count
+        self.total_questions += len(questions)
+        self.total_reading_time += reading_time
+        self.total_question_time += question_time
+        self.cumulative_time += reading_time + question_time
+        
+        # Plain dicts: the PDFAnalysisResult is validated once, in _assemble_stage
+        paragraph = {
+            "number": para.number,
+            "text": para.text,
+            "word_count": para.word_count,
+            "reading_time_seconds": round(reading_time, 2),
+            "questions": questions,
+            "total_time_seconds": round(reading_time + question_time, 2),
+            "cumulative_time_seconds": round(self.cumulative_time, 2),
+            "grouped_with": list(para.grouped_with),
+        }
+        self.paragraphs.append(paragraph)
+        return paragraph
+    
+    def finish(self, ctx: AnalysisContext):
+        """Time ctx.parsed's final questions and leave the timed paragraphs, final questions and totals on ctx"""
+        answer_time = self.answer_time
+        final_questions = [question_fields(q, answer_time) for q in ctx.parsed.final_questions]
+        
+        final_questions_time = len(final_questions) * answer_time
+        
+        ctx.timed_paragraphs = self.paragraphs
+        ctx.timed_final_questions = final_questions
+        ctx.totals = {
+            "total_words": self.total_words,
+            "total_questions": self.total_questions + len(final_questions),
+            "total_reading_time_seconds": round(self.total_reading_time, 2),
+            "total_question_time_seconds": round(self.total_question_time + final_questions_time, 2),
+            "final_questions_start_time": round(self.cumulative_time, 2),
+        }
+
+
+def _assemble_stage(ctx: AnalysisContext) -> int:
+    """
+    Build the PDFAnalysisResult returned by the API.
+    The whole result is validated in one pydantic-core pass over plain data,
+    which is cheaper than constructing every nested model separately.
+    """
+    parsed = ctx.parsed
+    ctx.result = PDFAnalysisResult.model_validate({
+        "filename": ctx.filename,
+        "total_paragraphs": len(ctx.timed_paragraphs),
+        "total_time_seconds": FIXED_TOTAL_TIME,
+        "fixed_duration": True,
+        "final_questions": ctx.timed_final_questions,
+        "final_questions_title": parsed.final_questions_title,
+        "paragraphs": ctx.timed_paragraphs,
+        "total_paragraph_questions": parsed.total_paragraph_questions,
+        "total_review_questions": len(ctx.timed_final_questions),
+        "total_images": parsed.total_images,
+        "total_scriptures": parsed.total_scriptures,
+        "total_notes": parsed.total_notes,
+        **ctx.totals
+    })
+    return 1
+
+
+def stream_header(ctx: AnalysisContext, analysis_id: str, timestamp: datetime) -> dict:
+    """First event of a streamed analysis: everything known before the PDF is parsed"""
+    return {
+        "id": analysis_id,
+        "filename": ctx.filename,
+        "timestamp": timestamp,
+        "wpm": ctx.wpm,
+        "answer_time_seconds": ctx.answer_time,
+    }
+
+
+TOTALS_EVENT_EXCLUDE = {"paragraphs", "final_questions", "final_questions_title"}
+
+
+async def iter_analysis_events(
+    ctx: AnalysisContext,
+    analysis_id: str,
+    timestamp: datetime,
+    paragraphs: AsyncIterator[ParsedParagraph]
+) -> AsyncIterator[tuple]:
+    """
+    (event, data) pairs of a streamed analysis with ctx's settings: "header" before
+    anything is parsed, one "paragraph" per ParsedParagraph as `paragraphs` yields it,
+    "review_questions", then "totals" with the document summary. ctx.parsed must be
+    set once `paragraphs` is exhausted; ctx.result holds the full PDFAnalysisResult
+    once this generator is.
+    """
+    yield "header", stream_header(ctx, analysis_id, timestamp)
+    timer = ParagraphTimer(ctx.wpm, ctx.answer_time)
+    async for para in paragraphs:
+        yield "paragraph", timer.add(para)
+    timer.finish(ctx)
+    yield "review_questions", {
+        "final_questions_title": ctx.parsed.final_questions_title,
+        "final_questions": ctx.timed_final_questions,
+    }
+    _assemble_stage(ctx)
+    ctx.result.id = analysis_id
+    ctx.result.timestamp = timestamp
+    yield "totals", ctx.result.model_dump(exclude=TOTALS_EVENT_EXCLUDE)
+
+
+def iter_result_events(ctx: AnalysisContext, result: PDFAnalysisResult) -> Iterator[tuple]:
+    """The same events as iter_analysis_events, replayed from an already computed result"""
+    yield "header", stream_header(ctx, result.id, result.timestamp)
+    for paragraph in result.paragraphs:
+        yield "paragraph", paragraph.model_dump()
+    yield "review_questions", {
+        "final_questions_title": result.final_questions_title,
+        "final_questions": [q.model_dump() for q in result.final_questions],
+    }
+    yield "totals", result.model_dump(exclude=TOTALS_EVENT_EXCLUDE)
+
+
+def encode_stream_event(event: str, data, sse: bool = False) -> bytes:
+    """One NDJSON line {"event", "data"}, or one Server-Sent Event when sse is set"""
+    if sse:
+        return b"event: " + event.encode("ascii") + b"\ndata: " + to_json(data) + b"\n\n"
+    return to_json({"event": event, "data": data}) + b"\n"
+
+
+# Stage name -> (font path variant, text-only path variant). Replacing an entry
+# swaps that stage for both run_stages callers.
+PIPELINE_STAGES = {
+    "open": (_open_stage, _open_stage),
+    "extract": (_extract_stage, _extract_stage),
+    "classify": (_classify_stage, _skip_stage),
+    "group": (_group_stage, _group_text_stage),
+    "assign": (_assign_stage, _assign_text_stage),
+    "enrich": (_enrich_stage, _enrich_text_stage),
+    "time": (_time_stage, _time_stage),
+    "assemble": (_assemble_stage, _assemble_stage),
+}
+
+
+class AnalysisResultCache:
+    """
+    Content-addressed cache of analysis results.
     
-    que_responderias_paragraph = -1
-    if has_que_responderias:
-        for idx, para in enumerate(paragraphs):
-            para_lower = para.lower()
-            if "qué responderías" in para_lower or "que responderias" in para_lower:
-                que_responderias_paragraph = idx
-                break
+    Keys combine the SHA-256 of the PDF bytes with the timing settings and
+    PARSER_VERSION, so the same article uploaded with the same settings is
+    parsed only once. Results are kept as JSON in an in-memory LRU bounded by
+    total size, and optionally written to a directory on disk that survives
+    restarts. A disk hit is promoted back into memory.
+    """
+    def __init__(self, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES, cache_dir: str = ""):
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._entries = OrderedDict()  # key -> JSON bytes, oldest first
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(content_hash: str, wpm: int, answer_time: int) -> str:
+        """content_hash is the SHA-256 hex digest of the PDF bytes"""
+        return f"{content_hash}-w{wpm}-a{answer_time}-v{PARSER_VERSION}"
+    
+    def get(self, key: str) -> Optional[PDFAnalysisResult]:
+        """Return a fresh copy of the cached result, or None on a miss"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        
+        if data is None and self.cache_dir:
+            path = self.cache_dir / f"{key}.json"
+            try:
+                data = path.read_bytes()
+            except OSError:
+                data = None
+            if data is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self._store(key, data)
+        
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        return PDFAnalysisResult.model_validate_json(data)
+    
+    def put(self, key: str, result: PDFAnalysisResult):
+        data = result.model_dump_json().encode('utf-8')
+        with self._lock:
+            self._store(key, data)
+        
+        if self.cache_dir:
+            path = self.cache_dir / f"{key}.json"
+            tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            try:
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Failed to write analysis cache file: {e}")
+    
+    def _store(self, key: str, data: bytes):
+        """Insert into the memory tier and evict least recently used entries (lock held)"""
+        if len(data) > self.max_bytes:
+            return
+        
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = data
+        self._size += len(data)
+        
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+    
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "disk_tier": str(self.cache_dir) if self.cache_dir else None,
+            }
+
+
+class ParsedDocumentStore:
+    """
+    Bounded in-memory store of settings-independent parse results.
     
-    analyzed_paragraphs = []
-    total_words = 0
-    total_questions = 0
-    total_reading_time = 0.0
-    total_question_time = 0.0
-    cumulative_time = 0.0
-    final_questions_start_time = 0.0
+    Parsed documents are kept by content hash (so every upload of the same
+    article shares one entry), and each analysis id remembers which content
+    hash and filename it came from. This is what lets /analyses/{id}/retime
+    rebuild a result without the PDF.
+    """
+    def __init__(self, max_entries: int = PARSED_STORE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._documents = OrderedDict()  # content_hash -> ParsedDocument
+        self._analyses = OrderedDict()  # analysis id -> (content_hash, filename)
+        self._lock = threading.Lock()
+    
+    def get(self, content_hash: str) -> Optional[ParsedDocument]:
+        with self._lock:
+            parsed = self._documents.get(content_hash)
+            if parsed is not None:
+                self._documents.move_to_end(content_hash)
+            return parsed
+    
+    def put(self, content_hash: str, parsed: ParsedDocument):
+        with self._lock:
+            self._documents[content_hash] = parsed
+            self._documents.move_to_end(content_hash)
+            while len(self._documents) > self.max_entries:
+                self._documents.popitem(last=False)
+    
+    def link(self, analysis_id: str, content_hash: str, filename: str):
+        with self._lock:
+            self._analyses[analysis_id] = (content_hash, filename)
+            # Ids are tiny, keep several per document before dropping the oldest
+            while len(self._analyses) > self.max_entries * 8:
+                self._analyses.popitem(last=False)
+    
+    def lookup(self, analysis_id: str) -> Optional[tuple]:
+        """Return (content_hash, filename) for an analysis id"""
+        with self._lock:
+            return self._analyses.get(analysis_id)
+
+
+analysis_cache = AnalysisResultCache(ANALYSIS_CACHE_MAX_BYTES, ANALYSIS_CACHE_DIR)
+parsed_documents = ParsedDocumentStore(PARSED_STORE_MAX_ENTRIES)
+recent_analyses = AnalysisResultCache(RECENT_ANALYSES_MAX_BYTES)
+
+
+# Default histogram buckets in seconds, from 1 ms to 30 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Response size buckets in bytes, from 256 B to 4 MB
+SIZE_BUCKETS = tuple(256 * 4 ** exponent for exponent in range(8))
+
+
+def _format_labels(label_names: tuple, label_values: tuple, extra: str = "") -> str:
+    parts = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(label_names, label_values)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic counter with labels, exported in Prometheus text format"""
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(name, "") for name in self.label_names), 0.0)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, exported in Prometheus text format"""
+    def __init__(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the enclosed block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(labels.get(name, "") for name in self.label_names))
+        return series[-1] if series else 0
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, series):
+                    le_label = 'le="{}"'.format(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le_label)} {bucket_count}")
+                le_label = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le_label)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, with labels, exported in Prometheus text format"""
+    def __init__(self, name: str, documentation: str, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = float(value)
+    
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(name, "") for name in self.label_names), 0.0)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics of the server, rendered for /api/metrics"""
+    def __init__(self):
+        self._metrics = []
+    
+    def counter(self, name: str, documentation: str, label_names: tuple = ()) -> Counter:
+        metric = Counter(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+    
+    def gauge(self, name: str, documentation: str, label_names: tuple = ()) -> Gauge:
+        metric = Gauge(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+    
+    def histogram(self, name: str, documentation: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+stage_duration = metrics.histogram(
+    "analysis_stage_duration_seconds", "Wall time of each analysis pipeline stage", ("stage",))
+stage_cpu_seconds = metrics.counter(
+    "analysis_stage_cpu_seconds_total", "CPU time spent in each analysis pipeline stage", ("stage",))
+stage_items = metrics.counter(
+    "analysis_stage_items_total", "Items produced by each analysis pipeline stage", ("stage",))
+db_operation_duration = metrics.histogram(
+    "mongo_operation_duration_seconds", "Latency of MongoDB operations", ("operation", "collection"))
+analysis_sources = metrics.counter(
+    "analysis_requests_total", "Analyses served, by where the result came from", ("source",))
+documents_parsed = metrics.counter(
+    "analysis_documents_parsed_total", "PDFs parsed, by parser path (font or text fallback)", ("parser_mode",))
+content_references = metrics.counter(
+    "analysis_content_references_total", "Images, scriptures and notes found in parsed PDFs", ("kind",))
+persist_queue_depth = metrics.gauge(
+    "persistence_queue_depth", "Database writes waiting in the write-behind queue")
+persist_circuit_open = metrics.gauge(
+    "persistence_circuit_open", "1 while the write-behind circuit breaker sheds writes")
+persist_flush_duration = metrics.histogram(
+    "persistence_flush_duration_seconds", "Latency of write-behind batch flushes", ("outcome",))
+persist_writes = metrics.counter(
+    "persistence_writes_total", "Write-behind operations by outcome (written, shed, dropped)", ("outcome",))
+response_serialize_duration = metrics.histogram(
+    "http_response_serialize_seconds", "Time to serialize response models to JSON", ("route",))
+response_compress_duration = metrics.histogram(
+    "http_response_compress_seconds", "Time to compress JSON responses", ("route", "encoding"))
+response_raw_bytes = metrics.histogram(
+    "http_response_raw_bytes", "JSON response size before compression", ("route",), SIZE_BUCKETS)
+response_encoded_bytes = metrics.histogram(
+    "http_response_encoded_bytes", "JSON response size as sent", ("route", "encoding"), SIZE_BUCKETS)
+
+
+def record_stage_metrics(stage: str, wall_seconds: float, cpu_seconds: float, items: int):
+    """Stage hook feeding the pipeline timings into the metrics registry"""
+    stage_duration.observe(wall_seconds, stage=stage)
+    stage_cpu_seconds.inc(cpu_seconds, stage=stage)
+    stage_items.inc(items, stage=stage)
+
+
+def record_parse_metrics(parsed: ParsedDocument):
+    documents_parsed.inc(parser_mode=parsed.parser_mode)
+    content_references.inc(parsed.total_images, kind="image")
+    content_references.inc(parsed.total_scriptures, kind="scripture")
+    content_references.inc(parsed.total_notes, kind="note")
+
+
+stage_hooks.append(record_stage_metrics)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware observing the latency of every HTTP request, labelled by
+    the route template (e.g. /api/analyses/{analysis_id}/retime) so ids do not
+    create new series. Requests that match no route share route="unmatched".
+    """
+    def __init__(self, app):
+        self.app = app
     
-    for i, para_text in enumerate(paragraphs, 1):
-        if que_responderias_paragraph >= 0 and (i - 1) > que_responderias_paragraph:
-            continue
-            
-        word_count = count_words(para_text)
-        reading_time = calculate_reading_time(word_count, wpm)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        questions_raw = detect_questions(para_text, i, False)
-        # Update answer_time for questions - preserve parenthesis info
-        questions = [
-            QuestionInfo(
-                text=q.text, 
-                answer_time=answer_time, 
-                is_final_question=False,
-                parenthesis_content=q.parenthesis_content,
-                content_type=q.content_type
-            )
-            for q in questions_raw
-        ]
-        question_time = len(questions) * answer_time
+        status = [500]
         
-        total_words += word_count
-        total_questions += len(questions)
-        total_reading_time += reading_time
-        total_question_time += question_time
-        cumulative_time += reading_time + question_time
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
         
-        analyzed_paragraphs.append(ParagraphAnalysis(
-            number=i,
-            text=para_text,
-            word_count=word_count,
-            reading_time_seconds=round(reading_time, 2),
-            questions=questions,
-            total_time_seconds=round(reading_time + question_time, 2),
-            cumulative_time_seconds=round(cumulative_time, 2)
-        ))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status[0]
+            )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware bounding the body of upload requests before FastAPI parses
+    the multipart form, which it does in full before any handler runs. A
+    declared Content-Length over the route's limit gets a 413 without reading
+    the body; bodies sent without one are counted as they arrive and stopped
+    with a 413 as soon as they pass the limit.
+    """
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+    
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        detail = f"La solicitud supera el tamaño máximo de {limit // (1024 * 1024)} MB"
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing, FastAPI passes HTTPException through as the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """Pick "br", "gzip" or "identity" from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip()] = quality
+    wildcard = accepted.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda coding: accepted.get(coding, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else "identity"
+
+
+def _nested_model(annotation) -> tuple:
+    """(BaseModel subclass or None, whether it is inside a list) for a field annotation"""
+    is_list = False
+    while True:
+        origin = get_origin(annotation)
+        if origin is list:
+            is_list = True
+            annotation = get_args(annotation)[0]
+        elif origin is Union:
+            annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+        else:
+            break
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, is_list
+    return None, is_list
+
+
+def parse_field_selection(model: type, spec: Optional[str], many: bool = False) -> Optional[dict]:
+    """
+    Turn the fields=/exclude= query parameter, a comma-separated list of dotted
+    field paths such as "paragraphs.text,final_questions", into a pydantic
+    include/exclude spec for serializing `model` (or a list of them with many=True).
+    Unknown fields, and a list with no field in it such as "," are rejected with a 400.
+    """
+    if spec is None:
+        return None
+    paths = [part.strip() for part in spec.split(",") if part.strip()]
+    if not paths:
+        raise HTTPException(status_code=400, detail="La lista de campos está vacía")
+    selection = {}
+    for path in paths:
+        names = path.split(".")
+        node, current = selection, model
+        for depth, name in enumerate(names):
+            field_info = current.model_fields.get(name) if current is not None else None
+            if field_info is None:
+                raise HTTPException(status_code=400, detail=f"Campo desconocido: {path}")
+            if depth == len(names) - 1:
+                node[name] = True
+                break
+            child = node.get(name)
+            if child is True:
+                break  # The whole field is already selected
+            if child is None:
+                child = node[name] = {}
+            current, is_list = _nested_model(field_info.annotation)
+            node = child.setdefault("__all__", {}) if is_list else child
+    return {"__all__": selection} if many else selection
+
+
+def model_response(
+    request: Request,
+    content,
+    headers: Optional[dict] = None,
+    include: Optional[dict] = None,
+    exclude: Optional[dict] = None
+) -> Response:
+    """
+    JSON response for a Pydantic model (or a list of models), serialized once by
+    pydantic-core. Returning a Response makes FastAPI skip re-validating the
+    result against response_model and re-encoding it. include/exclude (from
+    parse_field_selection) drop fields while serializing. Bodies of at least
+    RESPONSE_COMPRESSION_MIN_BYTES are brotli- or gzip-compressed when the
+    client accepts it.
+    """
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    with response_serialize_duration.time(route=route):
+        body = to_json(content, include=include, exclude=exclude)
+    response_raw_bytes.observe(len(body), route=route)
+    
+    headers = dict(headers or {})
+    encoding = "identity"
+    if len(body) >= RESPONSE_COMPRESSION_MIN_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding != "identity":
+            with response_compress_duration.time(route=route, encoding=encoding):
+                if encoding == "br":
+                    body = brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+                else:
+                    body = gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0)
+            headers["Content-Encoding"] = encoding
+    response_encoded_bytes.observe(len(body), route=route, encoding=encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class WriteBehindQueue:
+    """
+    Bounded write-behind queue for the database writes made while serving uploads.
+    
+    Routes enqueue pymongo write operations and return without waiting for
+    Mongo. A background task groups the pending operations per collection into
+    unordered bulk writes once batch_size of them are waiting or every
+    flush_interval seconds. A failed batch is put back at the head of the queue;
+    after failure_threshold consecutive failures the circuit opens and queued
+    and new writes are shed for cooldown seconds, after which one flush is tried
+    again. A full queue drops new writes. stop() lets a flush in progress
+    finish and then flushes what is left.
+    """
+    def __init__(self, batch_size: int = PERSIST_BATCH_SIZE,
+                 flush_interval: float = PERSIST_FLUSH_INTERVAL_MS / 1000,
+                 max_depth: int = PERSIST_QUEUE_MAX,
+                 failure_threshold: int = PERSIST_BREAKER_FAILURES,
+                 cooldown: float = PERSIST_BREAKER_COOLDOWN_SECONDS):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_depth = max_depth
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._pending = deque()  # (collection name, pymongo write operation)
+        self._wakeup = None
+        self._task = None
+        self._stopping = False
+        self.consecutive_failures = 0
+        self.opened_at = None
+    
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+    
+    @property
+    def circuit_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+    
+    def enqueue(self, collection: str, operation) -> bool:
+        """Queue one write; returns False when it was shed or dropped instead"""
+        if self.circuit_open:
+            persist_writes.inc(outcome="shed")
+            return False
+        if len(self._pending) >= self.max_depth:
+            persist_writes.inc(outcome="dropped")
+            return False
+        
+        self._ensure_started()
+        self._pending.append((collection, operation))
+        persist_queue_depth.set(len(self._pending))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+    
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+    
+    async def stop(self):
+        """
+        Stop the background task and flush the pending writes. The task is not
+        cancelled: it is woken to finish the flush it may be in the middle of,
+        so a batch already taken off the queue is written rather than lost.
+        """
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await task
+            finally:
+                self._stopping = False
+        await self.flush()
+    
+    async def flush(self):
+        """Write pending operations batch by batch until the queue is empty or a batch fails"""
+        while self._pending and not self.circuit_open:
+            if not await self._flush_batch():
+                break
     
-    final_questions_start_time = cumulative_time
-    final_questions_time = len(final_questions) * answer_time
-    total_questions += len(final_questions)
-    total_question_time += final_questions_time
-    
-    FIXED_TOTAL_TIME = 3600
-    
-    return PDFAnalysisResult(
-        filename=filename,
-        total_words=total_words,
-        total_paragraphs=len(analyzed_paragraphs),
-        total_questions=total_questions,
-        total_reading_time_seconds=round(total_reading_time, 2),
-        total_question_time_seconds=round(total_question_time, 2),
-        total_time_seconds=FIXED_TOTAL_TIME,
-        fixed_duration=True,
-        final_questions_start_time=round(final_questions_start_time, 2),
-        final_questions=final_questions,
-        final_questions_title=final_questions_title,
-        paragraphs=analyzed_paragraphs,
-        total_paragraph_questions=total_questions - len(final_questions),
-        total_review_questions=len(final_questions),
-        total_images=0,
-        total_scriptures=0,
-        total_notes=0
+    async def _flush_batch(self) -> bool:
+        database = db
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        if database is None:
+            persist_writes.inc(len(batch), outcome="dropped")
+            persist_queue_depth.set(len(self._pending))
+            return False
+        
+        operations = {}
+        for collection, operation in batch:
+            operations.setdefault(collection, []).append(operation)
+        
+        failed = []
+        error = None
+        attempted = set()
+        start = time.perf_counter()
+        for collection, collection_operations in operations.items():
+            try:
+                with db_operation_duration.time(operation="bulk_write", collection=collection):
+                    await database[collection].bulk_write(collection_operations, ordered=False)
+            except asyncio.CancelledError:
+                # Cancelled mid-write: this collection's and the later ones' writes go back to the queue
+                unwritten = failed + [item for item in batch if item[0] not in attempted]
+                self._pending.extendleft(reversed(unwritten))
+                persist_queue_depth.set(len(self._pending))
+                raise
+            except BulkWriteError as e:
+                # Duplicate keys are documents another writer stored first
+                details = e.details or {}
+                if details.get('writeConcernErrors') or any(
+                    write_error.get('code') != 11000 for write_error in details.get('writeErrors', [])
+                ):
+                    failed.extend((collection, operation) for operation in collection_operations)
+                    error = e
+            except Exception as e:
+                failed.extend((collection, operation) for operation in collection_operations)
+                error = e
+            attempted.add(collection)
+        
+        written = len(batch) - len(failed)
+        if written:
+            persist_writes.inc(written, outcome="written")
+        if error is None:
+            persist_flush_duration.observe(time.perf_counter() - start, outcome="ok")
+            self.consecutive_failures = 0
+            self.opened_at = None
+            persist_circuit_open.set(0)
+            persist_queue_depth.set(len(self._pending))
+            return True
+        
+        persist_flush_duration.observe(time.perf_counter() - start, outcome="error")
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            shed = len(failed) + len(self._pending)
+            self._pending.clear()
+            self.opened_at = time.monotonic()
+            persist_circuit_open.set(1)
+            persist_writes.inc(shed, outcome="shed")
+            logger.warning(f"Database writes failing ({error}); shedding {shed} writes for {self.cooldown:.0f}s")
+        else:
+            self._pending.extendleft(reversed(failed))
+            logger.warning(f"Failed to flush {len(failed)} database writes, will retry: {error}")
+        persist_queue_depth.set(len(self._pending))
+        return False
+
+
+persistence_queue = WriteBehindQueue()
+
+
+async def ingest_pdf_upload(file: UploadFile) -> tuple:
+    """
+    Copy an upload into a temporary file in fixed-size chunks.
+    
+    Starlette has already received the whole multipart body (spooled to disk
+    past 1 MB) when the handler runs; UploadSizeLimitMiddleware is what bounds
+    the request size while it arrives. Here the %PDF header is checked on the
+    first chunk, the SHA-256 is computed while copying and MAX_UPLOAD_BYTES is
+    checked again for the file itself, so junk and oversized files are rejected
+    before any parsing without reading the file into memory. Returns (temp file
+    path, sha256 hex digest, size); the caller removes the file.
+    """
+    async def read_chunk():
+        return await file.read(UPLOAD_CHUNK_SIZE)
+    
+    return await _spool_to_temp_file(read_chunk, b'%PDF', MAX_UPLOAD_BYTES, ".pdf", "El archivo no es un PDF válido")
+
+
+async def _spool_to_temp_file(read_chunk, magic: bytes, max_bytes: int, suffix: str, invalid_detail: str) -> tuple:
+    """Copy chunks from read_chunk() into a temp file, checking magic, size and hashing on the way"""
+    digest = hashlib.sha256()
+    size = 0
+    tmp = tempfile.NamedTemporaryFile(prefix="upload-", suffix=suffix, dir=UPLOAD_TMP_DIR, delete=False)
+    try:
+        with tmp:
+            while True:
+                chunk = await read_chunk()
+                if not chunk:
+                    break
+                if size == 0 and magic not in chunk[:1024]:
+                    raise HTTPException(status_code=400, detail=invalid_detail)
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"El archivo supera el tamaño máximo de {max_bytes // (1024 * 1024)} MB"
+                    )
+                digest.update(chunk)
+                tmp.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="El archivo está vacío")
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    
+    return tmp.name, digest.hexdigest(), size
+
+
+async def extract_pdfs_from_zip(file: UploadFile, limit: int) -> tuple:
+    """
+    Stream a ZIP upload to disk and extract its PDF members into temp files.
+    Returns (list of (filename, temp path, sha256), list of (filename, error)).
+    Members are checked and hashed the same way as direct uploads. Opening the
+    archive and inflating members run in threads so a large ZIP doesn't block
+    the event loop; only the size and limit bookkeeping happens here.
+    """
+    async def read_chunk():
+        return await file.read(UPLOAD_CHUNK_SIZE)
+    
+    zip_path, _, _ = await _spool_to_temp_file(
+        read_chunk, b'PK\x03\x04', MAX_BATCH_ZIP_BYTES, ".zip", "El archivo ZIP no es válido"
+    )
+    extracted = []
+    errors = []
+    try:
+        archive = await asyncio.to_thread(zipfile.ZipFile, zip_path)
+        with archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or info.filename.startswith('__MACOSX/') or not name.lower().endswith('.pdf'):
+                    continue
+                if len(extracted) >= limit:
+                    errors.append((name, f"Se superó el máximo de {MAX_BATCH_FILES} archivos por lote"))
+                    continue
+                if info.file_size > MAX_UPLOAD_BYTES:
+                    errors.append((name, f"El archivo supera el tamaño máximo de {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"))
+                    continue
+                try:
+                    member = await asyncio.to_thread(archive.open, info)
+                    with member:
+                        async def read_member():
+                            return await asyncio.to_thread(member.read, UPLOAD_CHUNK_SIZE)
+                        
+                        pdf_path, content_hash, _ = await _spool_to_temp_file(
+                            read_member, b'%PDF', MAX_UPLOAD_BYTES, ".pdf", "El archivo no es un PDF válido"
+                        )
+                    extracted.append((name, pdf_path, content_hash))
+                except HTTPException as e:
+                    errors.append((name, e.detail))
+    except BaseException as e:
+        for _, pdf_path, _ in extracted:
+            os.unlink(pdf_path)
+        if isinstance(e, zipfile.BadZipFile):
+            raise HTTPException(status_code=400, detail="El archivo ZIP no es válido")
+        raise
+    finally:
+        os.unlink(zip_path)
+    
+    return extracted, errors
+
+
+async def load_or_parse_pdf(pdf_path: str, content_hash: str, stream_token: Optional[str] = None) -> tuple:
+    """
+    Parsed document of a PDF already streamed to disk, from the parsed store or parsed now.
+    Returns (ParsedDocument, the same ParsedDocument if it had to be parsed now else None).
+    When parsed now with a stream token, paragraphs are sent to that stream as they are built.
+    """
+    parsed = parsed_documents.get(content_hash)
+    if parsed is not None:
+        analysis_sources.inc(source="parsed_store")
+        return parsed, None
+    
+    # CPU-bound parse runs in the worker pool; the event loop only awaits it.
+    # Long documents come back unparsed with their page count instead, and get
+    # their spans extracted page-parallel across the workers first
+    parallel_min_pages = PARALLEL_EXTRACTION_MIN_PAGES if analysis_pool is not None and ANALYSIS_WORKERS > 1 else None
+    parsed, stage_records = await run_analysis_task(
+        trace_parse_pdf_source, pdf_path, None, parallel_min_pages, stream_token
     )
+    if parsed is None:
+        spans = await extract_span_table_parallel(pdf_path, stage_records, ANALYSIS_WORKERS)
+        parsed, stage_records = await run_analysis_task(trace_parse_pdf_source, pdf_path, spans, None, stream_token)
+    StageTrace(stage_records).emit()
+    analysis_sources.inc(source="parsed")
+    record_parse_metrics(parsed)
+    parsed_documents.put(content_hash, parsed)
+    return parsed, parsed
+
+
+async def iter_parsed_paragraphs(ctx: AnalysisContext, pdf_path: str, content_hash: str) -> AsyncIterator[ParsedParagraph]:
+    """
+    Paragraphs of a PDF already streamed to disk, each as soon as the parse has built it.
+    Once the parse returns, whatever has not arrived yet (or everything, for a document
+    from the parsed store) is taken from the parsed document itself. When exhausted,
+    ctx.parsed holds the ParsedDocument, and ctx.newly_parsed too if it was parsed now.
+    """
+    token = uuid.uuid4().hex
+    arrived = asyncio.Queue()
+    paragraph_streams[token] = (asyncio.get_running_loop(), arrived)
+    parse = asyncio.ensure_future(load_or_parse_pdf(pdf_path, content_hash, token))
+    try:
+        emitted = 0
+        while True:
+            next_paragraph = asyncio.ensure_future(arrived.get())
+            await asyncio.wait((next_paragraph, parse), return_when=asyncio.FIRST_COMPLETED)
+            if not next_paragraph.done():
+                next_paragraph.cancel()
+                break
+            emitted += 1
+            yield next_paragraph.result()
+        ctx.parsed, ctx.newly_parsed = await parse
+        for paragraph in ctx.parsed.paragraphs[emitted:]:
+            yield paragraph
+    finally:
+        del paragraph_streams[token]
+        if not parse.done():
+            parse.cancel()
+
+
+async def analyze_pdf_file(
+    pdf_path: str,
+    content_hash: str,
+    filename: str,
+    wpm: int,
+    answer_time_seconds: int
+) -> tuple:
+    """
+    Analyze a PDF already streamed to disk, going through the result cache and parsed store.
+    Returns (PDFAnalysisResult, ParsedDocument if the PDF had to be parsed now else None).
+    """
+    # Same article with the same settings: reuse the cached analysis
+    cache_key = AnalysisResultCache.make_key(content_hash, wpm, answer_time_seconds)
+    result = analysis_cache.get(cache_key)
+    newly_parsed = None
+    
+    if result is not None:
+        analysis_sources.inc(source="result_cache")
+        result.filename = filename
+        result.timestamp = datetime.now(timezone.utc)
+    else:
+        # Same article with other settings: only the timing has to be recomputed
+        parsed, newly_parsed = await load_or_parse_pdf(pdf_path, content_hash)
+        trace = StageTrace()
+        result = build_analysis_result(parsed, filename, wpm, answer_time_seconds, trace)
+        trace.emit()
+        result.id = analysis_id_for(cache_key)
+        analysis_cache.put(cache_key, result)
+    
+    parsed_documents.link(result.id, content_hash, filename)
+    recent_analyses.put(result.id, result)
+    return result, newly_parsed
+
+
+def analysis_id_for(cache_key: str) -> str:
+    """Deterministic analysis id: the same content hash and settings always get the same id"""
+    return str(uuid.uuid5(ANALYSIS_ID_NAMESPACE, cache_key))
+
+
+def analysis_to_document(result: PDFAnalysisResult, content_hash: str, wpm: int, answer_time_seconds: int) -> dict:
+    """
+    Lightweight timing document for the pdf_analyses collection.
+    Holds the totals for one content hash and settings pair; paragraph text lives
+    once per content hash in parsed_documents and is re-timed on read.
+    """
+    doc = result.model_dump(exclude={'paragraphs', 'final_questions', 'final_questions_title'})
+    doc['settings'] = {'wpm': wpm, 'answer_time_seconds': answer_time_seconds}
+    doc['content_hash'] = content_hash
+    doc['parser_version'] = PARSER_VERSION
+    doc['analysis_key'] = AnalysisResultCache.make_key(content_hash, wpm, answer_time_seconds)
+    return doc
+
+
+def save_analysis(result: PDFAnalysisResult, content_hash: str, wpm: int, answer_time_seconds: int):
+    """Queue an idempotent upsert of the timing document; repeated uploads only refresh filename and timestamp"""
+    doc = analysis_to_document(result, content_hash, wpm, answer_time_seconds)
+    latest = {'filename': doc.pop('filename'), 'timestamp': doc.pop('timestamp')}
+    persistence_queue.enqueue("pdf_analyses", UpdateOne(
+        {"analysis_key": doc['analysis_key']},
+        {"$setOnInsert": doc, "$set": latest, "$inc": {"upload_count": 1}},
+        upsert=True
+    ))
+
+
+def parsed_to_document(content_hash: str, parsed: ParsedDocument) -> dict:
+    """MongoDB document for parsed_documents: the parser output as zlib-compressed JSON"""
+    data = parsed_document_adapter.dump_json(parsed)
+    return {
+        'content_hash': content_hash,
+        'parser_version': parsed.parser_version,
+        'encoding': 'json+zlib',
+        'size': len(data),
+        'data': zlib.compress(data, PARSED_COMPRESSION_LEVEL),
+    }
+
+
+def parsed_from_document(stored: dict) -> ParsedDocument:
+    """Inverse of parsed_to_document; also reads the uncompressed documents stored before it"""
+    if 'data' in stored:
+        return parsed_document_adapter.validate_json(zlib.decompress(stored['data']))
+    stored = {key: value for key, value in stored.items() if key not in ('_id', 'content_hash')}
+    return parsed_document_adapter.validate_python(stored)
+
+
+def save_parsed_document(content_hash: str, parsed: ParsedDocument):
+    """Queue storing a parsed document once per content hash and parser version"""
+    persistence_queue.enqueue("parsed_documents", UpdateOne(
+        {"content_hash": content_hash, "parser_version": parsed.parser_version},
+        {"$setOnInsert": parsed_to_document(content_hash, parsed)},
+        upsert=True
+    ))
+
+
+def validate_timing_settings(wpm: int, answer_time_seconds: int):
+    """Reject reading speed or answer time outside the supported ranges"""
+    if wpm < 100 or wpm > 300:
+        raise HTTPException(status_code=400, detail="WPM debe estar entre 100 y 300")
+    if answer_time_seconds < 10 or answer_time_seconds > 120:
+        raise HTTPException(status_code=400, detail="El tiempo de respuesta debe estar entre 10 y 120 segundos")
+
+
+async def load_parsed_document(analysis_id: str) -> tuple:
+    """
+    Find the parsed document behind an analysis id.
+    Checks the in-memory store first, then the pdf_analyses and parsed_documents collections.
+    Returns (ParsedDocument, filename, content hash) or (None, None, None).
+    """
+    entry = parsed_documents.lookup(analysis_id)
+    if entry is None and db is not None:
+        try:
+            with db_operation_duration.time(operation="find_one", collection="pdf_analyses"):
+                analysis = await db.pdf_analyses.find_one(
+                    {"id": analysis_id},
+                    {"_id": 0, "content_hash": 1, "filename": 1}
+                )
+            if analysis and analysis.get("content_hash"):
+                entry = (analysis["content_hash"], analysis["filename"])
+                parsed_documents.link(analysis_id, *entry)
+        except Exception as e:
+            logger.warning(f"Failed to look up analysis {analysis_id}: {e}")
+    
+    if entry is None:
+        return None, None, None
+    
+    content_hash, filename = entry
+    return await fetch_parsed_document(content_hash), filename, content_hash
+
+
+async def fetch_parsed_document(content_hash: str, parser_version: str = PARSER_VERSION) -> Optional[ParsedDocument]:
+    """Parsed document for a content hash, from the in-memory store or parsed_documents"""
+    current = parser_version == PARSER_VERSION
+    parsed = parsed_documents.get(content_hash) if current else None
+    if parsed is None and db is not None:
+        try:
+            with db_operation_duration.time(operation="find_one", collection="parsed_documents"):
+                stored = await db.parsed_documents.find_one(
+                    {"content_hash": content_hash, "parser_version": parser_version},
+                    {"_id": 0}
+                )
+            if stored:
+                parsed = parsed_from_document(stored)
+                if current:
+                    parsed_documents.put(content_hash, parsed)
+        except Exception as e:
+            logger.warning(f"Failed to load parsed document: {e}")
+    return parsed
+
+
+async def load_analysis(analysis_id: str) -> Optional[PDFAnalysisResult]:
+    """
+    Full result of a stored analysis.
+    Recently produced results come from memory; otherwise the timing document is
+    looked up by id and re-timed from its parsed document.
+    """
+    result = recent_analyses.get(analysis_id)
+    if result is not None:
+        analysis_sources.inc(source="recent_analyses")
+        return result
+    if db is None:
+        return None
+    
+    try:
+        with db_operation_duration.time(operation="find_one", collection="pdf_analyses"):
+            analysis = await db.pdf_analyses.find_one({"id": analysis_id}, {"_id": 0})
+    except Exception as e:
+        logger.warning(f"Failed to look up analysis {analysis_id}: {e}")
+        return None
+    if analysis is None:
+        return None
+    
+    try:
+        analysis["timestamp"] = as_utc(analysis["timestamp"])
+    except ValueError as e:
+        logger.warning(f"Analysis {analysis_id} has an invalid timestamp: {e}")
+        return None
+    if "paragraphs" in analysis:
+        result = PDFAnalysisResult.model_validate(analysis)  # Stored before deduplication
+    else:
+        parsed = await fetch_parsed_document(analysis["content_hash"], analysis.get("parser_version", PARSER_VERSION))
+        if parsed is None:
+            return None
+        settings = analysis["settings"]
+        result = build_analysis_result(parsed, analysis["filename"], settings["wpm"], settings["answer_time_seconds"])
+        result.id = analysis_id
+        result.timestamp = analysis["timestamp"]
+    analysis_sources.inc(source="stored")
+    recent_analyses.put(analysis_id, result)
+    return result
 
 
 # Routes
@@ -1909,9 +3499,12 @@ async def root():
 
 @api_router.post("/analyze-pdf", response_model=PDFAnalysisResult)
 async def analyze_pdf(
+    request: Request,
     file: UploadFile = File(...),
     wpm: int = WORDS_PER_MINUTE,
-    answer_time_seconds: int = QUESTION_ANSWER_TIME
+    answer_time_seconds: int = QUESTION_ANSWER_TIME,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None
 ):
     """Upload and analyze a PDF file for reading time
     
@@ -1919,63 +3512,375 @@ async def analyze_pdf(
         file: PDF file to analyze
         wpm: Words per minute for reading speed (default: 180)
         answer_time_seconds: Seconds allocated for each question answer (default: 35)
+        fields: comma-separated fields to return, e.g. total_time_seconds,paragraphs.number
+        exclude: comma-separated fields to leave out, e.g. paragraphs.text,paragraphs.questions.text
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="El archivo debe ser un PDF")
     
     # Validate parameters
-    if wpm < 100 or wpm > 300:
-        raise HTTPException(status_code=400, detail="WPM debe estar entre 100 y 300")
-    if answer_time_seconds < 10 or answer_time_seconds > 120:
-        raise HTTPException(status_code=400, detail="El tiempo de respuesta debe estar entre 10 y 120 segundos")
+    validate_timing_settings(wpm, answer_time_seconds)
+    include_fields = parse_field_selection(PDFAnalysisResult, fields)
+    exclude_fields = parse_field_selection(PDFAnalysisResult, exclude)
+    
+    # Stream the upload to disk, rejecting non-PDF and oversized files early
+    pdf_path, content_hash, _ = await ingest_pdf_upload(file)
     
     try:
-        pdf_bytes = await file.read()
+        result, newly_parsed = await analyze_pdf_file(
+            pdf_path, content_hash, file.filename, wpm, answer_time_seconds
+        )
         
-        # Try to analyze with font size information first
-        try:
-            result = analyze_pdf_with_font_info_configurable(pdf_bytes, file.filename, wpm, answer_time_seconds)
-        except Exception as font_error:
-            logging.warning(f"Font analysis failed, falling back to text-only: {font_error}")
-            text = extract_text_from_pdf(pdf_bytes)
-            if not text.strip():
-                raise HTTPException(status_code=400, detail="No se pudo extraer texto del PDF")
-            result = analyze_pdf_content_configurable(text, file.filename, wpm, answer_time_seconds)
-        
-        # Save to database (if available)
+        # Save to database (if available) in the background; the response does not wait for Mongo
         if db is not None:
-            try:
-                doc = result.model_dump()
-                doc['timestamp'] = doc['timestamp'].isoformat()
-                doc['settings'] = {'wpm': wpm, 'answer_time_seconds': answer_time_seconds}
-                await db.pdf_analyses.insert_one(doc)
-            except Exception as db_error:
-                logger.warning(f"Failed to save analysis to database: {db_error}")
+            save_analysis(result, content_hash, wpm, answer_time_seconds)
+            if newly_parsed is not None:
+                save_parsed_document(content_hash, newly_parsed)
         
-        return result
+        return model_response(request, result, include=include_fields, exclude=exclude_fields)
         
     except Exception as e:
         logging.error(f"Error analyzing PDF: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al procesar el PDF: {str(e)}")
+    finally:
+        os.unlink(pdf_path)
+
+
+@api_router.post("/analyze-pdf/stream")
+async def analyze_pdf_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    wpm: int = WORDS_PER_MINUTE,
+    answer_time_seconds: int = QUESTION_ANSWER_TIME
+):
+    """Upload and analyze a PDF file, streaming the result while it is computed
+    
+    Args:
+        file: PDF file to analyze
+        wpm: Words per minute for reading speed (default: 180)
+        answer_time_seconds: Seconds allocated for each question answer (default: 35)
+    
+    Sends NDJSON lines {"event": ..., "data": ...}, or Server-Sent Events when the
+    request accepts text/event-stream. Events: "header" (id, filename and settings)
+    as soon as the upload is accepted, one "paragraph" per paragraph as the parser
+    builds it, "review_questions", then "totals" (document summary); "error" if the
+    analysis fails after streaming started.
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="El archivo debe ser un PDF")
+    validate_timing_settings(wpm, answer_time_seconds)
+    
+    # Upload errors are still plain HTTP errors; parsing happens while streaming
+    pdf_path, content_hash, _ = await ingest_pdf_upload(file)
+    
+    cache_key = AnalysisResultCache.make_key(content_hash, wpm, answer_time_seconds)
+    ctx = AnalysisContext()
+    ctx.filename = file.filename
+    ctx.wpm = wpm
+    ctx.answer_time = answer_time_seconds
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    
+    async def stream_events():
+        try:
+            # Same article with the same settings: replay the cached analysis
+            result = analysis_cache.get(cache_key)
+            if result is not None:
+                analysis_sources.inc(source="result_cache")
+                result.filename = file.filename
+                result.timestamp = datetime.now(timezone.utc)
+                for event, data in iter_result_events(ctx, result):
+                    yield encode_stream_event(event, data, sse)
+            else:
+                events = iter_analysis_events(
+                    ctx, analysis_id_for(cache_key), datetime.now(timezone.utc),
+                    iter_parsed_paragraphs(ctx, pdf_path, content_hash)
+                )
+                async for event, data in events:
+                    yield encode_stream_event(event, data, sse)
+                result = ctx.result
+                analysis_cache.put(cache_key, result)
+        except Exception as e:
+            logging.error(f"Error streaming analysis: {str(e)}")
+            yield encode_stream_event("error", {"detail": f"Error al procesar el PDF: {str(e)}"}, sse)
+            return
+        finally:
+            os.unlink(pdf_path)
+        
+        # Same bookkeeping as /analyze-pdf once the full result exists
+        parsed_documents.link(result.id, content_hash, result.filename)
+        recent_analyses.put(result.id, result)
+        if db is not None:
+            save_analysis(result, content_hash, wpm, answer_time_seconds)
+            if ctx.newly_parsed is not None:
+                save_parsed_document(content_hash, ctx.newly_parsed)
+    
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@api_router.post("/analyze-batch", response_model=BatchAnalysisResult)
+async def analyze_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    wpm: int = WORDS_PER_MINUTE,
+    answer_time_seconds: int = QUESTION_ANSWER_TIME
+):
+    """Analyze many PDFs in one request, in parallel across the worker pool
+    
+    Args:
+        files: PDF files and/or ZIP archives containing PDFs
+        wpm: Words per minute for reading speed (default: 180)
+        answer_time_seconds: Seconds allocated for each question answer (default: 35)
+    
+    Every file gets its own result or error; one bad file does not fail the batch.
+    """
+    validate_timing_settings(wpm, answer_time_seconds)
+    
+    # Ingest sequentially (cheap streaming copies), keeping the original order
+    items = []  # (filename, temp path or None, content hash, error)
+    try:
+        for upload in files:
+            name = upload.filename or ""
+            remaining = MAX_BATCH_FILES - sum(1 for item in items if item[1])
+            if name.lower().endswith('.zip'):
+                try:
+                    extracted, errors = await extract_pdfs_from_zip(upload, remaining)
+                except HTTPException as e:
+                    items.append((name, None, "", e.detail))
+                    continue
+                items.extend((member, path, digest, "") for member, path, digest in extracted)
+                items.extend((member, None, "", error) for member, error in errors)
+            elif not name.lower().endswith('.pdf'):
+                items.append((name, None, "", "El archivo debe ser un PDF"))
+            elif remaining <= 0:
+                items.append((name, None, "", f"Se superó el máximo de {MAX_BATCH_FILES} archivos por lote"))
+            else:
+                try:
+                    pdf_path, content_hash, _ = await ingest_pdf_upload(upload)
+                    items.append((name, pdf_path, content_hash, ""))
+                except HTTPException as e:
+                    items.append((name, None, "", e.detail))
+        
+        async def analyze_item(filename, pdf_path, content_hash, error):
+            if pdf_path is None:
+                return BatchItemResult(filename=filename, error=error), None
+            try:
+                result, newly_parsed = await analyze_pdf_file(
+                    pdf_path, content_hash, filename, wpm, answer_time_seconds
+                )
+                return BatchItemResult(filename=filename, result=result), (content_hash, newly_parsed)
+            except Exception as e:
+                logging.error(f"Error analyzing {filename} in batch: {str(e)}")
+                return BatchItemResult(filename=filename, error=f"Error al procesar el PDF: {str(e)}"), None
+        
+        # Fan out: every PDF is parsed concurrently in the worker pool
+        outcomes = await asyncio.gather(*(analyze_item(*item) for item in items))
+    finally:
+        for _, pdf_path, _, _ in items:
+            if pdf_path:
+                os.unlink(pdf_path)
+    
+    results = [item_result for item_result, _ in outcomes]
+    
+    # Queued writes are flushed together in bulk by the write-behind queue
+    if db is not None:
+        for item_result, saved in outcomes:
+            if saved is not None:
+                save_analysis(item_result.result, saved[0], wpm, answer_time_seconds)
+                if saved[1] is not None:
+                    save_parsed_document(*saved)
+    
+    succeeded = sum(1 for item_result in results if item_result.result is not None)
+    return model_response(request, BatchAnalysisResult(
+        total_files=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    ))
+
+
+# Only these fields are read for the history listing; paragraph text never leaves Mongo
+ANALYSIS_SUMMARY_PROJECTION = {
+    "_id": 0, "settings": 1,
+    **{name: 1 for name in AnalysisSummary.model_fields if name not in ("wpm", "answer_time_seconds")}
+}
 
 
-@api_router.get("/analyses", response_model=List[PDFAnalysisResult])
-async def get_analyses():
-    """Get all PDF analyses"""
+def encode_analyses_cursor(timestamp: datetime, analysis_id: str) -> str:
+    """Opaque cursor pointing just past the (timestamp, id) of the last listed analysis"""
+    raw = f"{timestamp.isoformat()}|{analysis_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_analyses_cursor(cursor: str) -> tuple:
+    try:
+        timestamp, analysis_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+        return datetime.fromisoformat(timestamp), analysis_id
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def as_utc(timestamp: Union[datetime, str]) -> datetime:
+    """
+    Stored timestamp as an aware datetime. Mongo drivers without tz_aware return
+    naive UTC datetimes, and analyses written before the migration (or that it
+    could not convert) still hold ISO strings; raises ValueError for those that don't parse.
+    """
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+
+async def list_analyses(
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> tuple:
+    """One page of analysis summaries, newest first; returns (summaries, next cursor or None)"""
+    query = {}
+    if since is not None or until is not None:
+        query["timestamp"] = {}
+        if since is not None:
+            query["timestamp"]["$gte"] = as_utc(since)
+        if until is not None:
+            query["timestamp"]["$lt"] = as_utc(until)
+    if cursor:
+        timestamp, analysis_id = decode_analyses_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "id": {"$lt": analysis_id}}
+        ]}]}
+    
     if db is None:
-        return []
+        return [], None
     try:
-        analyses = await db.pdf_analyses.find(
-            {}, 
-            {"_id": 0}
-        ).sort("timestamp", -1).to_list(50)
-        for analysis in analyses:
-            if isinstance(analysis.get('timestamp'), str):
-                analysis['timestamp'] = datetime.fromisoformat(analysis['timestamp'])
-        return analyses
+        with db_operation_duration.time(operation="find", collection="pdf_analyses"):
+            analyses = await db.pdf_analyses.find(
+                query,
+                ANALYSIS_SUMMARY_PROJECTION
+            ).sort([("timestamp", -1), ("id", -1)]).limit(limit).to_list(limit)
     except Exception as e:
         logger.warning(f"Failed to get analyses: {e}")
-        return []
+        return [], None
+    
+    summaries = []
+    for analysis in analyses:
+        settings = analysis.pop("settings", None) or {}
+        try:
+            analysis["timestamp"] = as_utc(analysis["timestamp"])
+        except ValueError as e:
+            logger.warning(f"Skipping analysis {analysis.get('id')} with an invalid timestamp: {e}")
+            continue
+        summaries.append(AnalysisSummary(
+            **analysis, wpm=settings.get("wpm"), answer_time_seconds=settings.get("answer_time_seconds")
+        ))
+    next_cursor = None
+    if len(analyses) == limit and summaries:
+        next_cursor = encode_analyses_cursor(summaries[-1].timestamp, summaries[-1].id)
+    return summaries, next_cursor
+
+
+@api_router.get("/analyses", response_model=List[AnalysisSummary])
+async def get_analyses(
+    request: Request,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None
+):
+    """List past analyses, newest first, as summaries without paragraphs
+    
+    Args:
+        limit: analyses per page (1-100, default: 20)
+        cursor: X-Next-Cursor header of the previous page
+        since, until: only analyses with since <= timestamp < until
+        fields: comma-separated summary fields to return, e.g. id,filename
+        exclude: comma-separated summary fields to leave out
+    
+    The X-Next-Cursor response header is set when there may be more analyses.
+    """
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="limit debe estar entre 1 y 100")
+    include_fields = parse_field_selection(AnalysisSummary, fields, many=True)
+    exclude_fields = parse_field_selection(AnalysisSummary, exclude, many=True)
+    
+    summaries, next_cursor = await list_analyses(limit, cursor, since, until)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return model_response(request, summaries, headers, include=include_fields, exclude=exclude_fields)
+
+
+@api_router.get("/analyses/{analysis_id}", response_model=PDFAnalysisResult)
+async def get_analysis(
+    request: Request,
+    analysis_id: str,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None
+):
+    """Get the full result of a previous analysis
+    
+    Args:
+        analysis_id: id returned by /analyze-pdf
+        fields: comma-separated fields to return, e.g. total_time_seconds,paragraphs.number
+        exclude: comma-separated fields to leave out, e.g. paragraphs.text,paragraphs.questions.text
+    """
+    include_fields = parse_field_selection(PDFAnalysisResult, fields)
+    exclude_fields = parse_field_selection(PDFAnalysisResult, exclude)
+    result = await load_analysis(analysis_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Análisis no encontrado")
+    return model_response(request, result, include=include_fields, exclude=exclude_fields)
+
+
+@api_router.get("/analyses/{analysis_id}/retime", response_model=PDFAnalysisResult)
+async def retime_analysis(
+    request: Request,
+    analysis_id: str,
+    wpm: int = WORDS_PER_MINUTE,
+    answer_time_seconds: int = QUESTION_ANSWER_TIME,
+    fields: Optional[str] = None,
+    exclude: Optional[str] = None
+):
+    """Recalculate the times of a previous analysis with new settings, without re-uploading the PDF
+    
+    Args:
+        analysis_id: id returned by /analyze-pdf
+        wpm: Words per minute for reading speed (default: 180)
+        answer_time_seconds: Seconds allocated for each question answer (default: 35)
+        fields: comma-separated fields to return, e.g. total_time_seconds,paragraphs.number
+        exclude: comma-separated fields to leave out, e.g. paragraphs.text,paragraphs.questions.text
+    """
+    validate_timing_settings(wpm, answer_time_seconds)
+    include_fields = parse_field_selection(PDFAnalysisResult, fields)
+    exclude_fields = parse_field_selection(PDFAnalysisResult, exclude)
+    
+    parsed, filename, content_hash = await load_parsed_document(analysis_id)
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="Análisis no encontrado")
+    
+    trace = StageTrace()
+    result = build_analysis_result(parsed, filename, wpm, answer_time_seconds, trace)
+    trace.emit()
+    # Ids follow the settings: this is the analysis stored under the new ones
+    result.id = analysis_id_for(AnalysisResultCache.make_key(content_hash, wpm, answer_time_seconds))
+    return model_response(request, result, include=include_fields, exclude=exclude_fields)
+
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss/eviction counters of the analysis result cache"""
+    return analysis_cache.stats()
+
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Request, pipeline stage and outcome metrics in Prometheus text format"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @api_router.post("/status", response_model=StatusCheck)
@@ -2020,10 +3925,19 @@ async def health_check():
 # Include the router in the main app
 app.include_router(api_router)
 
+# Multipart framing around a single file is far below one chunk
+app.add_middleware(UploadSizeLimitMiddleware, limits={
+    "/api/analyze-pdf": MAX_UPLOAD_BYTES + UPLOAD_CHUNK_SIZE,
+    "/api/analyze-pdf/stream": MAX_UPLOAD_BYTES + UPLOAD_CHUNK_SIZE,
+    "/api/analyze-batch": MAX_BATCH_REQUEST_BYTES,
+})
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(RequestMetricsMiddleware)
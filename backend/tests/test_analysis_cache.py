@@ -0,0 +1,88 @@
+"""
+Backend tests for the analysis result cache
+Tests: cache keys, LRU size eviction, disk tier, hit/miss counters
+"""
+import pytest
+import sys
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+from server import AnalysisResultCache, PDFAnalysisResult, PARSER_VERSION
+
+
+def make_result(filename="test.pdf", paragraph_text="texto"):
+    return PDFAnalysisResult(
+        filename=filename,
+        total_words=1,
+        total_paragraphs=0,
+        total_questions=0,
+        total_reading_time_seconds=0,
+        total_question_time_seconds=0,
+        paragraphs=[],
+        final_questions_title=paragraph_text,
+    )
+
+
+class TestCacheKey:
+    """Unit tests for AnalysisResultCache.make_key"""
+
+    def test_key_depends_on_settings_and_version(self):
+        """Test key changes with content hash and settings, and includes the parser version"""
+        key = AnalysisResultCache.make_key("hash1", 180, 35)
+        assert key == AnalysisResultCache.make_key("hash1", 180, 35)
+        assert key != AnalysisResultCache.make_key("hash2", 180, 35)
+        assert key != AnalysisResultCache.make_key("hash1", 150, 35)
+        assert key != AnalysisResultCache.make_key("hash1", 180, 40)
+        assert key.endswith(f"v{PARSER_VERSION}")
+        print("SUCCESS: cache key covers content, settings and parser version")
+
+
+class TestAnalysisResultCache:
+    """Unit tests for AnalysisResultCache tiers and counters"""
+
+    def test_hit_and_miss_counters(self):
+        """Test get counts misses and hits and returns an equal copy"""
+        cache = AnalysisResultCache(max_bytes=1024 * 1024)
+        result = make_result()
+
+        assert cache.get("k") is None
+        cache.put("k", result)
+        cached = cache.get("k")
+
+        assert cached == result
+        assert cached is not result
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+        print("SUCCESS: hit/miss counters and copies work")
+
+    def test_size_based_lru_eviction(self):
+        """Test least recently used entries are evicted when over the byte limit"""
+        entry_size = len(make_result().model_dump_json().encode('utf-8'))
+        cache = AnalysisResultCache(max_bytes=entry_size * 2)
+
+        cache.put("a", make_result())
+        cache.put("b", make_result())
+        cache.get("a")  # "b" becomes least recently used
+        cache.put("c", make_result())
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+        print("SUCCESS: size-based LRU eviction works")
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """Test results written to disk are found by a fresh cache and promoted to memory"""
+        AnalysisResultCache(max_bytes=1024 * 1024, cache_dir=str(tmp_path)).put("k", make_result("disk.pdf"))
+
+        cache = AnalysisResultCache(max_bytes=1024 * 1024, cache_dir=str(tmp_path))
+        cached = cache.get("k")
+
+        assert cached is not None
+        assert cached.filename == "disk.pdf"
+        stats = cache.stats()
+        assert stats["disk_hits"] == 1
+        assert stats["entries"] == 1
+        print("SUCCESS: disk tier serves results across instances")
@@ -0,0 +1,313 @@
+"""
+Backend tests for deduplicated analysis storage
+Tests: deterministic ids, timing documents without paragraphs, compressed parsed documents,
+idempotent upserts, paginated summary listing, timestamp migration and fetch by id
+"""
+import pytest
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+import server
+from server import (
+    AnalysisResultCache,
+    analysis_id_for,
+    analysis_to_document,
+    analyze_pdf_with_font_info_configurable,
+    decode_analyses_cursor,
+    encode_analyses_cursor,
+    parse_pdf_source,
+    parsed_document_adapter,
+    parsed_from_document,
+    parsed_to_document,
+)
+
+PDF_PATH = "/app/Articulo_50_Humildad.pdf"
+
+
+@pytest.fixture
+def pdf_bytes():
+    if not os.path.exists(PDF_PATH):
+        pytest.skip(f"Test PDF not found: {PDF_PATH}")
+    with open(PDF_PATH, 'rb') as f:
+        return f.read()
+
+
+class TestStoredDocuments:
+    """Unit tests for the pdf_analyses and parsed_documents document shapes"""
+
+    def test_analysis_id_is_deterministic(self):
+        """Test ids depend only on content hash, settings and parser version"""
+        key = AnalysisResultCache.make_key("hash1", 180, 35)
+        assert analysis_id_for(key) == analysis_id_for(AnalysisResultCache.make_key("hash1", 180, 35))
+        assert analysis_id_for(key) != analysis_id_for(AnalysisResultCache.make_key("hash1", 150, 35))
+        assert analysis_id_for(key) != analysis_id_for(AnalysisResultCache.make_key("hash2", 180, 35))
+        print("SUCCESS: analysis ids are deterministic")
+
+    def test_timing_document_has_no_text(self, pdf_bytes):
+        """Test the per-settings document keeps the totals but no paragraph or question text"""
+        result = analyze_pdf_with_font_info_configurable(pdf_bytes, "test.pdf")
+        doc = analysis_to_document(result, "hash1", 180, 35)
+
+        assert "paragraphs" not in doc
+        assert "final_questions" not in doc
+        assert doc["analysis_key"] == AnalysisResultCache.make_key("hash1", 180, 35)
+        assert doc["total_words"] == result.total_words
+        assert doc["settings"] == {"wpm": 180, "answer_time_seconds": 35}
+        print("SUCCESS: timing document carries totals only")
+
+    def test_parsed_document_round_trip(self, pdf_bytes):
+        """Test compressed parsed documents decode to the same parser output, and are smaller"""
+        parsed = parse_pdf_source(pdf_bytes)
+        doc = parsed_to_document("hash1", parsed)
+
+        assert parsed_from_document(doc) == parsed
+        assert len(doc["data"]) < doc["size"]
+        print(f"SUCCESS: parsed document compressed {doc['size']} -> {len(doc['data'])} bytes")
+
+    def test_uncompressed_parsed_document_still_read(self, pdf_bytes):
+        """Test parsed documents stored before compression are still loaded"""
+        parsed = parse_pdf_source(pdf_bytes)
+        legacy = parsed_document_adapter.dump_python(parsed)
+        legacy["content_hash"] = "hash1"
+
+        assert parsed_from_document(legacy) == parsed
+        print("SUCCESS: legacy parsed documents are readable")
+
+
+class TestDeduplicatedPersistence:
+    """Uploads written through the write-behind queue into a mongomock database"""
+
+    def test_repeated_uploads_share_one_document(self, pdf_bytes, tmp_path, monkeypatch):
+        """Test the same PDF and settings upserts one timing document that lists with full paragraphs"""
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        database = mongomock_motor.AsyncMongoMockClient()["storage_test"]
+        monkeypatch.setattr(server, "db", database)
+        monkeypatch.setattr(server, "analysis_cache", AnalysisResultCache(max_bytes=1024 * 1024))
+        monkeypatch.setattr(server, "parsed_documents", server.ParsedDocumentStore())
+        monkeypatch.setattr(server, "recent_analyses", AnalysisResultCache(max_bytes=1024 * 1024))
+        pdf_path = tmp_path / "test.pdf"
+        pdf_path.write_bytes(pdf_bytes)
+        content_hash = "a" * 64
+
+        async def scenario():
+            results = []
+            for filename in ("first.pdf", "second.pdf"):
+                result, newly_parsed = await server.analyze_pdf_file(str(pdf_path), content_hash, filename, 180, 35)
+                server.save_analysis(result, content_hash, 180, 35)
+                if newly_parsed is not None:
+                    server.save_parsed_document(content_hash, newly_parsed)
+                results.append(result)
+            await server.persistence_queue.stop()
+            # A fresh process has nothing in memory: listing must come from Mongo alone
+            monkeypatch.setattr(server, "parsed_documents", server.ParsedDocumentStore())
+            stored = await database.pdf_analyses.find({}, {"_id": 0}).to_list(None)
+            listed, _ = await server.list_analyses()
+            parsed, filename, parsed_hash = await server.load_parsed_document(results[0].id)
+            # Neither is the recent result: the full analysis is re-timed from Mongo
+            monkeypatch.setattr(server, "recent_analyses", AnalysisResultCache(max_bytes=1024 * 1024))
+            fetched = await server.load_analysis(results[0].id)
+            return results, stored, listed, parsed, filename, parsed_hash, fetched
+
+        results, stored, listed, parsed, filename, parsed_hash, fetched = asyncio.run(scenario())
+
+        assert results[0].id == results[1].id
+        assert len(stored) == 1
+        assert stored[0]["upload_count"] == 2
+        assert stored[0]["filename"] == "second.pdf"
+        assert "paragraphs" not in stored[0]
+        assert [summary.id for summary in listed] == [results[0].id]
+        assert listed[0].total_words == results[0].total_words
+        assert parsed == parse_pdf_source(pdf_bytes)
+        assert filename == "second.pdf"
+        assert parsed_hash == content_hash
+        assert fetched.paragraphs == results[1].paragraphs
+        assert fetched.filename == "second.pdf"
+        assert server.recent_analyses.get(results[0].id) == fetched
+        print("SUCCESS: repeated uploads deduplicate and load back from compressed text")
+
+
+def timing_document(number, timestamp):
+    return {
+        "id": f"id-{number:03d}", "filename": f"{number}.pdf", "timestamp": timestamp,
+        "total_words": number, "total_paragraphs": 1, "total_questions": 1,
+        "total_reading_time_seconds": 1.0, "total_question_time_seconds": 35.0,
+        "settings": {"wpm": 180, "answer_time_seconds": 35},
+        "paragraphs": [{"text": "no debe leerse"}],
+    }
+
+
+@pytest.fixture
+def mock_database(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    database = mongomock_motor.AsyncMongoMockClient()["listing_test"]
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+class TestAnalysesListing:
+    """Cursor-paginated summaries from GET /api/analyses"""
+
+    def test_cursor_round_trip(self):
+        """Test cursors decode to the timestamp and id they were made from, and garbage is rejected"""
+        timestamp = datetime(2025, 1, 2, 3, 4, 5, 123000, tzinfo=timezone.utc)
+        assert decode_analyses_cursor(encode_analyses_cursor(timestamp, "id-1")) == (timestamp, "id-1")
+        with pytest.raises(HTTPException):
+            decode_analyses_cursor("not a cursor")
+        print("SUCCESS: cursors round-trip")
+
+    def test_pages_cover_every_analysis_once(self, mock_database):
+        """Test following the next cursor lists all analyses newest first, ties broken by id"""
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        # Pairs of analyses share a timestamp so the id tie-break is exercised
+        docs = [timing_document(n, start + timedelta(minutes=n // 2)) for n in range(7)]
+
+        async def scenario():
+            await mock_database.pdf_analyses.insert_many(docs)
+            pages, cursor = [], None
+            while True:
+                page, cursor = await server.list_analyses(limit=3, cursor=cursor)
+                pages.append(page)
+                if cursor is None:
+                    return pages
+
+        pages = asyncio.run(scenario())
+
+        listed = [summary.id for page in pages for summary in page]
+        expected = [doc["id"] for doc in sorted(docs, key=lambda d: (d["timestamp"], d["id"]), reverse=True)]
+        assert listed == expected
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert pages[0][0].wpm == 180
+        assert pages[0][0].timestamp.tzinfo is not None
+        print("SUCCESS: cursor pagination lists every analysis once")
+
+    def test_date_range(self, mock_database):
+        """Test since/until select analyses by their BSON date timestamp"""
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        docs = [timing_document(n, start + timedelta(days=n)) for n in range(5)]
+
+        async def scenario():
+            await mock_database.pdf_analyses.insert_many(docs)
+            page, _ = await server.list_analyses(since=start + timedelta(days=1), until=start + timedelta(days=3))
+            return page
+
+        listed = asyncio.run(scenario())
+
+        assert [summary.id for summary in listed] == ["id-002", "id-001"]
+        print("SUCCESS: date range filters by timestamp")
+
+    def test_string_timestamps_migrated(self, mock_database):
+        """Test analyses stored with ISO string timestamps are converted to dates"""
+        timestamp = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+        async def scenario():
+            await mock_database.pdf_analyses.insert_many([
+                timing_document(1, timestamp.isoformat()), timing_document(2, timestamp)])
+            migrated = await server.migrate_timestamps(mock_database)
+            stored = await mock_database.pdf_analyses.find({"id": "id-001"}).to_list(None)
+            return migrated, stored[0]["timestamp"]
+
+        migrated, stored_timestamp = asyncio.run(scenario())
+
+        assert migrated == 1
+        assert isinstance(stored_timestamp, datetime)
+        print("SUCCESS: string timestamps converted to dates")
+
+    def test_unparsable_timestamp_skipped(self, mock_database):
+        """Test one string that doesn't parse is left alone while the others are converted"""
+        timestamp = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+        async def scenario():
+            await mock_database.pdf_analyses.insert_many([
+                timing_document(1, "ayer"), timing_document(2, timestamp.isoformat())])
+            migrated = await server.migrate_timestamps(mock_database)
+            stored = await mock_database.pdf_analyses.find({}, {"_id": 0, "id": 1, "timestamp": 1}).to_list(None)
+            return migrated, {doc["id"]: doc["timestamp"] for doc in stored}
+
+        migrated, stored = asyncio.run(scenario())
+
+        assert migrated == 1
+        assert stored["id-001"] == "ayer"
+        assert isinstance(stored["id-002"], datetime)
+        print("SUCCESS: unparsable timestamp skipped, the rest migrated")
+
+    def test_unmigrated_string_timestamps_listed(self, mock_database, monkeypatch):
+        """Test analyses still holding string timestamps are listed and fetched instead of failing"""
+        monkeypatch.setattr(server, "recent_analyses", AnalysisResultCache(max_bytes=1024 * 1024))
+        legacy = timing_document(1, "2025-01-01T12:00:00+00:00")
+        legacy["paragraphs"] = []
+
+        async def scenario():
+            await mock_database.pdf_analyses.insert_many([legacy, timing_document(2, "ayer")])
+            listed, _ = await server.list_analyses()
+            return listed, await server.load_analysis("id-001"), await server.load_analysis("id-002")
+
+        listed, fetched, unparsable = asyncio.run(scenario())
+
+        assert [summary.id for summary in listed] == ["id-001"]
+        assert listed[0].timestamp == datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+        assert fetched.timestamp == listed[0].timestamp
+        assert unparsable is None
+        print("SUCCESS: unmigrated string timestamps still listed")
+
+    def test_index_failure_keeps_connection(self, monkeypatch):
+        """Test duplicate ids that block the unique index leave the database connected and still migrate"""
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        mongo = mongomock_motor.AsyncMongoMockClient()
+        monkeypatch.setattr(server, "AsyncIOMotorClient", lambda *args, **kwargs: mongo)
+        monkeypatch.setattr(server, "ANALYSIS_WORKERS", 0)
+        # lifespan assigns the module globals; restored after the test
+        monkeypatch.setattr(server, "db", None)
+        monkeypatch.setattr(server, "client", server.client)
+        timestamp = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+        async def scenario():
+            await mongo[server.db_name].pdf_analyses.insert_many([
+                timing_document(1, timestamp.isoformat()), timing_document(1, timestamp)])
+            async with server.lifespan(server.app):
+                connected = server.db is not None
+                legacy = await mongo[server.db_name].pdf_analyses.count_documents({"timestamp": {"$type": "string"}})
+            return connected, legacy
+
+        connected, legacy = asyncio.run(scenario())
+
+        assert connected
+        assert legacy == 0
+        print("SUCCESS: index failure logged without dropping the connection")
+
+
+class TestAnalysisLookup:
+    """Full results by id from GET /api/analyses/{id}"""
+
+    def test_recent_result_served_without_database(self, monkeypatch):
+        """Test a just-produced result is returned from memory when Mongo is unavailable"""
+        monkeypatch.setattr(server, "db", None)
+        monkeypatch.setattr(server, "recent_analyses", AnalysisResultCache(max_bytes=1024 * 1024))
+        result = server.PDFAnalysisResult(
+            filename="reciente.pdf", total_words=1, total_paragraphs=0, total_questions=0,
+            total_reading_time_seconds=0, total_question_time_seconds=0, paragraphs=[])
+        server.recent_analyses.put(result.id, result)
+
+        assert asyncio.run(server.load_analysis(result.id)) == result
+        assert asyncio.run(server.load_analysis("does-not-exist")) is None
+        print("SUCCESS: recent results served from memory")
+
+    def test_legacy_full_document_returned(self, mock_database, monkeypatch):
+        """Test analyses stored with their paragraphs are returned as stored"""
+        monkeypatch.setattr(server, "recent_analyses", AnalysisResultCache(max_bytes=1024 * 1024))
+        doc = timing_document(1, datetime(2025, 1, 1, tzinfo=timezone.utc))
+        doc["paragraphs"] = []
+
+        async def scenario():
+            await mock_database.pdf_analyses.insert_one(doc)
+            return await server.load_analysis("id-001")
+
+        result = asyncio.run(scenario())
+
+        assert result.filename == "1.pdf"
+        assert result.total_words == 1
+        print("SUCCESS: legacy analyses fetched by id")
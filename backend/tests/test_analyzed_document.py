@@ -0,0 +1,228 @@
+"""
+Backend tests for the single-pass document model
+Tests: AnalyzedDocument page caching, sharing one open document across analysis stages
+"""
+import pytest
+import asyncio
+import os
+import sys
+import fitz
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+import server
+from server import (
+    AnalyzedDocument,
+    _collect_text_items_after_line,
+    _span_items_after_line,
+    analyze_pdf_with_font_info_configurable,
+    detect_horizontal_line_separator,
+    SpanTable,
+    extract_page_range_spans,
+    extract_span_table,
+    extract_span_table_parallel,
+    extract_text_from_pdf,
+    extract_text_with_sizes,
+    parse_pdf_source,
+    trace_parse_pdf_source,
+)
+
+PDF_PATH = "/app/Articulo_50_Humildad.pdf"
+
+
+@pytest.fixture
+def pdf_bytes():
+    if not os.path.exists(PDF_PATH):
+        pytest.skip(f"Test PDF not found: {PDF_PATH}")
+    with open(PDF_PATH, 'rb') as f:
+        return f.read()
+
+
+class TestAnalyzedDocument:
+    """Unit tests for AnalyzedDocument"""
+
+    def test_page_dict_is_extracted_once(self, pdf_bytes):
+        """Test repeated page_dict calls return the cached dict"""
+        with AnalyzedDocument(pdf_bytes) as document:
+            first = document.page_dict(0)
+            second = document.page_dict(0)
+            assert first is second
+        print("SUCCESS: page dict is extracted once per page")
+
+    def test_stages_match_raw_bytes(self, pdf_bytes):
+        """Test stages give the same output for an open document and for raw bytes"""
+        with AnalyzedDocument(pdf_bytes) as document:
+            spans = [(l.text, l.font_size) for l in extract_text_with_sizes(document)]
+            separator = detect_horizontal_line_separator(document)
+            text = extract_text_from_pdf(document)
+
+        assert spans == [(l.text, l.font_size) for l in extract_text_with_sizes(pdf_bytes)]
+        assert separator == detect_horizontal_line_separator(pdf_bytes)
+        assert text == extract_text_from_pdf(pdf_bytes)
+        print("SUCCESS: shared document matches per-stage extraction")
+
+    def test_full_analysis_opens_pdf_once(self, pdf_bytes, monkeypatch):
+        """Test a full font analysis opens the PDF a single time"""
+        opens = []
+        original_open = server.fitz.open
+
+        def counting_open(*args, **kwargs):
+            opens.append(1)
+            return original_open(*args, **kwargs)
+
+        monkeypatch.setattr(server.fitz, "open", counting_open)
+        result = analyze_pdf_with_font_info_configurable(pdf_bytes, "test.pdf")
+
+        assert len(opens) == 1
+        assert result.total_paragraphs > 0
+        print("SUCCESS: PDF opened once per analysis")
+
+    def test_clipped_review_region_matches_full_page(self, pdf_bytes):
+        """Test spans collected with a clip below the separator equal those from the full page dict"""
+        line_info = detect_horizontal_line_separator(pdf_bytes)
+        if not line_info["found"]:
+            pytest.skip("No separator line in test PDF")
+
+        with AnalyzedDocument(pdf_bytes) as document:
+            clipped = _collect_text_items_after_line(document, line_info)
+        with AnalyzedDocument(pdf_bytes) as document:
+            document.page_dict(line_info["page"])
+            full_page = _collect_text_items_after_line(document, line_info)
+
+        assert clipped == full_page
+        assert all(item[0] >= line_info["page"] for item in clipped)
+        print("SUCCESS: clipped review region matches full-page extraction")
+
+    def test_review_items_from_span_table(self, pdf_bytes):
+        """Test review-question items read from the SpanTable equal those decoded from the pages"""
+        line_info = detect_horizontal_line_separator(pdf_bytes)
+        if not line_info["found"]:
+            pytest.skip("No separator line in test PDF")
+
+        with AnalyzedDocument(pdf_bytes) as document:
+            decoded = _collect_text_items_after_line(document, line_info)
+        from_spans = _span_items_after_line(extract_span_table(pdf_bytes), line_info)
+
+        assert [(p, y, t, b) for p, y, _, t, b in from_spans] == [(p, y, t, b) for p, y, _, t, b in decoded]
+        print(f"SUCCESS: {len(from_spans)} review items read from the span table")
+
+    def test_full_analysis_decodes_each_page_once(self, pdf_bytes, monkeypatch):
+        """Test no page's text dict is extracted twice, the separator page included"""
+        decoded = []
+        original_get_text = server.fitz.Page.get_text
+
+        def counting_get_text(page, option="text", **kwargs):
+            if option == "dict":
+                decoded.append(page.number)
+            return original_get_text(page, option, **kwargs)
+
+        monkeypatch.setattr(server.fitz.Page, "get_text", counting_get_text)
+        analyze_pdf_with_font_info_configurable(pdf_bytes, "test.pdf")
+
+        assert decoded and len(decoded) == len(set(decoded))
+        print(f"SUCCESS: {len(decoded)} pages decoded once each")
+
+
+class TestSpanTable:
+    """Unit tests for the columnar span store"""
+
+    def test_matches_text_lines(self, pdf_bytes):
+        """Test the table holds the same spans as the TextLine list, with aligned columns"""
+        spans = extract_span_table(pdf_bytes)
+
+        assert list(spans) == [(l.text, l.font_size) for l in extract_text_with_sizes(pdf_bytes)]
+        for column in (spans.size, spans.flags, spans.page, spans.x0, spans.y0, spans.x1, spans.y1):
+            assert len(column) == len(spans)
+        assert list(spans.sizes()) == list(spans.size)
+        assert list(spans.page) == sorted(spans.page)
+        print("SUCCESS: span table matches TextLine extraction")
+
+    def test_image_blocks_not_decoded(self, pdf_bytes):
+        """Test page dicts carry no image blocks"""
+        with AnalyzedDocument(pdf_bytes) as document:
+            for page_num in range(len(document)):
+                assert all(block['type'] == 0 for block in document.page_dict(page_num)['blocks'])
+        print("SUCCESS: image blocks are suppressed")
+
+
+class TestPageParallelExtraction:
+    """Unit tests for page-sharded span extraction"""
+
+    def test_page_ranges_concatenate_to_sequential(self, pdf_bytes):
+        """Test page-range shards merged in order equal the sequential extraction"""
+        sequential = extract_span_table(pdf_bytes)
+        sharded = SpanTable()
+        for start, stop in [(0, 2), (2, 3), (3, 100)]:
+            sharded.extend(extract_page_range_spans(pdf_bytes, start, stop))
+
+        assert list(sharded) == list(sequential)
+        assert sharded.page == sequential.page
+        print("SUCCESS: page-range shards match sequential extraction")
+
+    def test_parallel_extraction_is_identical(self):
+        """Test the async page-parallel extraction output is identical to the sequential one"""
+        if not os.path.exists(PDF_PATH):
+            pytest.skip(f"Test PDF not found: {PDF_PATH}")
+        with fitz.open(PDF_PATH) as doc:
+            page_count = doc.page_count
+        spans = asyncio.run(extract_span_table_parallel(PDF_PATH, page_count, 4))
+
+        assert list(spans) == list(extract_span_table(PDF_PATH))
+        print("SUCCESS: page-parallel extraction matches sequential extraction")
+
+    def test_long_documents_return_page_count(self, pdf_bytes):
+        """Test the worker parse hands back the page count instead of parsing documents over the threshold"""
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            page_count = doc.page_count
+
+        parsed, returned_count = trace_parse_pdf_source(pdf_bytes, None, page_count)
+        assert parsed is None
+        assert returned_count == page_count
+
+        parsed, records = trace_parse_pdf_source(pdf_bytes, None, page_count + 1)
+        assert parsed == parse_pdf_source(pdf_bytes)
+        assert [record[0] for record in records].count("open") == 1
+        spans = asyncio.run(extract_span_table_parallel(PDF_PATH, returned_count, 2))
+        assert trace_parse_pdf_source(pdf_bytes, spans, page_count)[0] == parsed
+        print(f"SUCCESS: {page_count}-page document handed back for page-parallel extraction")
+
+
+def make_lines_pdf(lines_by_page, filler_paths=0):
+    """Build a PDF with horizontal lines at the given y positions on each page, filler paths on the last page"""
+    doc = fitz.open()
+    for page_num, page_lines in enumerate(lines_by_page):
+        page = doc.new_page(width=600, height=800)
+        for y in page_lines:
+            page.draw_line((50, y), (550, y))
+        for i in range(filler_paths if page_num == len(lines_by_page) - 1 else 0):
+            page.draw_line((10, 10 + i % 100), (20, 20 + i % 100))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class TestSeparatorDetection:
+    """Unit tests for the backward-scanning separator detector"""
+
+    def test_last_line_found_scanning_backwards(self):
+        """Test the last qualifying line is returned after inspecting only the pages after it"""
+        pdf = make_lines_pdf([[500], [600, 700], [], [100]])
+        result = detect_horizontal_line_separator(pdf)
+
+        assert result["found"] is True
+        assert result["page"] == 1
+        assert result["y_position"] == 700
+        assert result["pages_inspected"] == 3
+        print("SUCCESS: backward scan stops at the last page with a separator")
+
+    def test_path_cap_abandons_heavy_page(self, monkeypatch):
+        """Test a page with more path items than the cap is skipped at the cap"""
+        monkeypatch.setattr(server, "SEPARATOR_MAX_PATH_ITEMS", 50)
+        pdf = make_lines_pdf([[400], [400]], filler_paths=200)
+        result = detect_horizontal_line_separator(pdf)
+
+        assert result["found"] is True
+        assert result["page"] == 0
+        assert result["pages_inspected"] == 2
+        assert result["paths_inspected"] == 50 + 1
+        print("SUCCESS: path item cap bounds work on vector-heavy pages")
@@ -368,5 +368,64 @@ class TestParameterValidation:
         print("SUCCESS: answer_time above 120 correctly rejected")
 
 
+class TestRetimeEndpoint:
+    """Test /api/analyses/{id}/retime recalculates times without re-uploading"""
+    
+    def test_retime_matches_fresh_upload(self):
+        """Test retiming an analysis gives the same times as uploading with those settings"""
+        pdf_path = "/app/Articulo_50_Humildad.pdf"
+        if not os.path.exists(pdf_path):
+            pytest.skip(f"Test PDF not found: {pdf_path}")
+        
+        with open(pdf_path, 'rb') as f:
+            files = {'file': ('Articulo_50_Humildad.pdf', f, 'application/pdf')}
+            original = requests.post(f"{BASE_URL}/api/analyze-pdf", files=files).json()
+        with open(pdf_path, 'rb') as f:
+            files = {'file': ('Articulo_50_Humildad.pdf', f, 'application/pdf')}
+            expected = requests.post(f"{BASE_URL}/api/analyze-pdf?wpm=150&answer_time_seconds=60", files=files).json()
+        
+        response = requests.get(f"{BASE_URL}/api/analyses/{original['id']}/retime?wpm=150&answer_time_seconds=60")
+        assert response.status_code == 200
+        data = response.json()
+        
+        assert data["id"] == expected["id"]
+        for field in ["total_reading_time_seconds", "total_question_time_seconds", "final_questions_start_time", "total_questions"]:
+            assert data[field] == expected[field], f"{field} mismatch"
+        assert [p["cumulative_time_seconds"] for p in data["paragraphs"]] == \
+            [p["cumulative_time_seconds"] for p in expected["paragraphs"]]
+        assert all(q["answer_time"] == 60 for q in data["final_questions"])
+        
+        print(f"SUCCESS: Retime matches fresh upload - {data['total_reading_time_seconds']}s reading")
+    
+    def test_retime_id_follows_settings(self):
+        """Test a retime with new settings returns the id of the analysis stored under them"""
+        pdf_path = "/app/Articulo_50_Humildad.pdf"
+        if not os.path.exists(pdf_path):
+            pytest.skip(f"Test PDF not found: {pdf_path}")
+        
+        with open(pdf_path, 'rb') as f:
+            files = {'file': ('Articulo_50_Humildad.pdf', f, 'application/pdf')}
+            original = requests.post(f"{BASE_URL}/api/analyze-pdf", files=files).json()
+        
+        same = requests.get(f"{BASE_URL}/api/analyses/{original['id']}/retime").json()
+        retimed = requests.get(f"{BASE_URL}/api/analyses/{original['id']}/retime?wpm=150&answer_time_seconds=60").json()
+        assert same["id"] == original["id"]
+        assert retimed["id"] != original["id"]
+        
+        print(f"SUCCESS: Retimed analysis id {retimed['id']} differs from {original['id']}")
+    
+    def test_retime_unknown_id(self):
+        """Test retiming an unknown analysis returns 404"""
+        response = requests.get(f"{BASE_URL}/api/analyses/does-not-exist/retime?wpm=150")
+        assert response.status_code == 404
+        print("SUCCESS: Unknown analysis id returns 404")
+    
+    def test_retime_validates_settings(self):
+        """Test retime rejects out-of-range settings"""
+        response = requests.get(f"{BASE_URL}/api/analyses/does-not-exist/retime?wpm=50")
+        assert response.status_code == 400
+        print("SUCCESS: Retime validates wpm range")
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
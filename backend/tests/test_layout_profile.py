@@ -0,0 +1,134 @@
+"""
+Backend tests for the adaptive font-band classification
+Tests: LayoutProfile bands on the sample articles, scaled layouts parsed on the font path,
+span lexer tokens
+"""
+import pytest
+import os
+import sys
+import fitz
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+from server import (
+    BAND_BODY,
+    BAND_OTHER,
+    BAND_PARA_NUMBER,
+    BAND_QUESTION,
+    LayoutProfile,
+    TOKEN_BODY,
+    TOKEN_OTHER,
+    TOKEN_PARA_NUMBER,
+    TOKEN_QUESTION_CONTINUATION,
+    TOKEN_QUESTION_START,
+    TOKEN_REVIEW_MARKER,
+    TOKEN_SONG_MARKER,
+    extract_span_table,
+    lex_spans,
+    parse_pdf_with_font_info,
+)
+
+PDF_PATH = "/app/Articulo_50_Humildad.pdf"
+
+
+def make_study_pdf(body_size, question_size, number_size):
+    """Build a two-paragraph study article with the given font sizes"""
+    doc = fitz.open()
+    page = doc.new_page(width=600, height=800)
+    y = 60
+    for number in (1, 2):
+        page.insert_text((40, y), str(number), fontsize=number_size)
+        y += body_size * 1.5
+        for _ in range(3):
+            page.insert_text((60, y), "Texto del párrafo con varias palabras para leer.", fontsize=body_size)
+            y += body_size * 1.5
+    page.insert_text((40, y), "1.", fontsize=question_size)
+    y += question_size * 1.5
+    page.insert_text((60, y), "¿Qué aprendemos del primer párrafo?", fontsize=question_size)
+    y += question_size * 1.5
+    page.insert_text((40, y), "2.", fontsize=question_size)
+    y += question_size * 1.5
+    page.insert_text((60, y), "¿Qué aprendemos del segundo párrafo?", fontsize=question_size)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class TestLayoutProfile:
+    """Unit tests for LayoutProfile"""
+
+    def test_watchtower_bands_match_fixed_windows(self):
+        """Test the derived bands on a real article equal the original fixed size windows"""
+        if not os.path.exists(PDF_PATH):
+            pytest.skip(f"Test PDF not found: {PDF_PATH}")
+        spans = extract_span_table(PDF_PATH)
+        profile = LayoutProfile.from_spans(spans)
+
+        assert profile.question_size == 9.0
+        assert profile.para_number_size == 6.8
+        assert profile.bands[BAND_QUESTION] == (8.5, 9.5)
+        assert profile.bands[BAND_PARA_NUMBER] == (6.0, 7.5)
+
+        labels = profile.classify(spans)
+        for (text, size), label in zip(spans, labels):
+            if 8.5 <= size <= 9.5:
+                assert label == BAND_QUESTION
+            elif 6.0 <= size <= 7.5:
+                assert label == BAND_PARA_NUMBER
+            elif label == BAND_BODY:
+                assert 10.0 < size < 11.5
+            else:
+                assert label == BAND_OTHER
+        print("SUCCESS: derived bands reproduce the fixed windows")
+
+    def test_scaled_layout_parsed_on_font_path(self):
+        """Test a layout printed at larger sizes gets its paragraphs and questions"""
+        pdf = make_study_pdf(13.0, 10.6, 8.0)
+        parsed = parse_pdf_with_font_info(pdf)
+        profile = LayoutProfile.from_spans(extract_span_table(pdf))
+
+        assert profile.body_size == 13.0
+        assert profile.question_size == 10.6
+        assert profile.para_number_size == 8.0
+        assert parsed.parser_mode == "font"
+        assert [p.number for p in parsed.paragraphs] == [1, 2]
+        assert [len(p.questions) for p in parsed.paragraphs] == [1, 1]
+        print("SUCCESS: scaled layout parsed with adaptive bands")
+
+
+class TestSpanLexer:
+    """Unit tests for lex_spans"""
+
+    SPANS = [
+        ("CANCIÓN 98 Un título", BAND_OTHER),
+        ("1", BAND_PARA_NUMBER),
+        ("Texto del párrafo", BAND_BODY),
+        ("1, 2.", BAND_QUESTION),
+        ("¿Qué aprendemos?", BAND_QUESTION),
+        ("¿QUÉ RESPONDERÍAS?", BAND_OTHER),
+        ("¿Cómo podemos imitarlo?", BAND_BODY),
+        ("CANCIÓN 120", BAND_OTHER),
+    ]
+
+    def test_token_stream(self):
+        """Test each span yields one token; song markers only after the review marker"""
+        texts = [text for text, _ in self.SPANS]
+        bands = [band for _, band in self.SPANS]
+        tokens = list(lex_spans(texts, bands))
+
+        assert [kind for kind, _, _ in tokens] == [
+            TOKEN_OTHER, TOKEN_PARA_NUMBER, TOKEN_BODY, TOKEN_QUESTION_START,
+            TOKEN_QUESTION_CONTINUATION, TOKEN_REVIEW_MARKER, TOKEN_BODY, TOKEN_SONG_MARKER,
+        ]
+        assert tokens[3][2] == [1, 2]
+        print("SUCCESS: lexer emits one token per span")
+
+    def test_review_detection_disabled(self):
+        """Test no review or song markers are emitted when review detection is off"""
+        texts = [text for text, _ in self.SPANS]
+        bands = [band for _, band in self.SPANS]
+        kinds = [kind for kind, _, _ in lex_spans(texts, bands, detect_review_section=False)]
+
+        assert TOKEN_REVIEW_MARKER not in kinds
+        assert TOKEN_SONG_MARKER not in kinds
+        print("SUCCESS: review markers only emitted when requested")
@@ -0,0 +1,35 @@
+"""
+Backend tests for the offline load-test harness
+Tests: nearest-rank percentiles, an in-process run through the ASGI transport
+"""
+import argparse
+import asyncio
+import sys
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+from benchmarks.load_test import ROUTES, load_documents, percentile, run_in_process
+
+
+class TestLoadHarness:
+    """Unit tests for benchmarks/load_test.py"""
+
+    def test_percentile_nearest_rank(self):
+        """Test percentiles pick the nearest-rank value of the sorted latencies"""
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 0.50) == 50.0
+        assert percentile(values, 0.95) == 95.0
+        assert percentile(values, 0.99) == 99.0
+        assert percentile([7.0], 0.99) == 7.0
+        print("SUCCESS: nearest-rank percentiles")
+
+    def test_in_process_run_reports_every_route(self):
+        """Test a small run drives the app in process and reports each route without errors"""
+        args = argparse.Namespace(workers=0, mongo="none", uploads=2, concurrency=2, warm=False)
+        results = asyncio.run(run_in_process(args, load_documents([2])[-1:]))
+
+        assert results["target"] == "in-process ASGI"
+        for route in ROUTES:
+            assert results["routes"][route]["requests"] == 2
+            assert results["routes"][route]["errors"] == 0
+        print("SUCCESS: in-process load run")
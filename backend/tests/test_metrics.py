@@ -0,0 +1,100 @@
+"""
+Backend tests for the Prometheus metrics endpoint
+Tests: counter/histogram text format, stage hook, route latency labels, /api/metrics scrape
+"""
+import pytest
+import requests
+import os
+import sys
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+from server import (
+    MetricsRegistry,
+    StageTrace,
+    parse_pdf_source,
+    record_stage_metrics,
+    stage_duration,
+)
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+PDF_PATH = "/app/Articulo_50_Humildad.pdf"
+
+
+class TestMetricsRegistry:
+    """Unit tests for the in-process metrics registry"""
+
+    def test_counter_render(self):
+        """Test counters render HELP/TYPE lines and one sample per label set"""
+        registry = MetricsRegistry()
+        counter = registry.counter("things_total", "Things seen", ("kind",))
+        counter.inc(kind="a")
+        counter.inc(2, kind="a")
+        counter.inc(kind='b"c')
+
+        text = registry.render()
+        assert "# TYPE things_total counter" in text
+        assert 'things_total{kind="a"} 3.0' in text
+        assert 'things_total{kind="b\\"c"} 1.0' in text
+        print("SUCCESS: counter rendered with escaped labels")
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets count every observation at or below the bound"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, route="/x")
+
+        lines = registry.render().splitlines()
+        assert 'latency_seconds_bucket{route="/x",le="0.1"} 1' in lines
+        assert 'latency_seconds_bucket{route="/x",le="1.0"} 2' in lines
+        assert 'latency_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+        assert 'latency_seconds_count{route="/x"} 3' in lines
+        assert 'latency_seconds_sum{route="/x"} 5.55' in lines
+        print("SUCCESS: histogram buckets are cumulative")
+
+    def test_stage_hook_feeds_stage_histogram(self):
+        """Test pipeline trace records, sub-stages included, are observed per stage"""
+        if not os.path.exists(PDF_PATH):
+            pytest.skip(f"Test PDF not found: {PDF_PATH}")
+        before = stage_duration.count(stage="extract.separator")
+
+        trace = StageTrace()
+        parse_pdf_source(PDF_PATH, trace=trace)
+        for record in trace.records:
+            record_stage_metrics(*record)
+
+        assert stage_duration.count(stage="extract.separator") == before + 1
+        assert stage_duration.count(stage="assign") >= 1
+        print("SUCCESS: stage records observed")
+
+
+class TestMetricsEndpoint:
+    """API tests for GET /api/metrics"""
+
+    def test_scrape_contains_route_latency(self):
+        """Test a scrape exposes request latency labelled by route template"""
+        requests.get(f"{BASE_URL}/api/health")
+        response = requests.get(f"{BASE_URL}/api/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'route="/api/health"' in response.text
+        assert "# TYPE analysis_stage_duration_seconds histogram" in response.text
+        print("SUCCESS: metrics endpoint scraped")
+
+    def test_analysis_counts_parser_path(self):
+        """Test analyzing a PDF increments the stage and outcome metrics"""
+        if not os.path.exists(PDF_PATH):
+            pytest.skip(f"Test PDF not found: {PDF_PATH}")
+        with open(PDF_PATH, 'rb') as f:
+            response = requests.post(
+                f"{BASE_URL}/api/analyze-pdf",
+                files={"file": ("Articulo_50_Humildad.pdf", f, "application/pdf")}
+            )
+        assert response.status_code == 200
+
+        text = requests.get(f"{BASE_URL}/api/metrics").text
+        assert 'route="/api/analyze-pdf"' in text
+        assert 'analysis_requests_total{source=' in text
+        print("SUCCESS: analysis metrics recorded")
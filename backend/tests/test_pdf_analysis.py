@@ -5,6 +5,8 @@ Tests: PDF upload, analysis, question detection, time calculations
 import pytest
 import requests
 import os
+import io
+import zipfile
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 
@@ -108,6 +110,15 @@ class TestPDFAnalysis:
         assert "detail" in data
         print("SUCCESS: Non-PDF file correctly rejected")
 
+    def test_reject_pdf_name_without_pdf_header(self):
+        """Test that a .pdf file without a %PDF header is rejected before parsing"""
+        files = {'file': ('fake.pdf', b'This is not a PDF either', 'application/pdf')}
+        response = requests.post(f"{BASE_URL}/api/analyze-pdf", files=files)
+        
+        assert response.status_code == 400
+        assert "detail" in response.json()
+        print("SUCCESS: File without PDF header correctly rejected")
+
     def test_reading_time_calculation(self):
         """Test reading time calculation at 180 WPM"""
         pdf_path = "/app/test_questions.pdf"
@@ -167,6 +178,65 @@ class TestAnalysesEndpoint:
         assert isinstance(data, list)
         print(f"SUCCESS: Retrieved {len(data)} analyses")
 
+    def test_get_analysis_by_id(self):
+        """Test a previous analysis can be fetched by id without re-uploading"""
+        pdf_path = "/app/Articulo_50_Humildad.pdf"
+        if not os.path.exists(pdf_path):
+            pytest.skip(f"Test PDF not found: {pdf_path}")
+        
+        with open(pdf_path, 'rb') as f:
+            files = {'file': ('Articulo_50_Humildad.pdf', f, 'application/pdf')}
+            original = requests.post(f"{BASE_URL}/api/analyze-pdf", files=files).json()
+        
+        response = requests.get(f"{BASE_URL}/api/analyses/{original['id']}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["id"] == original["id"]
+        assert data["paragraphs"] == original["paragraphs"]
+        assert data["total_time_seconds"] == original["total_time_seconds"]
+        
+        response = requests.get(f"{BASE_URL}/api/analyses/does-not-exist")
+        assert response.status_code == 404
+        print("SUCCESS: Analysis fetched by id")
+
+
+class TestBatchAnalysis:
+    """Test batch analysis endpoint"""
+    
+    def test_analyze_batch_files_and_zip(self):
+        """Test batch with PDFs, a ZIP of PDFs and an invalid file returns per-file results"""
+        pdf_path = "/app/Articulo_50_Humildad.pdf"
+        if not os.path.exists(pdf_path):
+            pytest.skip(f"Test PDF not found: {pdf_path}")
+        
+        with open(pdf_path, 'rb') as f:
+            pdf_bytes = f.read()
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('articulos/humildad.pdf', pdf_bytes)
+            zf.writestr('articulos/notas.txt', 'no es un PDF')
+        
+        files = [
+            ('files', ('Articulo_50_Humildad.pdf', pdf_bytes, 'application/pdf')),
+            ('files', ('test.txt', b'This is not a PDF', 'text/plain')),
+            ('files', ('trimestre.zip', archive.getvalue(), 'application/zip')),
+        ]
+        response = requests.post(f"{BASE_URL}/api/analyze-batch", files=files)
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_files"] == 3
+        assert data["succeeded"] == 2
+        assert data["failed"] == 1
+        
+        by_name = {item["filename"]: item for item in data["results"]}
+        assert by_name["test.txt"]["error"]
+        assert by_name["test.txt"]["result"] is None
+        assert by_name["humildad.pdf"]["result"]["total_paragraphs"] == \
+            by_name["Articulo_50_Humildad.pdf"]["result"]["total_paragraphs"]
+        
+        print(f"SUCCESS: Batch analyzed {data['succeeded']} PDFs, {data['failed']} rejected")
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
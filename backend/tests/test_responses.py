@@ -0,0 +1,191 @@
+"""
+Backend tests for the JSON response path
+Tests: Accept-Encoding negotiation, single-pass serialization, compression and size metrics,
+sparse field selection
+"""
+import pytest
+import gzip
+import json
+import os
+import sys
+import requests
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+import server
+from server import (
+    AnalysisSummary,
+    PDFAnalysisResult,
+    analyze_pdf_with_font_info_configurable,
+    model_response,
+    negotiate_encoding,
+    parse_field_selection,
+)
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+PDF_PATH = "/app/Articulo_50_Humildad.pdf"
+
+
+@pytest.fixture
+def result():
+    if not os.path.exists(PDF_PATH):
+        pytest.skip(f"Test PDF not found: {PDF_PATH}")
+    return analyze_pdf_with_font_info_configurable(PDF_PATH, "test.pdf")
+
+
+def make_request(accept_encoding=None):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/api/test", "headers": headers})
+
+
+class TestNegotiateEncoding:
+    """Unit tests for negotiate_encoding"""
+
+    def test_gzip_and_identity(self, monkeypatch):
+        """Test gzip is chosen when accepted, identity otherwise"""
+        monkeypatch.setattr(server, "brotli", None)
+        assert negotiate_encoding("gzip, deflate") == "gzip"
+        assert negotiate_encoding("br, gzip;q=0.5") == "gzip"
+        assert negotiate_encoding("deflate") == "identity"
+        assert negotiate_encoding("") == "identity"
+        assert negotiate_encoding("gzip;q=0") == "identity"
+        assert negotiate_encoding("*") == "gzip"
+        assert negotiate_encoding("*, gzip;q=0") == "identity"
+        print("SUCCESS: gzip negotiation honours q-values")
+
+    def test_brotli_preferred_when_available(self, monkeypatch):
+        """Test br wins over gzip when the brotli module is installed and the client accepts it"""
+        monkeypatch.setattr(server, "brotli", object())
+        assert negotiate_encoding("gzip, deflate, br") == "br"
+        assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+        assert negotiate_encoding("gzip") == "gzip"
+        print("SUCCESS: brotli negotiation works")
+
+
+class TestModelResponse:
+    """Unit tests for model_response"""
+
+    def test_body_matches_default_encoder(self, result):
+        """Test the body is the JSON FastAPI's default encoder would produce"""
+        response = model_response(make_request(), result)
+
+        assert response.media_type == "application/json"
+        assert "content-encoding" not in response.headers
+        assert json.loads(response.body) == jsonable_encoder(result)
+        assert PDFAnalysisResult.model_validate_json(response.body) == result
+        print("SUCCESS: single-pass serialization matches the default encoder")
+
+    def test_gzip_when_accepted(self, result, monkeypatch):
+        """Test large bodies are gzip-compressed for clients that accept it"""
+        monkeypatch.setattr(server, "brotli", None)
+        response = model_response(make_request("gzip, deflate"), result, {"X-Next-Cursor": "c"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["x-next-cursor"] == "c"
+        raw = gzip.decompress(response.body)
+        assert json.loads(raw) == jsonable_encoder(result)
+        assert len(response.body) < len(raw)
+        print(f"SUCCESS: gzip response {len(raw)} -> {len(response.body)} bytes")
+
+    def test_small_bodies_not_compressed(self, monkeypatch):
+        """Test bodies under the threshold are sent as they are"""
+        monkeypatch.setattr(server, "RESPONSE_COMPRESSION_MIN_BYTES", 1024)
+        response = model_response(make_request("gzip"), [])
+
+        assert response.body == b"[]"
+        assert "content-encoding" not in response.headers
+        print("SUCCESS: small bodies are not compressed")
+
+    def test_size_metrics_recorded(self, result):
+        """Test raw and encoded sizes and serialization time are observed per route"""
+        model_response(make_request("gzip"), result)
+        rendered = server.metrics.render()
+
+        assert 'http_response_raw_bytes_count{route="unmatched"}' in rendered
+        assert 'http_response_encoded_bytes_count{route="unmatched",encoding="gzip"}' in rendered
+        assert 'http_response_serialize_seconds_count{route="unmatched"}' in rendered
+        assert 'http_response_compress_seconds_count{route="unmatched",encoding="gzip"}' in rendered
+        print("SUCCESS: response size and time metrics recorded")
+
+
+class TestFieldSelection:
+    """Unit tests for fields=/exclude= parsing and serialization"""
+
+    def test_paths_become_nested_specs(self):
+        """Test dotted paths map to include/exclude specs with __all__ for list fields"""
+        spec = parse_field_selection(PDFAnalysisResult, "paragraphs.text, paragraphs.questions.text,final_questions")
+
+        assert spec == {
+            "paragraphs": {"__all__": {"text": True, "questions": {"__all__": {"text": True}}}},
+            "final_questions": True,
+        }
+        assert parse_field_selection(PDFAnalysisResult, "paragraphs,paragraphs.text") == {"paragraphs": True}
+        assert parse_field_selection(AnalysisSummary, "id", many=True) == {"__all__": {"id": True}}
+        assert parse_field_selection(PDFAnalysisResult, None) is None
+        print("SUCCESS: field paths parsed")
+
+    def test_unknown_fields_rejected(self):
+        """Test unknown fields, paths into scalar fields and empty lists are a 400"""
+        for spec in ("paragraphs.texto", "nope", "total_words.value", "", ",", " ", " , "):
+            with pytest.raises(HTTPException) as error:
+                parse_field_selection(PDFAnalysisResult, spec)
+            assert error.value.status_code == 400
+        print("SUCCESS: unknown fields rejected")
+
+    def test_timing_only_view(self, result):
+        """Test excluding text leaves the timing numbers and shrinks the body"""
+        exclude = parse_field_selection(
+            PDFAnalysisResult, "paragraphs.text,paragraphs.questions,final_questions,final_questions_title")
+        full = model_response(make_request(), result)
+        timing = model_response(make_request(), result, exclude=exclude)
+        data = json.loads(timing.body)
+
+        assert all(set(p) == {"number", "word_count", "reading_time_seconds", "total_time_seconds",
+                              "cumulative_time_seconds", "grouped_with"} for p in data["paragraphs"])
+        assert data["total_time_seconds"] == result.total_time_seconds
+        assert "final_questions" not in data
+        assert len(timing.body) < len(full.body) / 2
+        print(f"SUCCESS: timing-only view {len(full.body)} -> {len(timing.body)} bytes")
+
+
+class TestResponsesAPI:
+    """Compressed and field-selected responses from the running server"""
+
+    def test_analyze_pdf_gzip(self):
+        """Test analyze-pdf responses are gzip-encoded for clients that accept gzip"""
+        if not os.path.exists(PDF_PATH):
+            pytest.skip(f"Test PDF not found: {PDF_PATH}")
+
+        with open(PDF_PATH, 'rb') as f:
+            files = {'file': ('Articulo_50_Humildad.pdf', f, 'application/pdf')}
+            response = requests.post(f"{BASE_URL}/api/analyze-pdf", files=files,
+                                     headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.json()["total_paragraphs"] > 0
+        print("SUCCESS: analyze-pdf response is gzip-encoded")
+
+    def test_analyze_pdf_exclude_text(self):
+        """Test analyze-pdf leaves out the excluded fields and rejects unknown ones"""
+        if not os.path.exists(PDF_PATH):
+            pytest.skip(f"Test PDF not found: {PDF_PATH}")
+
+        with open(PDF_PATH, 'rb') as f:
+            pdf_bytes = f.read()
+        files = {'file': ('Articulo_50_Humildad.pdf', pdf_bytes, 'application/pdf')}
+        response = requests.post(f"{BASE_URL}/api/analyze-pdf?exclude=paragraphs.text,paragraphs.questions.text",
+                                 files=files)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["paragraphs"] and all("text" not in p for p in data["paragraphs"])
+        assert all("text" not in q for p in data["paragraphs"] for q in p["questions"])
+
+        response = requests.post(f"{BASE_URL}/api/analyze-pdf?fields=paragraphs.texto", files=files)
+        assert response.status_code == 400
+        print("SUCCESS: analyze-pdf applies exclude")
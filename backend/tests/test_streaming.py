@@ -0,0 +1,186 @@
+"""
+Backend tests for streamed analyses
+Tests: event order and content, equivalence with the full result, NDJSON and SSE encoding,
+paragraphs handed out during the parse, stream endpoint
+"""
+import pytest
+import asyncio
+import json
+import os
+import sys
+import requests
+from datetime import datetime, timezone
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+import server
+from server import (
+    AnalysisContext,
+    build_analysis_result,
+    encode_stream_event,
+    iter_analysis_events,
+    iter_parsed_paragraphs,
+    iter_result_events,
+    parse_pdf_source,
+)
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+PDF_PATH = "/app/Articulo_50_Humildad.pdf"
+
+
+@pytest.fixture
+def parsed():
+    if not os.path.exists(PDF_PATH):
+        pytest.skip(f"Test PDF not found: {PDF_PATH}")
+    return parse_pdf_source(PDF_PATH)
+
+
+def stream_context(parsed, wpm=150, answer_time=40):
+    ctx = AnalysisContext()
+    ctx.parsed = parsed
+    ctx.filename = "test.pdf"
+    ctx.wpm = wpm
+    ctx.answer_time = answer_time
+    return ctx
+
+
+async def replay(paragraphs):
+    for para in paragraphs:
+        yield para
+
+
+def collect_events(ctx, analysis_id="id-1"):
+    async def collect():
+        paragraphs = replay(ctx.parsed.paragraphs)
+        return [event async for event in iter_analysis_events(ctx, analysis_id, datetime.now(timezone.utc), paragraphs)]
+    return asyncio.run(collect())
+
+
+class TestAnalysisEvents:
+    """Unit tests for iter_analysis_events"""
+
+    def test_event_order(self, parsed):
+        """Test header first, one event per paragraph, then review questions and totals"""
+        events = collect_events(stream_context(parsed))
+        names = [event for event, _ in events]
+
+        assert names == ["header"] + ["paragraph"] * len(parsed.paragraphs) + ["review_questions", "totals"]
+        header = events[0][1]
+        assert header["id"] == "id-1"
+        assert header["wpm"] == 150
+        totals = events[-1][1]
+        assert totals["total_paragraphs"] == len(parsed.paragraphs)
+        assert totals["total_review_questions"] == len(parsed.final_questions)
+        print("SUCCESS: events streamed in order")
+
+    def test_events_match_full_result(self, parsed):
+        """Test the streamed paragraphs, questions and totals equal the non-streamed result"""
+        ctx = stream_context(parsed)
+        events = collect_events(ctx)
+        expected = build_analysis_result(parsed, "test.pdf", 150, 40)
+
+        paragraphs = [data for event, data in events if event == "paragraph"]
+        assert paragraphs == [p.model_dump() for p in expected.paragraphs]
+        review = events[-2][1]
+        assert review["final_questions"] == [q.model_dump() for q in expected.final_questions]
+        totals = events[-1][1]
+        assert totals["total_question_time_seconds"] == expected.total_question_time_seconds
+        assert totals["final_questions_start_time"] == expected.final_questions_start_time
+        assert "paragraphs" not in totals
+        assert ctx.result.paragraphs == expected.paragraphs
+        assert ctx.result.id == "id-1"
+        print("SUCCESS: streamed events match the full result")
+
+    def test_cached_result_replays_same_events(self, parsed):
+        """Test a cached result is streamed as the same events a fresh analysis produces"""
+        ctx = stream_context(parsed)
+        events = collect_events(ctx)
+        replayed = list(iter_result_events(stream_context(parsed), ctx.result))
+
+        assert replayed == events
+        print("SUCCESS: cached result replayed")
+
+    def test_encoding(self):
+        """Test NDJSON lines and SSE frames"""
+        assert encode_stream_event("totals", {"a": 1}) == b'{"event":"totals","data":{"a":1}}\n'
+        assert encode_stream_event("totals", {"a": "x\ny"}, sse=True) == b'event: totals\ndata: {"a":"x\\ny"}\n\n'
+        print("SUCCESS: stream events encoded")
+
+
+class TestIncrementalParse:
+    """Paragraphs handed out by the parse stages while the parse runs"""
+
+    def test_sink_receives_every_paragraph_during_parse(self, parsed):
+        """Test the sink gets each paragraph, in order, before the parse returns"""
+        received = []
+        result = parse_pdf_source(PDF_PATH, paragraph_sink=received.append)
+
+        assert received == result.paragraphs == parsed.paragraphs
+        assert all(a is b for a, b in zip(received, result.paragraphs))
+        print(f"SUCCESS: {len(received)} paragraphs handed out during the parse")
+
+    def test_parsed_paragraphs_from_parse_and_store(self, parsed, monkeypatch):
+        """Test paragraphs come through the channel on a parse and from the store afterwards"""
+        monkeypatch.setattr(server, "analysis_pool", None)
+        monkeypatch.setattr(server, "parsed_documents", server.ParsedDocumentStore())
+
+        async def collect(ctx):
+            return [para async for para in iter_parsed_paragraphs(ctx, PDF_PATH, "stream-hash")]
+
+        first, second = stream_context(parsed), stream_context(parsed)
+        streamed = asyncio.run(collect(first))
+        replayed = asyncio.run(collect(second))
+
+        assert streamed == replayed == parsed.paragraphs
+        assert first.newly_parsed == parsed
+        assert second.newly_parsed is None and second.parsed == parsed
+        print("SUCCESS: paragraphs streamed from the parse and replayed from the store")
+
+
+class TestStreamEndpoint:
+    """Test /api/analyze-pdf/stream on the running server"""
+
+    def test_stream_ndjson(self):
+        """Test the NDJSON stream carries every paragraph and ends with the totals"""
+        if not os.path.exists(PDF_PATH):
+            pytest.skip(f"Test PDF not found: {PDF_PATH}")
+
+        with open(PDF_PATH, 'rb') as f:
+            files = {'file': ('Articulo_50_Humildad.pdf', f, 'application/pdf')}
+            response = requests.post(f"{BASE_URL}/api/analyze-pdf/stream", files=files, stream=True)
+            assert response.status_code == 200
+            assert response.headers["Content-Type"].startswith("application/x-ndjson")
+            events = [json.loads(line) for line in response.iter_lines() if line]
+
+        assert events[0]["event"] == "header"
+        assert events[-1]["event"] == "totals"
+        paragraphs = [e["data"] for e in events if e["event"] == "paragraph"]
+        assert len(paragraphs) == events[-1]["data"]["total_paragraphs"]
+        assert events[-1]["data"]["id"] == events[0]["data"]["id"]
+        print(f"SUCCESS: streamed {len(paragraphs)} paragraphs")
+
+    def test_stream_matches_analyze_pdf(self):
+        """Test the streamed paragraphs equal the /api/analyze-pdf result for the same upload"""
+        if not os.path.exists(PDF_PATH):
+            pytest.skip(f"Test PDF not found: {PDF_PATH}")
+
+        with open(PDF_PATH, 'rb') as f:
+            pdf_bytes = f.read()
+        files = {'file': ('Articulo_50_Humildad.pdf', pdf_bytes, 'application/pdf')}
+        response = requests.post(f"{BASE_URL}/api/analyze-pdf/stream", files=files,
+                                 headers={"Accept": "text/event-stream"})
+        assert response.headers["Content-Type"].startswith("text/event-stream")
+        frames = [frame for frame in response.text.split("\n\n") if frame]
+        paragraphs = [json.loads(frame.split("\ndata: ", 1)[1]) for frame in frames
+                      if frame.startswith("event: paragraph")]
+        expected = requests.post(f"{BASE_URL}/api/analyze-pdf", files=files).json()
+
+        assert paragraphs == expected["paragraphs"]
+        print("SUCCESS: SSE stream matches analyze-pdf")
+
+    def test_stream_rejects_non_pdf(self):
+        """Test non-PDF uploads fail before streaming starts"""
+        files = {'file': ('notes.txt', b'hola', 'text/plain')}
+        response = requests.post(f"{BASE_URL}/api/analyze-pdf/stream", files=files)
+        assert response.status_code == 400
+        print("SUCCESS: non-PDF upload rejected")
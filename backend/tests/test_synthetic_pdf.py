@@ -0,0 +1,57 @@
+"""
+Backend tests for the synthetic study-article generator
+Tests: parser totals on generated PDFs, both column layouts, determinism, page count, drawing density
+"""
+import pytest
+import sys
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+from benchmarks.synthetic_pdf import build_study_article
+from server import analyze_pdf_with_font_info_configurable, detect_horizontal_line_separator
+
+
+def assert_parsed_as_generated(article):
+    result = analyze_pdf_with_font_info_configurable(article.pdf_bytes, "synthetic.pdf")
+    questions = [q for p in result.paragraphs for q in p.questions if q.text]
+
+    assert result.total_paragraphs == article.paragraphs
+    assert len(questions) == article.questions
+    assert len(result.final_questions) == article.review_questions
+    assert result.total_images == article.images
+    assert result.total_scriptures == article.scriptures
+    assert result.total_notes == article.notes
+    return result
+
+
+class TestSyntheticArticle:
+    """Unit tests for build_study_article"""
+
+    @pytest.mark.parametrize("two_columns", [True, False])
+    def test_parser_finds_generated_content(self, two_columns):
+        """Test paragraphs, grouped questions, references and review questions are all recovered"""
+        article = build_study_article(paragraphs=18, two_columns=two_columns)
+        result = assert_parsed_as_generated(article)
+
+        grouped = [p for p in result.paragraphs if p.grouped_with]
+        assert grouped
+        print(f"SUCCESS: synthetic article parsed (two_columns={two_columns})")
+
+    def test_same_arguments_same_bytes(self):
+        """Test generation is deterministic and the seed changes the output"""
+        first = build_study_article(paragraphs=10, seed=3)
+
+        assert build_study_article(paragraphs=10, seed=3).pdf_bytes == first.pdf_bytes
+        assert build_study_article(paragraphs=10, seed=4).pdf_bytes != first.pdf_bytes
+        print("SUCCESS: generation is deterministic")
+
+    def test_requested_page_count(self):
+        """Test the text is spread over the requested pages with the separator on the last one"""
+        article = build_study_article(paragraphs=60, pages=20, drawings_per_page=50)
+
+        assert article.pages == 20
+        line_info = detect_horizontal_line_separator(article.pdf_bytes)
+        assert line_info["page"] == 19
+        assert line_info["paths_inspected"] > 50
+        assert_parsed_as_generated(article)
+        print("SUCCESS: 20-page article generated")
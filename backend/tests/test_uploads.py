@@ -0,0 +1,136 @@
+"""
+Backend tests for upload size limits
+Tests: declared Content-Length rejected before the body is read, chunked bodies cut off at the limit,
+ZIP members inflated off the event loop
+"""
+import pytest
+import asyncio
+import io
+import os
+import sys
+import threading
+import zipfile
+import httpx
+from fastapi import FastAPI, UploadFile, File
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+from server import UploadSizeLimitMiddleware, extract_pdfs_from_zip
+
+LIMIT = 4096
+
+
+def limited_app():
+    app = FastAPI()
+    received = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        received.append(len(await file.read()))
+        return {"size": received[-1]}
+
+    app.add_middleware(UploadSizeLimitMiddleware, limits={"/upload": LIMIT})
+    return app, received
+
+
+def post(app, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.post("/upload", **kwargs)
+    return asyncio.run(send())
+
+
+async def multipart_chunks(size):
+    yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.pdf"\r\n\r\n'
+    for _ in range(size // 1024):
+        yield b"x" * 1024
+    yield b"\r\n--b--\r\n"
+
+
+class TestUploadSizeLimit:
+    """Unit tests for UploadSizeLimitMiddleware"""
+
+    def test_small_upload_passes(self):
+        """Test uploads under the limit reach the handler"""
+        app, received = limited_app()
+        response = post(app, files={"file": ("a.pdf", b"%PDF" * 10, "application/pdf")})
+
+        assert response.status_code == 200
+        assert received == [40]
+        print("SUCCESS: small upload accepted")
+
+    def test_declared_length_rejected_before_handler(self):
+        """Test a Content-Length over the limit is a 413 and the form is never parsed"""
+        app, received = limited_app()
+        response = post(app, files={"file": ("a.pdf", b"x" * (2 * LIMIT), "application/pdf")})
+
+        assert response.status_code == 413
+        assert "tamaño máximo" in response.json()["detail"]
+        assert received == []
+        print("SUCCESS: oversized declared upload rejected")
+
+    def test_chunked_body_cut_off(self):
+        """Test a body without Content-Length is stopped once it passes the limit"""
+        app, received = limited_app()
+        response = post(app, content=multipart_chunks(4 * LIMIT),
+                        headers={"Content-Type": "multipart/form-data; boundary=b"})
+
+        assert response.status_code == 413
+        assert received == []
+        print("SUCCESS: oversized chunked upload rejected")
+
+    def test_other_routes_unaffected(self):
+        """Test paths without a limit are passed through"""
+        app, _ = limited_app()
+
+        @app.post("/other")
+        async def other(file: UploadFile = File(...)):
+            return {"size": len(await file.read())}
+
+        async def send():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return await http.post("/other", files={"file": ("a.pdf", b"x" * (2 * LIMIT), "application/pdf")})
+
+        assert asyncio.run(send()).status_code == 200
+        print("SUCCESS: unlimited routes pass through")
+
+
+class TestZipExtraction:
+    """Unit tests for extract_pdfs_from_zip"""
+
+    def test_members_inflated_off_event_loop(self, monkeypatch):
+        """Test the archive is opened and members are read in worker threads"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("a.pdf", b"%PDF-1.4\n" + b"x" * 200000)
+            archive.writestr("b.pdf", b"%PDF-1.4\n" + b"y" * 200000)
+            archive.writestr("notes.txt", b"ignored")
+        buffer.seek(0)
+
+        threads = []
+        for cls, name in ((zipfile.ZipFile, "__init__"), (zipfile.ZipExtFile, "read")):
+            original = getattr(cls, name)
+
+            def recording(self, *args, _original=original, **kwargs):
+                threads.append(threading.current_thread())
+                return _original(self, *args, **kwargs)
+            monkeypatch.setattr(cls, name, recording)
+
+        async def extract():
+            return await extract_pdfs_from_zip(UploadFile(file=buffer, filename="batch.zip"), 10)
+        extracted, errors = asyncio.run(extract())
+        try:
+            assert [name for name, _, _ in extracted] == ["a.pdf", "b.pdf"]
+            assert errors == []
+            assert threads
+            assert threading.main_thread() not in threads
+        finally:
+            for _, pdf_path, _ in extracted:
+                os.unlink(pdf_path)
+        print("SUCCESS: ZIP extraction runs off the event loop")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,154 @@
+"""
+Backend tests for the write-behind persistence queue
+Tests: batched bulk writes, flush on stop, stop during a flush, retry, circuit breaker shedding,
+bounded depth
+"""
+import pytest
+import asyncio
+import sys
+from pymongo import InsertOne
+from pymongo.errors import AutoReconnect
+
+# Add backend to path for direct imports
+sys.path.insert(0, '/app/backend')
+import server
+from server import WriteBehindQueue
+
+
+class RecordingDatabase(dict):
+    """
+    Collections whose bulk_write records the batches, or raises while `failing` is set.
+    Each bulk_write takes `delay` seconds.
+    """
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+        self.failing = False
+        self.delay = 0
+
+    def __getitem__(self, name):
+        database = self
+
+        class Collection:
+            async def bulk_write(self, operations, ordered=True):
+                if database.delay:
+                    await asyncio.sleep(database.delay)
+                if database.failing:
+                    raise AutoReconnect("connection refused")
+                database.batches.append((name, len(operations)))
+
+        return Collection()
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = RecordingDatabase()
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+class TestWriteBehindQueue:
+    """Unit tests for WriteBehindQueue"""
+
+    def test_size_trigger_batches_writes(self, database):
+        """Test writes are grouped per collection into bulk writes of at most batch_size"""
+        async def scenario():
+            queue = WriteBehindQueue(batch_size=3, flush_interval=60)
+            for i in range(3):
+                assert queue.enqueue("pdf_analyses", InsertOne({"i": i}))
+            await asyncio.sleep(0.05)
+            assert database.batches == [("pdf_analyses", 3)]
+            queue.enqueue("parsed_documents", InsertOne({"i": 3}))
+            await queue.stop()
+            return queue
+
+        queue = asyncio.run(scenario())
+        assert database.batches == [("pdf_analyses", 3), ("parsed_documents", 1)]
+        assert queue.depth == 0
+        print("SUCCESS: size-triggered batches and flush on stop")
+
+    def test_stop_during_flush_keeps_writes(self, database):
+        """Test stop() while a bulk write is in flight waits for it instead of losing the batch"""
+        async def scenario():
+            database.delay = 0.1
+            queue = WriteBehindQueue(batch_size=3, flush_interval=60)
+            for i in range(3):
+                queue.enqueue("pdf_analyses", InsertOne({"i": i}))
+            await asyncio.sleep(0.02)
+            assert database.batches == [] and queue.depth == 0  # batch taken, write in flight
+            await queue.stop()
+            return queue
+
+        queue = asyncio.run(scenario())
+        assert database.batches == [("pdf_analyses", 3)]
+        assert queue.depth == 0
+        print("SUCCESS: in-flight batch written on stop")
+
+    def test_cancelled_flush_requeues_batch(self, database):
+        """Test a flush cancelled mid-write puts its unwritten operations back on the queue"""
+        async def scenario():
+            database.delay = 0.1
+            queue = WriteBehindQueue(batch_size=10, flush_interval=60)
+            queue.enqueue("pdf_analyses", InsertOne({"i": 0}))
+            queue.enqueue("parsed_documents", InsertOne({"i": 1}))
+            flush = asyncio.ensure_future(queue.flush())
+            await asyncio.sleep(0.02)
+            flush.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await flush
+            depth = queue.depth
+            database.delay = 0
+            await queue.stop()
+            return depth
+
+        assert asyncio.run(scenario()) == 2
+        assert database.batches == [("pdf_analyses", 1), ("parsed_documents", 1)]
+        print("SUCCESS: cancelled flush re-queued its batch")
+
+    def test_timer_flushes_partial_batch(self, database):
+        """Test a partial batch is written after the flush interval"""
+        async def scenario():
+            queue = WriteBehindQueue(batch_size=100, flush_interval=0.02)
+            queue.enqueue("pdf_analyses", InsertOne({"i": 0}))
+            await asyncio.sleep(0.1)
+            written = list(database.batches)
+            await queue.stop()
+            return written
+
+        assert asyncio.run(scenario()) == [("pdf_analyses", 1)]
+        print("SUCCESS: timer flush")
+
+    def test_breaker_sheds_while_database_down(self, database):
+        """Test failed batches are retried, then the circuit opens and sheds new writes"""
+        async def scenario():
+            queue = WriteBehindQueue(batch_size=10, flush_interval=60, failure_threshold=2, cooldown=60)
+            database.failing = True
+            queue.enqueue("pdf_analyses", InsertOne({"i": 0}))
+            await queue.flush()
+            assert queue.depth == 1 and not queue.circuit_open  # put back for a retry
+            await queue.flush()
+            assert queue.circuit_open and queue.depth == 0
+            assert queue.enqueue("pdf_analyses", InsertOne({"i": 1})) is False
+
+            # After the cooldown one flush is tried again and closes the circuit
+            queue.opened_at -= 61
+            database.failing = False
+            assert queue.enqueue("pdf_analyses", InsertOne({"i": 2}))
+            await queue.stop()
+            return queue
+
+        queue = asyncio.run(scenario())
+        assert database.batches == [("pdf_analyses", 1)]
+        assert queue.consecutive_failures == 0 and not queue.circuit_open
+        print("SUCCESS: circuit breaker sheds and recovers")
+
+    def test_full_queue_drops_new_writes(self, database):
+        """Test enqueue refuses writes beyond max_depth"""
+        async def scenario():
+            queue = WriteBehindQueue(batch_size=100, flush_interval=60, max_depth=2)
+            accepted = [queue.enqueue("pdf_analyses", InsertOne({"i": i})) for i in range(3)]
+            await queue.stop()
+            return accepted
+
+        assert asyncio.run(scenario()) == [True, True, False]
+        print("SUCCESS: bounded queue")
@@ -81,6 +81,7 @@ export default function HomePage() {
   const timerRef = useRef(null);
   const fileInputRef = useRef(null);
   const exportRef = useRef(null);
+  const analysisSettingsRef = useRef(null); // Settings the loaded analysis was timed with
   
   // Notification state
   const [notificationPlayed, setNotificationPlayed] = useState({
@@ -377,6 +378,26 @@ export default function HomePage() {
     }
   }, [elapsedTime, isTimerRunning, analysisResult, notificationPlayed, playNotificationSound, getFinalQuestionsTimeSeconds, alertTimes, triggerVibration]);
 
+  // Re-time the loaded analysis when reading speed or answer time change.
+  // The server keeps the parsed article, so no re-upload is needed.
+  useEffect(() => {
+    const timedWith = analysisSettingsRef.current;
+    if (!analysisResult?.id || !timedWith || startTime) return;
+    if (timedWith.wpm === readingSpeed && timedWith.answerTime === answerTime) return;
+
+    let cancelled = false;
+    axios.get(
+      `${API}/analyses/${analysisResult.id}/retime?wpm=${readingSpeed}&answer_time_seconds=${answerTime}`
+    ).then((response) => {
+      if (cancelled) return;
+      analysisSettingsRef.current = { wpm: readingSpeed, answerTime };
+      setAnalysisResult(response.data);
+    }).catch((error) => {
+      console.error("Error retiming analysis:", error);
+    });
+    return () => { cancelled = true; };
+  }, [readingSpeed, answerTime, analysisResult?.id, startTime]);
+
   // Initialize remaining time when analysis is complete or duration changes
   useEffect(() => {
     if (analysisResult) {
@@ -423,6 +444,7 @@ export default function HomePage() {
         }
       );
       
+      analysisSettingsRef.current = { wpm: readingSpeed, answerTime };
       setAnalysisResult(response.data);
       setElapsedTime(0);
       setIsTimerRunning(false);